@@ -0,0 +1,4 @@
+from db_inspector.main import cli
+
+if __name__ == "__main__":
+    cli()
@@ -1,35 +1,104 @@
+import math
+import sys
+import threading
 from abc import abstractmethod
 from enum import Enum
 from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, Optional
+
+from db_inspector.checks.rule import Rule
 
 
 class Status(Enum):
     SUCCESS = 'success'
     FAILURE = 'failure'
     WARNING = 'warning'
+    TIMEOUT = 'timeout'
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def format_rows(results, truncated=False, row_count=None):
+    """
+    将查询结果行格式化为报告中展示的文本
+    :param results: 查询结果行列表（至少一行）
+    :param truncated: 结果是否被截断，截断时在末尾说明展示的行数
+    :param row_count: 查询实际返回的行数
+    """
+    # 当只有一行数据时
+    if len(results) == 1:
+        row = results[0]
+        # 如果 row 不是元组或列表（单字段），直接转换为字符串
+        if not isinstance(row, (list, tuple)):
+            text = str(row)
+        # 如果 row 是一个元组或列表
+        elif len(row) == 1:
+            text = str(row[0])
+        # 输出多个字段时，用逗号分隔
+        else:
+            text = ", ".join(str(item) for item in row)
+    else:
+        # 多行数据时，每行数据以逗号分隔，每行换行显示
+        text = "\n".join(", ".join(str(item) for item in row) for row in results)
+
+    if truncated:
+        text += f"\n... truncated, showing {len(results)} of {row_count} rows"
+    return text
+
 
 class CheckItemResult:
-    def __init__(self, check_name, status,message):
-        self.check_name = check_name
-        self.status = status
-        self.message = message
+    # 使用 __slots__ 不为每个结果创建 __dict__，大量数据库的检查结果常驻内存时占用更少
+    __slots__ = ('check_name', 'status', '_message', 'error', 'row_count', 'truncated', 'rows', 'columns')
+    # 序列化输出的字段（按输出顺序），JSON 报告按这些字段直接写出，不为每个结果创建字典
+    FIELDS = ('check_name', 'status', 'message', 'error', 'row_count', 'truncated', 'columns', 'rows')
+
+    def __init__(self, check_name, status,message, error=False, row_count=None, truncated=False, rows=None, columns=None):
+        # 检查项名称和状态在所有数据库之间大量重复，驻留后同一个值只保存一份
+        self.check_name = _intern(check_name)
+        self.status = _intern(status)
+        # 为 None 时在第一次读取 message 时由 rows 格式化
+        self._message = message
+        # 检查是否因执行出错（而不是检查结论）得到该结果
+        self.error = error
+        # SQL 检查的查询实际返回的行数（非 SQL 检查为 None）
+        self.row_count = row_count
+        # 查询结果超过 max_rows / max_bytes，message 中只包含前面的行
+        self.truncated = truncated
+        # SQL 检查的结果行（保留数据库驱动返回的原始类型）和列名
+        self.rows = rows
+        self.columns = columns
+
+    @property
+    def message(self):
+        """
+        展示用的文本消息，只在报告等需要文本时才由结果行格式化，格式化后保存
+        """
+        if self._message is None and self.rows:
+            self._message = format_rows(self.rows, self.truncated, self.row_count)
+        return self._message
+
     def __str__(self):
         return f"{self.check_name}: {self.status} - {self.message}"
 
+    def __reduce__(self):
+        # 序列化时只保存字段值，反序列化时重新驻留字符串
+        return CheckItemResult, (self.check_name, self.status, self._message, self.error, self.row_count, self.truncated, self.rows, self.columns)
+
 class BaseCheck:
     @abstractmethod
     def run(self, db_connection):
         raise NotImplementedError("This method should be overridden by subclasses")
 
 
-@dataclass
+# 检查项配置加载后不再修改，所有数据库的检查计划共用同一个对象
+@dataclass(frozen=True)
 class CheckItem:
     # 检查项的名称
     name: str = field(metadata={"remark": "检查项的名称"})
-    # 检查项类型，例如 'sql' 或 'shell'
-    type: str = field(metadata={"remark": "检查项类型（sql/shell）"})
+    # 检查项类型，例如 'sql'、'shell'、'python' 或 'mongodb'
+    type: str = field(metadata={"remark": "检查项类型（sql/shell/python/mongodb）"})
     # 检查项的唯一标识符
     code: str = field(metadata={"remark": "检查项的唯一标识符"})
     # 对检查项的描述和备注信息
@@ -38,12 +107,32 @@ class CheckItem:
     query: str = field(default="", metadata={"remark": "SQL 查询语句，仅在 type 为 sql 时使用"})
     # 针对 Shell 类型检查的命令（非 shell 类型时可为空）
     command: str = field(default="", metadata={"remark": "Shell 命令，仅在 type 为 shell 时使用"})
+    # 针对 Python 类型检查在进程内调用的函数（模块路径，例如 package.module:function）
+    function: str = field(default="", metadata={"remark": "检查函数的模块路径，仅在 type 为 python 时使用"})
+    # 针对 MongoDB 类型检查读取的服务器状态字段（命令名.字段路径，例如 serverStatus.connections）
+    path: str = field(default="", metadata={"remark": "服务器状态字段路径，仅在 type 为 mongodb 时使用"})
     # 预期的检查值，依据 check_type 进行判断
     expected_value: str = field(default="", metadata={"remark": "预期的检查值"})
     # 检查类型，例如 'threshold'（阈值比较）或 'output_contains'（输出包含检查）
     check_type: str = field(default="", metadata={"remark": "检查类型，用于指定判断方式"})
     # 如果是阈值检查，比较操作符，例如 'greater_than', 'less_than', 'equal_to'
     comparison: str = field(default="", metadata={"remark": "比较操作符，仅在阈值检查时使用"})
+    # 单个检查的执行超时时间（秒），0 表示使用数据库的默认配置
+    timeout: float = field(default=0, metadata={"remark": "检查执行超时时间（秒），0 表示使用数据库默认配置"})
+    # 单个检查等待锁的超时时间（秒），0 表示使用数据库的默认配置
+    lock_timeout: float = field(default=0, metadata={"remark": "等待锁的超时时间（秒），0 表示使用数据库默认配置"})
+    # 检查结果的缓存有效期（秒），0 表示不缓存
+    ttl: float = field(default=0, metadata={"remark": "检查结果缓存有效期（秒），0 表示不缓存"})
+    # 守护进程模式下检查的执行间隔（秒），0 表示使用守护进程的默认间隔
+    interval: float = field(default=0, metadata={"remark": "守护进程模式下的执行间隔（秒），0 表示使用默认间隔"})
+    # SQL 检查结果最多保留的行数，0 表示使用默认上限
+    max_rows: int = field(default=0, metadata={"remark": "SQL 检查结果最多保留的行数，0 表示使用默认上限"})
+    # SQL 检查结果（按格式化后的文本估算）或 Shell 命令输出最多保留的字节数，0 表示使用默认上限
+    max_bytes: int = field(default=0, metadata={"remark": "SQL 检查结果或 Shell 命令输出最多保留的字节数，0 表示使用默认上限"})
+    # 阈值检查比较的列（列名或从 0 开始的列序号），为空时使用最后一列
+    threshold_column: str = field(default="", metadata={"remark": "阈值检查比较的列名或列序号，为空时使用最后一列"})
+    # 判断检查是否通过的规则表达式（加载配置时编译），例如 all(age_remain > 1e8)、count(rows) == 0
+    rule: Optional[Rule] = field(default=None, metadata={"remark": "规则表达式，配置后按规则判断检查是否通过"})
 
 @dataclass
 class CheckGroup:
@@ -73,3 +162,134 @@ def manage_transaction(connection):
         raise exc
     finally:
         cursor.close()
+
+
+# 快照模式下用于隔离单个检查的保存点名称
+SAVEPOINT_NAME = "db_inspector_check"
+
+
+@contextmanager
+def snapshot_transaction(connection):
+    """
+    在同一个只读 REPEATABLE READ 事务中执行一组检查，所有检查看到同一个数据快照，
+    结束时只需要提交一次。事务开始时即创建保存点，保证失败的检查总能回滚到保存点。
+    """
+    cursor = connection.cursor()
+    try:
+        if connection.autocommit:
+            cursor.execute(f"BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY; SAVEPOINT {SAVEPOINT_NAME}")
+        else:
+            cursor.execute(f"SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY; SAVEPOINT {SAVEPOINT_NAME}")
+        yield
+        if connection.autocommit:
+            cursor.execute("COMMIT")
+        else:
+            connection.commit()
+    except Exception as exc:
+        if connection.autocommit:
+            cursor.execute("ROLLBACK")
+        else:
+            connection.rollback()
+        raise exc
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def manage_savepoint(connection):
+    """
+    快照事务内执行单个检查：出错时回滚到保存点，不影响事务中的其他检查，也不提交事务
+    """
+    cursor = connection.cursor()
+    try:
+        yield cursor
+    except Exception as exc:
+        cursor.execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}")
+        raise exc
+    finally:
+        cursor.close()
+
+
+# libpq 的事务状态：事务中的语句出错，事务处于中止状态（PQTRANS_INERROR）
+TRANSACTION_STATUS_INERROR = 3
+
+
+def transaction_failed(connection):
+    """
+    判断连接当前的事务是否因语句出错而中止（psycopg2 和 psycopg 3 的 connection.info）
+    """
+    info = getattr(connection, 'info', None)
+    return info is not None and int(info.transaction_status) == TRANSACTION_STATUS_INERROR
+
+
+# 查询被取消（statement_timeout 或客户端取消）和等待锁超时对应的 SQLSTATE
+TIMEOUT_SQLSTATES = ('57014', '55P03')
+# 服务端超时未生效时，客户端在超时时间之后再等待多久取消查询（秒）
+CANCEL_GRACE = 1.0
+
+
+def is_timeout_error(exc):
+    """
+    判断异常是否由超时引起（服务端超时、客户端取消或 asyncio 超时）
+    """
+    if isinstance(exc, TimeoutError):
+        return True
+    sqlstate = getattr(exc, 'pgcode', None) or getattr(exc, 'sqlstate', None)
+    return sqlstate in TIMEOUT_SQLSTATES
+
+
+def timeout_settings(statement_timeout, lock_timeout, local=True, reset=False):
+    """
+    生成设置 statement_timeout 和 lock_timeout 的 SQL 语句列表。
+    未配置（为 0）的超时不设置，保留服务器、数据库或角色上配置的默认值
+    :param statement_timeout: 执行超时时间（秒）
+    :param lock_timeout: 等待锁的超时时间（秒）
+    :param local: 是否只在当前事务内生效（SET LOCAL）
+    :param reset: 未配置的超时是否恢复为默认值（SET ... = DEFAULT），
+                  用于同一事务或会话中之前的检查已经设置过超时的情况
+    """
+    scope = "SET LOCAL" if local else "SET"
+    statements = []
+    for name, seconds in (("statement_timeout", statement_timeout), ("lock_timeout", lock_timeout)):
+        if seconds:
+            statements.append(f"{scope} {name} = {timeout_milliseconds(seconds)}")
+        elif reset:
+            statements.append(f"{scope} {name} = DEFAULT")
+    return statements
+
+
+def timeout_milliseconds(seconds):
+    """
+    超时时间转换为毫秒，向上取整且至少为 1 毫秒（0 在 PostgreSQL 中表示不限制）
+    """
+    return max(math.ceil(round(seconds * 1000, 6)), 1)
+
+
+def cap_timeout(timeout, remaining):
+    """
+    用数据库剩余的时间预算限制单个检查的超时时间
+    :param timeout: 检查的超时时间（秒），0 表示不限制
+    :param remaining: 剩余时间预算（秒），为空表示没有预算限制
+    """
+    if remaining is None:
+        return timeout
+    return min(timeout, remaining) if timeout else remaining
+
+
+@contextmanager
+def cancel_after(connection, seconds):
+    """
+    客户端兜底：超过指定时间后取消连接上正在执行的查询
+    :param seconds: 超时时间（秒），为空或 0 时不启用
+    """
+    if not seconds:
+        yield
+        return
+
+    timer = threading.Timer(seconds + CANCEL_GRACE, connection.cancel)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
@@ -1,105 +1,487 @@
-import subprocess
+import importlib
+import inspect
+import re
+import time
+from functools import lru_cache
 
-from db_inspector.checks.base import manage_transaction, BaseCheck, CheckItem, CheckItemResult, Status
+from db_inspector.checks.base import manage_transaction, manage_savepoint, cancel_after, CANCEL_GRACE, timeout_settings, transaction_failed, format_rows, BaseCheck, CheckItem, CheckItemResult, Status, SAVEPOINT_NAME
+from db_inspector.checks.rule import RuleError
+from db_inspector.utils.shell_runner import get_shell_runner, DEFAULT_MAX_OUTPUT_BYTES
+
+# 每次从服务端游标读取的行数
+FETCH_SIZE = 500
+# 检查项未配置 max_rows / max_bytes 时，查询结果最多保留的行数和字节数
+DEFAULT_MAX_ROWS = 10000
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+# 读取查询结果的服务端游标名称
+ROW_CURSOR_NAME = "db_inspector_rows"
+# 可以通过 DECLARE CURSOR 逐批读取的查询，其他语句（如 SHOW）直接执行
+_CURSOR_QUERY = re.compile(r"^[\s(]*(SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE)
+
+
+def is_cursor_query(query: str) -> bool:
+    return _CURSOR_QUERY.match(query) is not None
+
+
+class FetchedRows(list):
+    """
+    查询结果行。结果超过行数或字节数上限时只保留前面的行，
+    truncated 为 True，total_rows 仍然是查询实际返回的行数
+    """
+
+    def __init__(self, rows=(), total_rows=None, truncated=False, size=0, columns=None):
+        super().__init__(rows)
+        self.total_rows = len(self) if total_rows is None else total_rows
+        self.truncated = truncated
+        # 列名（来自 cursor.description），未知时为 None
+        self.columns = columns
+        # 保留的行格式化后的大约字节数
+        self.size = size
+
+
+def row_size(row):
+    """
+    估算一行结果格式化为报告文本后的字节数
+    """
+    if not isinstance(row, (list, tuple)):
+        return len(str(row))
+    return sum(len(str(item)) for item in row) + 2 * len(row)
+
+
+class RowCollector:
+    """
+    按批次收集查询结果行，达到行数或字节数上限后只计数，不再保存
+    """
+
+    def __init__(self, max_rows=0, max_bytes=0):
+        """
+        :param max_rows: 最多保留的行数，0 表示使用默认上限
+        :param max_bytes: 最多保留的字节数，0 表示使用默认上限
+        """
+        self.max_rows = max_rows or DEFAULT_MAX_ROWS
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.rows = []
+        self.size = 0
+        self.total_rows = 0
+        self.truncated = False
+        self.columns = None
+
+    def add(self, batch):
+        """
+        添加一批结果行
+        :return: 是否还需要继续保存（达到上限后返回 False）
+        """
+        for row in batch:
+            self.total_rows += 1
+            if self.truncated:
+                continue
+            size = row_size(row)
+            if len(self.rows) >= self.max_rows or self.size + size > self.max_bytes:
+                self.truncated = True
+                continue
+            self.rows.append(row)
+            self.size += size
+        return not self.truncated
+
+    def skip(self, count):
+        """
+        记录未读取（在服务端跳过）的行数
+        """
+        self.total_rows += count
+
+    def result(self):
+        return FetchedRows(self.rows, self.total_rows, self.truncated, self.size, self.columns)
+
+
+def cap_rows(rows, max_rows=0, max_bytes=0):
+    """
+    按上限截断已经获取的结果行（pipeline 模式或其他检查项获取的相同查询的结果）
+    :return: FetchedRows，保留原结果的实际行数
+    """
+    if isinstance(rows, FetchedRows) and len(rows) <= (max_rows or DEFAULT_MAX_ROWS) and rows.size <= (max_bytes or DEFAULT_MAX_BYTES):
+        return rows
+    collector = RowCollector(max_rows, max_bytes)
+    collector.add(rows)
+    result = collector.result()
+    if isinstance(rows, FetchedRows):
+        result.total_rows = rows.total_rows
+        result.truncated = True
+        result.columns = rows.columns
+    return result
+
+
+def last_result(cursor):
+    """
+    定位到多条语句中最后一条语句的结果。
+    psycopg 3 执行多条语句后位于第一条语句的结果上，psycopg2 只保留最后一条语句的结果
+    """
+    if getattr(cursor, 'pgresult', None) is None:
+        return
+    while cursor.nextset():
+        pass
+
+
+def column_names(cursor):
+    """
+    根据 cursor.description 获取结果的列名，语句没有返回结果时为 None
+    """
+    if not cursor.description:
+        return None
+    return tuple(column.name for column in cursor.description)
 
 
 # SQL 类型检查类
 class SQLCheck(BaseCheck):
-    def __init__(self, query: str, expected_value: str, comparison: str, check_name: str = "SQLCheck"):
+    def __init__(self, query: str, expected_value: str, comparison: str, check_name: str = "SQLCheck", timeout: float = 0, lock_timeout: float = 0,
+                 max_rows: int = 0, max_bytes: int = 0, check_type: str = "", threshold_column: str = "", rule=None):
         """
         :param query: SQL 查询语句
         :param expected_value: 预期值（用于比较）
         :param comparison: 比较方式，例如 "greater_than"、"less_than"、"equal_to"
         :param check_name: 检查项名称
+        :param timeout: 执行超时时间（秒），0 表示不限制
+        :param lock_timeout: 等待锁的超时时间（秒），0 表示不限制
+        :param max_rows: 结果最多保留的行数，0 表示使用默认上限
+        :param max_bytes: 结果最多保留的字节数，0 表示使用默认上限
+        :param check_type: 判断方式，"threshold" 时将每一行的 threshold_column 列与 expected_value 比较
+        :param threshold_column: 阈值检查比较的列名或列序号，为空时使用最后一列
+        :param rule: 可选，编译后的规则（Rule），配置后按规则判断检查是否通过
         """
         self.query = query
         self.expected_value = expected_value
         self.comparison = comparison
         self.check_name = check_name
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.check_type = check_type
+        self.threshold_column = threshold_column
+        self.rule = rule
 
     def run(self, db_connection):
         """
         执行 SQL 查询检查，并根据比较结果返回 CheckItem。
         """
-        with manage_transaction(db_connection) as cursor:
-            cursor.execute(self.query)
-            results = cursor.fetchall()
+        return self.evaluate(self.fetch(db_connection))
+
+    def fetch(self, db_connection, snapshot=False, timeout=None):
+        """
+        执行 SQL 查询并返回结果行。
+        查询通过服务端游标逐批读取，超过 max_rows / max_bytes 后剩余的行只在服务端计数，不传输到客户端
+        :param snapshot: 是否在快照事务（snapshot_transaction）中执行，
+                         此时查询前先创建保存点（与查询一起发送），且不提交事务
+        :param timeout: 本次执行的超时时间（秒），默认使用检查项的超时配置
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        # 通过 SET LOCAL 在服务端限制执行时间，与查询一起发送，不增加网络往返；
+        # 快照模式下未配置的超时恢复为默认值，避免继承同一事务中上一个检查的超时配置
+        settings = "".join(f"{statement}; " for statement in timeout_settings(timeout, self.lock_timeout, reset=snapshot))
+
+        # 服务端超时未生效（如网络异常）时由客户端取消查询
+        with cancel_after(db_connection, timeout):
+            if snapshot:
+                with manage_savepoint(db_connection) as cursor:
+                    # 同一个快照事务中先关闭上一个检查的游标
+                    return self.fetch_rows(cursor, f"CLOSE ALL; SAVEPOINT {SAVEPOINT_NAME}; {settings}")
+
+            with manage_transaction(db_connection) as cursor:
+                # autocommit 连接（psycopg 3）中服务端游标需要显式开启事务，提交时关闭游标
+                begin = "BEGIN; " if db_connection.autocommit else ""
+                return self.fetch_rows(cursor, f"{begin}{settings}")
+
+    def fetch_rows(self, cursor, prefix=""):
+        """
+        执行查询并按 max_rows / max_bytes 收集结果行
+        :param prefix: 与查询一起发送的语句（保存点、超时设置等）
+        :return: FetchedRows
+        """
+        collector = RowCollector(self.max_rows, self.max_bytes)
+        if not is_cursor_query(self.query):
+            cursor.execute(f"{prefix}{self.query}")
+            last_result(cursor)
+            collector.columns = column_names(cursor)
+            collector.add(cursor.fetchall())
+            return collector.result()
+
+        # 声明游标和读取第一批结果与前面的语句一起发送，结果较少时仍然只需要一次网络往返
+        query = self.query.strip().rstrip(";")
+        cursor.execute(f"{prefix}DECLARE {ROW_CURSOR_NAME} NO SCROLL CURSOR FOR {query}; FETCH FORWARD {FETCH_SIZE} FROM {ROW_CURSOR_NAME}")
+        last_result(cursor)
+        collector.columns = column_names(cursor)
+        while True:
+            batch = cursor.fetchall()
+            if not collector.add(batch):
+                # 超过上限后只统计剩余的行数，结果不传输到客户端
+                cursor.execute(f"MOVE FORWARD ALL FROM {ROW_CURSOR_NAME}")
+                collector.skip(cursor.rowcount)
+                break
+            if len(batch) < FETCH_SIZE:
+                break
+            cursor.execute(f"FETCH FORWARD {FETCH_SIZE} FROM {ROW_CURSOR_NAME}")
+        return collector.result()
+
+    def evaluate(self, results):
+        """
+        根据查询返回的行生成检查结果
+        :param results: 查询结果行列表
+        """
+        # 规则可以判断空结果（如 count(rows) == 0），在检查是否返回结果之前执行
+        if self.rule is not None:
+            return self.evaluate_rule(results)
 
         # 检查查询是否返回了结果
-        if results is None or len(results) == 0:
-            return CheckItemResult(self.check_name, Status.FAILURE.value, "No results returned from query.")
-
-        # 如果查询没有返回结果，直接返回提示信息
-        if results is None or len(results) == 0:
-            return CheckItem(self.check_name, "FAILURE", "No result returned.")
-
-        # 当只有一行数据时
-        if len(results) == 1:
-            row = results[0]
-            # 如果 row 不是元组或列表（单字段），直接转换为字符串
-            if not isinstance(row, (list, tuple)):
-                output = str(row)
-            # 如果 row 是一个元组或列表
-            else:
-                if len(row) == 1:
-                    output = str(row[0])
-                else:
-                    # 输出多个字段时，用逗号分隔
-                    output = ", ".join(str(item) for item in row)
+        if results is None or len(results) == 0 and getattr(results, 'total_rows', 0) == 0:
+            return CheckItemResult(self.check_name, Status.FAILURE.value, "No results returned from query.", row_count=0)
+
+        results = cap_rows(results, self.max_rows, self.max_bytes)
+        message = None
+        if not results:
+            message = f"Result truncated: the first of {results.total_rows} rows exceeds {self.max_bytes or DEFAULT_MAX_BYTES} bytes."
+        elif self.check_type == "threshold":
+            # 阈值检查模块（及 NumPy）在第一次使用时导入
+            from db_inspector.checks.threshold import evaluate_threshold
+            return evaluate_threshold(self.check_name, tuple(results), results.columns, self.comparison, self.expected_value,
+                                      self.threshold_column, results.total_rows, results.truncated)
+        # 保留原始类型的结果行，文本消息在报告需要时才格式化
+        return  CheckItemResult(self.check_name,Status.SUCCESS.value , message, row_count=results.total_rows, truncated=results.truncated,
+                                rows=tuple(results), columns=results.columns)
+
+    def evaluate_rule(self, results):
+        """
+        使用编译后的规则判断检查是否通过
+        :param results: 查询结果行列表
+        """
+        results = cap_rows(results if results is not None else FetchedRows(), self.max_rows, self.max_bytes)
+        rows = tuple(results)
+
+        def result(status, message, error=False):
+            return CheckItemResult(self.check_name, status, message, error=error, row_count=results.total_rows, truncated=results.truncated,
+                                   rows=rows, columns=results.columns)
+
+        try:
+            passed = self.rule.evaluate(rows, results.columns, results.total_rows)
+        except (RuleError, TypeError, ArithmeticError) as e:
+            return result(Status.FAILURE.value, f"Rule '{self.rule}' could not be evaluated: {e}", error=True)
+
+        if passed:
+            # 有结果行时文本消息在报告需要时才格式化
+            return result(Status.SUCCESS.value, None if rows else f"Rule '{self.rule}' passed (no rows returned).")
+        if rows:
+            detail = f"\n{format_rows(rows, results.truncated, results.total_rows)}"
+        elif results.total_rows:
+            # 第一行就超过 max_bytes，没有保留任何行
+            detail = f" ({results.total_rows} rows returned, none kept within {self.max_bytes or DEFAULT_MAX_BYTES} bytes)"
         else:
-            # 多行数据时，每行数据以逗号分隔，每行换行显示
-            output = "\n".join(", ".join(str(item) for item in row) for row in results)
-
-        return  CheckItemResult(self.check_name,Status.SUCCESS.value , output)
-
-
-
-        # # 获取查询结果的第一个字段
-        # result_value = result[0]
-        #
-        # # 根据比较类型判断检查是否通过
-        # if self.comparison == "greater_than" and result_value > float(self.expected_value):
-        #     status = "SUCCESS"
-        #     message = f"Result {result_value} is greater than {self.expected_value}."
-        # elif self.comparison == "less_than" and result < float(self.expected_value):
-        #     status = "SUCCESS"
-        #     message = f"Result {result_value} is less than {self.expected_value}."
-        # elif self.comparison == "equal_to" and result_value == float(self.expected_value):
-        #     status = "SUCCESS"
-        #     message = f"Result {result_value} equals {self.expected_value}."
-        # else:
-        #     status = "FAILURE"
-        #     message = f"Result {result_value} doesn't meet the threshold {self.expected_value}."
-        #
-        #
-        # return CheckItemResult(self.check_name, status, message)
+            detail = " (no rows returned)"
+        return result(Status.FAILURE.value, f"Rule '{self.rule}' failed{detail}")
+
 
 # Shell 命令检查类
+# 超过数据库时间预算时取消 Shell 命令的提示
+DEADLINE_MESSAGE = "Command cancelled: database time budget exhausted"
+
+
 class ShellCheck(BaseCheck):
-    def __init__(self, command: str, expected_value: str, check_name: str = "ShellCheck"):
+    def __init__(self, command: str, expected_value: str, check_name: str = "ShellCheck", timeout: float = 0, max_bytes: int = 0):
         """
         :param command: 待执行的 shell 命令
         :param expected_value: 预期值，用于判断输出中是否包含该值
         :param check_name: 检查项名称
+        :param timeout: 执行超时时间（秒），0 表示不限制
+        :param max_bytes: 最多保留的输出字节数，0 表示使用默认上限
         """
         self.command = command
         self.expected_value = expected_value
         self.check_name = check_name
+        self.timeout = timeout
+        self.max_bytes = max_bytes
 
-    def run(self, db_connection=None):
+    def run(self, db_connection=None, timeout=None):
         """
         执行 shell 命令检查，并根据输出判断检查是否通过。
         :param db_connection: 对于 shell 检查通常不需要数据库连接，因此可传 None
+        :param timeout: 本次执行的超时时间（秒），默认使用检查项的超时配置
+        """
+        if timeout is None:
+            timeout = self.timeout
+        return self.collect(self.submit(timeout), timeout)
+
+    def submit(self, timeout=None):
+        """
+        提交命令到进程级的 Shell 执行器（见 ShellRunner），立即返回，多个命令可以同时执行
+        :param timeout: 本次执行的超时时间（秒），默认使用检查项的超时配置
+        :return: concurrent.futures.Future，使用 collect 获取检查结果
+        """
+        if timeout is None:
+            timeout = self.timeout
+        return get_shell_runner().submit(self.command, timeout, self.max_bytes)
+
+    def collect(self, future, timeout=None, deadline=None):
+        """
+        等待已提交的命令结束并生成检查结果
+        :param future: submit 返回的 Future
+        :param timeout: 命令的超时时间（秒），用于超时信息
+        :param deadline: 数据库时间预算的截止时间（time.monotonic()），超过后不再等待并取消命令，为空表示不限制
+        """
+        wait = None if deadline is None else max(deadline - time.monotonic(), 0) + CANCEL_GRACE
+        try:
+            output = future.result(timeout=wait)
+        except Exception as e:
+            if not future.done():
+                # 执行器中的超时未生效时兜底：取消命令（结束其进程组）并记为超时
+                future.cancel()
+                return self.failed(TimeoutError(DEADLINE_MESSAGE), timeout)
+            return self.failed(e, timeout)
+        return self.evaluate(output.text, output.truncated)
+
+    def failed(self, exc, timeout=None):
+        """
+        命令超时或无法执行时的检查结果
+        """
+        if isinstance(exc, TimeoutError):
+            return CheckItemResult(self.check_name, Status.TIMEOUT.value, str(exc) or f"Command timed out after {timeout}s", error=True)
+        return CheckItemResult(self.check_name, Status.FAILURE.value, f"Command failed with error {exc}", error=True)
+
+    def evaluate(self, output: str, truncated=False):
+        """
+        根据命令输出生成检查结果
+        :param output: 命令的标准输出
+        :param truncated: 输出是否超过上限被截断
+        """
+        if self.expected_value in output:
+            status = Status.SUCCESS.value
+            message = output.strip()
+            if truncated:
+                message += f"\n... output truncated at {self.max_bytes or DEFAULT_MAX_OUTPUT_BYTES} bytes"
+        else:
+            status = Status.FAILURE.value
+            message = f"Expected value '{self.expected_value}' not found in output."
+            if truncated:
+                message = f"Expected value '{self.expected_value}' not found in the first {self.max_bytes or DEFAULT_MAX_OUTPUT_BYTES} bytes of output."
+        return CheckItemResult(self.check_name, status, message, truncated=truncated)
+
+
+@lru_cache(maxsize=None)
+def load_function(path: str):
+    """
+    按模块路径加载 Python 检查调用的函数，相同的路径只加载一次
+    :param path: 模块路径和函数名，例如 package.module:function 或 package.module.function
+    :raise ImportError: 模块无法导入或模块中没有该函数
+    """
+    module_name, separator, attribute = path.partition(":")
+    if not separator:
+        module_name, _, attribute = path.rpartition(".")
+    if not module_name or not attribute:
+        raise ImportError(f"Invalid function path '{path}', expected 'module:function'")
+    module = importlib.import_module(module_name)
+    try:
+        function = getattr(module, attribute)
+    except AttributeError:
+        raise ImportError(f"Module '{module_name}' has no attribute '{attribute}'")
+    if not callable(function):
+        raise ImportError(f"'{path}' is not callable")
+    return function
+
+
+class CheckContext:
+    """
+    Python 检查函数的第二个参数：被检查的数据库和检查项配置
+    """
+    __slots__ = ('db_name', 'db_params', 'check_item')
+
+    def __init__(self, db_name=None, db_params=None, check_item: CheckItem = None):
+        self.db_name = db_name
+        # 数据库连接参数（host、port、dbname 等）
+        self.db_params = db_params
+        # 检查项配置（可以读取 expected_value 等字段），直接创建的检查对象为 None
+        self.check_item = check_item
+
+
+# 进程内 Python 函数检查类
+class PythonCheck(BaseCheck):
+    def __init__(self, function: str, expected_value: str = "", check_name: str = "PythonCheck", context: CheckContext = None):
+        """
+        :param function: 检查函数的模块路径，例如 package.module:function，第一次执行时加载
+        :param expected_value: 预期值，函数返回文本时用于判断输出中是否包含该值
+        :param check_name: 检查项名称
+        :param context: 传给检查函数的上下文（见 CheckContext）
+        """
+        self.function = function
+        self.expected_value = expected_value
+        self.check_name = check_name
+        self.context = context if context is not None else CheckContext()
+
+    def run(self, db_connection=None, snapshot=False):
+        """
+        在当前进程中调用检查函数 function(db_connection, context)，不创建子进程。
+        函数在调用线程中执行，不能被超时中断，只适合读取 /proc、计算磁盘用量等很快完成的检查。
+        :param db_connection: 数据库连接，原样传给检查函数
+        :param snapshot: 连接处于快照事务中，函数在保存点内执行（与 SQL 检查一致），执行出错的语句不影响事务中的其他检查
         """
         try:
-            result = subprocess.run(self.command, shell=True, capture_output=True, text=True)
-            if self.expected_value in result.stdout:
-                status = "SUCCESS"
-                message = result.stdout.strip()
+            if snapshot:
+                value = self.call_in_savepoint(db_connection)
             else:
-                status = "FAILURE"
-                message = f"Expected value '{self.expected_value}' not found in output."
-        except subprocess.CalledProcessError as e:
-            status = "FAILURE"
-            message = f"Command failed with error {e}"
-        return CheckItemResult(self.check_name, status, message)
+                value = self.call(db_connection)
+        except Exception as e:
+            return self.failed(e)
+        finally:
+            if not snapshot and transaction_failed(db_connection):
+                # 函数中出错的语句使事务中止，回滚后连接才能继续执行其他检查
+                db_connection.rollback()
+        if inspect.isawaitable(value):
+            # 异步函数只能在异步引擎（--engine async）中执行
+            if hasattr(value, 'close'):
+                value.close()
+            return CheckItemResult(self.check_name, Status.FAILURE.value, f"Function '{self.function}' is asynchronous, use --engine async", error=True)
+        return self.evaluate(value)
+
+    def call(self, db_connection=None):
+        """
+        加载并调用检查函数
+        :return: 函数的返回值（异步函数返回 awaitable，由调用方等待）
+        """
+        return load_function(self.function)(db_connection, self.context)
+
+    def call_in_savepoint(self, db_connection):
+        """
+        在快照事务的保存点内调用检查函数：函数抛出异常或自行捕获了出错的语句时回滚到保存点。
+        超时配置恢复为默认值，不继承同一事务中上一个检查的超时配置
+        """
+        settings = "".join(f"; {statement}" for statement in timeout_settings(0, 0, reset=True))
+        with manage_savepoint(db_connection) as cursor:
+            cursor.execute(f"SAVEPOINT {SAVEPOINT_NAME}{settings}")
+            value = self.call(db_connection)
+            if transaction_failed(db_connection):
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}")
+            return value
+
+    def failed(self, exc):
+        """
+        函数无法加载或执行出错时的检查结果
+        """
+        if isinstance(exc, ImportError):
+            return CheckItemResult(self.check_name, Status.FAILURE.value, f"Cannot load function '{self.function}': {exc}", error=True)
+        return CheckItemResult(self.check_name, Status.FAILURE.value, f"Function '{self.function}' raised {type(exc).__name__}: {exc}", error=True)
+
+    def evaluate(self, value):
+        """
+        根据函数的返回值生成检查结果：
+        CheckItemResult 直接使用；bool 或 (bool, 消息) 表示是否通过；
+        其他返回值转换为文本，与 Shell 检查一样判断是否包含预期值
+        """
+        if isinstance(value, CheckItemResult):
+            return value
+        if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], bool):
+            passed, message = value
+            return CheckItemResult(self.check_name, Status.SUCCESS.value if passed else Status.FAILURE.value, str(message))
+        if isinstance(value, bool):
+            return CheckItemResult(self.check_name, Status.SUCCESS.value if value else Status.FAILURE.value, "Check passed." if value else "Check failed.")
+
+        output = "" if value is None else str(value)
+        if self.expected_value in output:
+            return CheckItemResult(self.check_name, Status.SUCCESS.value, output.strip())
+        return CheckItemResult(self.check_name, Status.FAILURE.value, f"Expected value '{self.expected_value}' not found in output.")
@@ -0,0 +1,109 @@
+from db_inspector.checks.check_run import SQLCheck, cap_rows
+
+# 服务器状态快照中的命令，每个连接每次巡检最多各执行一次
+SNAPSHOT_COMMANDS = ("serverStatus", "replSetGetStatus", "hello")
+
+
+class ServerSnapshot:
+    """
+    单个 MongoDB 连接在一次巡检中的服务器状态快照。
+    serverStatus、replSetGetStatus 和 hello 在第一次被检查读取时执行并保存结果（或异常），
+    之后读取同一命令的检查直接使用保存的文档，不再访问服务器。
+    """
+
+    def __init__(self, client, timeout=0):
+        """
+        :param client: pymongo.MongoClient
+        :param timeout: 命令的服务端执行超时时间（秒），0 表示不限制
+        """
+        self.client = client
+        self.timeout = timeout
+        self._documents = {}
+
+    def get(self, command, timeout=None):
+        """
+        读取快照中的命令结果，第一次读取时执行命令
+        :param command: SNAPSHOT_COMMANDS 中的命令
+        :param timeout: 执行命令时的超时时间（秒），默认使用快照的超时配置
+        :return: 命令返回的文档
+        :raise ValueError: 命令不在 SNAPSHOT_COMMANDS 中
+        """
+        if command not in SNAPSHOT_COMMANDS:
+            raise ValueError(f"Unknown server status source '{command}' (available: {', '.join(SNAPSHOT_COMMANDS)})")
+        if command not in self._documents:
+            try:
+                self._documents[command] = self.run_command(command, self.timeout if timeout is None else timeout)
+            except Exception as e:
+                # 失败的命令同样只执行一次，读取它的检查都得到同一个错误
+                self._documents[command] = e
+        document = self._documents[command]
+        if isinstance(document, Exception):
+            raise document
+        return document
+
+    def run_command(self, command, timeout=0):
+        options = {"maxTimeMS": max(int(timeout * 1000), 1)} if timeout else {}
+        try:
+            return self.client.admin.command(command, **options)
+        except Exception as e:
+            # pymongo 的超时异常（ExecutionTimeout、NetworkTimeout 等）统一转换为 TimeoutError
+            if getattr(e, 'timeout', False):
+                raise TimeoutError(str(e)) from e
+            raise
+
+
+def resolve_path(document, path):
+    """
+    按点分隔的路径读取文档中的值，列表使用数字下标，例如 members.0.stateStr
+    :raise ValueError: 路径不存在
+    """
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, (list, tuple)) and part.lstrip("-").isdigit() and -len(value) <= int(part) < len(value):
+            value = value[int(part)]
+        else:
+            raise ValueError(f"Field '{path}' not found")
+    return value
+
+
+def document_rows(value, name="value"):
+    """
+    将文档中的值转换为结果行和列名，与 SQL 检查的结果格式一致：
+    文档列表每个文档一行（列为所有文档字段的并集），单个文档为一行，其他值为单列
+    :param name: 值不是文档时使用的列名
+    :return: (结果行列表, 列名元组)
+    """
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        columns = list(dict.fromkeys(key for item in value for key in item))
+        return [tuple(item.get(column) for column in columns) for item in value], tuple(columns)
+    if isinstance(value, dict):
+        return [tuple(value.values())], tuple(value)
+    if isinstance(value, (list, tuple)):
+        return [(item,) for item in value], (name,)
+    return [(value,)], (name,)
+
+
+class MongoDBCheck(SQLCheck):
+    """
+    MongoDB 服务器状态检查：query 为快照中的字段路径，例如 serverStatus.connections、replSetGetStatus.members。
+    字段值转换为结果行（见 document_rows），判断方式（threshold、rule 等）与 SQL 检查完全一致；
+    执行计划中相同路径的检查只读取一次。
+    """
+
+    def fetch(self, db_connection, snapshot=False, timeout=None):
+        """
+        从服务器状态快照中读取字段
+        :param db_connection: ServerSnapshot
+        :param snapshot: 不使用（PostgreSQL 快照事务参数）
+        :param timeout: 快照命令尚未执行时使用的超时时间（秒），默认使用检查项的超时配置
+        :return: FetchedRows
+        """
+        command, _, path = self.query.strip().partition(".")
+        document = db_connection.get(command, self.timeout if timeout is None else timeout)
+        value = resolve_path(document, path) if path else document
+        rows, columns = document_rows(value, path.rpartition(".")[2] or command)
+        fetched = cap_rows(rows, self.max_rows, self.max_bytes)
+        fetched.columns = columns
+        return fetched
@@ -0,0 +1,333 @@
+import copy
+import hashlib
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from db_inspector.checks.base import BaseCheck, CheckConfig, CheckItem, CheckItemResult, Status, SAVEPOINT_NAME, cancel_after, cap_timeout, is_timeout_error, timeout_settings
+from db_inspector.checks.check_run import SQLCheck, ShellCheck, PythonCheck, cap_rows, column_names, DEFAULT_MAX_ROWS, DEFAULT_MAX_BYTES
+from db_inspector.checks.constant import get_check_config
+from db_inspector.utils.result_cache import CachedCheck
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    规范化 SQL 文本：合并空白字符，去掉首尾空白和结尾的分号
+    """
+    return _WHITESPACE.sub(" ", query or "").strip().rstrip(";").strip()
+
+
+def query_hash(query: str) -> str:
+    """
+    计算规范化后 SQL 文本的哈希值，用于识别相同的查询
+    """
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+def definition_hash(check_item: CheckItem) -> str:
+    """
+    计算检查项定义（名称、SQL 查询、Shell 命令、Python 函数或 MongoDB 字段路径，以及判断结果的方式）的哈希值，
+    定义变化后缓存的结果失效；缓存的结果中包含检查项名称，名称变化后同样失效
+    """
+    definition = "\x1f".join(str(value) for value in (
+        check_item.name, check_item.type, normalize_query(check_item.query or check_item.command or check_item.function or check_item.path),
+        check_item.expected_value, check_item.check_type, check_item.comparison,
+        check_item.max_rows, check_item.max_bytes, check_item.threshold_column, check_item.rule,
+    ))
+    return hashlib.sha1(definition.encode("utf-8")).hexdigest()
+
+
+class PlanCompiler:
+    """
+    将检查项配置（组名 + 检查项 code 列表）解析为不可变的检查项元组。
+    相同的检查项配置只解析一次，解析结果由所有使用该配置的数据库共用；
+    找不到的组和检查项在整个进程中只报告一次。
+    """
+
+    def __init__(self, check_config: CheckConfig):
+        self.check_config = check_config
+        # 检查项配置 -> ((组名, 检查项), ...)
+        self._compiled: Dict[tuple, Tuple[Tuple[str, CheckItem], ...]] = {}
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config_key(checks_conf) -> tuple:
+        return tuple((check_conf.group, tuple(check_conf.checks)) for check_conf in checks_conf or ()
+                     if check_conf is not None and check_conf.checks)
+
+    def compile_with_groups(self, checks_conf) -> Optional[Tuple[Tuple[str, CheckItem], ...]]:
+        """
+        解析检查项配置
+        :param checks_conf: Check 列表
+        :return: 按配置顺序排列的 (组名, 检查项) 元组，检查配置未加载时返回 None
+        """
+        key = self.config_key(checks_conf)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                return compiled
+
+            if key and (self.check_config is None or not self.check_config.check_groups):
+                self.report_once("Failed to load check configuration. Exiting...")
+                return None
+
+            entries = []
+            for group_code, codes in key:
+                group = self.check_config.check_groups.get(group_code)
+                if group is None:
+                    self.report_once(f"Check group '{group_code}' not found in configuration")
+                    continue
+                for code in codes:
+                    check_item = group.checks.get(code)
+                    if check_item is None:
+                        self.report_once(f"Check '{code}' not found in group '{group_code}'")
+                        continue
+                    entries.append((group_code, check_item))
+
+            compiled = tuple(entries)
+            self._compiled[key] = compiled
+            return compiled
+
+    def compile(self, checks_conf) -> Optional[Tuple[CheckItem, ...]]:
+        """
+        解析检查项配置
+        :return: 按配置顺序排列的检查项元组，检查配置未加载时返回 None
+        """
+        compiled = self.compile_with_groups(checks_conf)
+        if compiled is None:
+            return None
+        return tuple(check_item for _, check_item in compiled)
+
+    def report_once(self, message):
+        if message not in self._reported:
+            self._reported.add(message)
+            print(message)
+
+
+# 进程内共享的检查计划编译器，检查配置变化（set_check_config）后重新创建
+_PLAN_COMPILER: Optional[PlanCompiler] = None
+_PLAN_COMPILER_LOCK = threading.Lock()
+
+
+def get_plan_compiler() -> PlanCompiler:
+    global _PLAN_COMPILER
+    check_config = get_check_config()
+    with _PLAN_COMPILER_LOCK:
+        if _PLAN_COMPILER is None or _PLAN_COMPILER.check_config is not check_config:
+            _PLAN_COMPILER = PlanCompiler(check_config)
+        return _PLAN_COMPILER
+
+
+def compile_checks(checks_conf) -> Optional[Tuple[CheckItem, ...]]:
+    """
+    使用共享的编译器解析检查项配置（见 PlanCompiler.compile）
+    """
+    return get_plan_compiler().compile(checks_conf)
+
+
+class ExecutionPlan:
+    """
+    单个数据库的检查执行计划。
+    多个检查项引用相同的查询时只执行一次，查询结果分发给所有引用它的检查项，
+    每个检查项仍然生成各自的检查结果。
+    """
+
+    def __init__(self, checks: List[BaseCheck], items: List[Optional[CheckItem]] = None):
+        """
+        :param checks: 按执行顺序排列的检查对象
+        :param items: 可选，与 checks 一一对应的检查项配置（直接传入的检查对象为 None）
+        """
+        self.checks = list(checks)
+        self.items = list(items) if items is not None else [None] * len(self.checks)
+        # 查询哈希 -> 引用该查询的 SQL 检查
+        self.query_checks: Dict[str, List[SQLCheck]] = {}
+        for check in self.checks:
+            if isinstance(check, SQLCheck):
+                self.query_checks.setdefault(query_hash(check.query), []).append(check)
+        # 查询哈希 -> 执行该查询的检查（按组内最大的行数和字节数上限读取）
+        self.fetch_checks: Dict[str, SQLCheck] = {key: fetching_check(checks) for key, checks in self.query_checks.items()}
+
+    @property
+    def fully_cached(self):
+        """
+        所有检查项都使用缓存结果，执行计划不需要数据库连接
+        """
+        return len(self.checks) > 0 and all(isinstance(check, CachedCheck) for check in self.checks)
+
+    def prefetch_pipelined(self, db_connection, snapshot=False, deadline=None):
+        """
+        使用 psycopg 3 的 pipeline 模式先发送所有不同的查询，再统一读取结果，
+        整个数据库的 SQL 检查只需要一次网络往返。
+        某个查询失败时，pipeline 中其后的查询会被服务端跳过，这些查询会在新的批次中重新发送。
+        :param db_connection: psycopg 3 连接（autocommit 模式）
+        :param snapshot: 是否在快照事务中执行，此时每个查询前创建保存点，失败后回滚到保存点再继续
+        :param deadline: 数据库时间预算的截止时间（time.monotonic()），为空表示不限制
+        :return: 查询哈希 -> 查询结果行，或查询失败时的异常
+        """
+        fetched = {}
+        pending = list(self.fetch_checks.items())
+        # 配置了超时时，每个查询前在会话级别设置超时（pipeline 中不增加网络往返），结束后恢复
+        use_timeouts = deadline is not None or any(check.timeout or check.lock_timeout for _, check in pending)
+        recover = False
+        while pending:
+            cursors = []
+            error = None
+            remaining = remaining_budget(deadline)
+            try:
+                with cancel_after(db_connection, remaining), db_connection.pipeline():
+                    if recover:
+                        db_connection.execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}", prepare=False)
+                    for key, check in pending:
+                        if snapshot:
+                            db_connection.execute(f"SAVEPOINT {SAVEPOINT_NAME}", prepare=False)
+                        if use_timeouts:
+                            for statement in timeout_settings(cap_timeout(check.timeout, remaining), check.lock_timeout, local=False, reset=True):
+                                db_connection.execute(statement, prepare=False)
+                        cursor = db_connection.cursor()
+                        # 不使用服务端预备语句，避免失败批次中被跳过的 PREPARE 影响重发
+                        cursor.execute(check.query, prepare=False)
+                        cursors.append(cursor)
+            except Exception as e:
+                error = e
+
+            # 失败的查询是第一个没有结果的查询（如果都有结果，则是正在发送的查询）
+            failed_at = len(cursors) if error is not None else None
+            for index, cursor in enumerate(cursors):
+                if cursor.pgresult is None:
+                    failed_at = index
+                    break
+                try:
+                    # pipeline 模式下结果一次性返回，立即按上限截断，不保留超出的行
+                    check = pending[index][1]
+                    rows = cap_rows(cursor.fetchall(), check.max_rows, check.max_bytes)
+                    rows.columns = column_names(cursor)
+                    fetched[pending[index][0]] = rows
+                except Exception as e:
+                    fetched[pending[index][0]] = e
+                cursor.close()
+
+            if failed_at is None:
+                recover = False
+                break
+            fetched[pending[failed_at][0]] = error
+            pending = pending[failed_at + 1:]
+            recover = snapshot
+
+        if recover:
+            # 快照事务中最后一个查询失败，回滚到保存点使事务恢复可用
+            db_connection.execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}", prepare=False)
+        if use_timeouts:
+            db_connection.execute("RESET statement_timeout; RESET lock_timeout", prepare=False)
+        return fetched
+
+    def iter_run(self, db_connection, prefetched=None, snapshot=False, deadline=None):
+        """
+        按计划依次执行检查项，每个检查项完成后立即返回其结果
+        :param db_connection: 数据库连接
+        :param prefetched: 可选，已经批量获取的查询结果（查询哈希 -> 结果行或异常）
+        :param snapshot: 是否在快照事务中执行（见 snapshot_transaction）
+        :param deadline: 数据库时间预算的截止时间（time.monotonic()），为空表示不限制；
+                         预算用完后剩余的检查直接记为超时
+        :return: 检查结果（CheckItemResult）的生成器，顺序与检查项一致
+        """
+        # 查询哈希 -> 查询结果行，或查询失败时的异常
+        fetched = dict(prefetched) if prefetched else {}
+        # Shell 检查在开始时全部提交，与 SQL 检查及彼此之间同时执行
+        shell_futures = self.start_shell_checks(deadline)
+        try:
+            yield from self._iter_run(db_connection, fetched, shell_futures, snapshot, deadline)
+        finally:
+            # 提前结束（如数据库巡检超时）时取消未完成的命令
+            for future, _ in shell_futures.values():
+                future.cancel()
+
+    def start_shell_checks(self, deadline=None):
+        """
+        提交计划中的所有 Shell 检查，每个命令的超时时间受数据库剩余时间预算限制
+        :return: id(检查对象) -> (Future, 超时时间)
+        """
+        remaining = remaining_budget(deadline)
+        if remaining is not None and remaining <= 0:
+            return {}
+        futures = {}
+        for check in self.checks:
+            if isinstance(check, ShellCheck):
+                timeout = cap_timeout(check.timeout, remaining)
+                futures[id(check)] = (check.submit(timeout), timeout)
+        return futures
+
+    def _iter_run(self, db_connection, fetched, shell_futures, snapshot, deadline):
+        for check in self.checks:
+            # 使用缓存结果的检查不访问数据库
+            if isinstance(check, CachedCheck):
+                yield check.run(db_connection)
+                continue
+
+            # 已经批量获取到结果的查询和已经提交的命令不受剩余时间预算影响
+            if isinstance(check, SQLCheck) and query_hash(check.query) in fetched:
+                yield evaluate_fetched(check, fetched[query_hash(check.query)])
+                continue
+            if id(check) in shell_futures:
+                future, timeout = shell_futures[id(check)]
+                yield check.collect(future, timeout, deadline)
+                continue
+
+            remaining = remaining_budget(deadline)
+            if remaining is not None and remaining <= 0:
+                yield CheckItemResult(check.check_name, Status.TIMEOUT.value, "Database time budget exhausted before the check ran.", error=True)
+                continue
+
+            if isinstance(check, PythonCheck):
+                # 快照事务中与 SQL 检查一样通过保存点隔离
+                yield check.run(db_connection, snapshot)
+                continue
+            if not isinstance(check, SQLCheck):
+                yield check.run(db_connection)
+                continue
+
+            key = query_hash(check.query)
+            try:
+                fetched[key] = self.fetch_checks[key].fetch(db_connection, snapshot, cap_timeout(check.timeout, remaining))
+            except Exception as e:
+                fetched[key] = e
+            yield evaluate_fetched(check, fetched[key])
+
+
+def fetching_check(checks: List[SQLCheck]) -> SQLCheck:
+    """
+    相同查询的检查共用一次查询：按组内最大的 max_rows / max_bytes 读取结果，
+    每个检查在 evaluate 中再按自己的上限截断，上限较大的检查不会只拿到较小上限的结果
+    """
+    check = checks[0]
+    max_rows = max(item.max_rows or DEFAULT_MAX_ROWS for item in checks)
+    max_bytes = max(item.max_bytes or DEFAULT_MAX_BYTES for item in checks)
+    if max_rows == (check.max_rows or DEFAULT_MAX_ROWS) and max_bytes == (check.max_bytes or DEFAULT_MAX_BYTES):
+        return check
+    fetcher = copy.copy(check)
+    fetcher.max_rows = max_rows
+    fetcher.max_bytes = max_bytes
+    return fetcher
+
+
+def remaining_budget(deadline):
+    """
+    计算距离截止时间的剩余秒数，没有截止时间时返回 None
+    """
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def evaluate_fetched(check: SQLCheck, fetched):
+    """
+    根据查询结果（或查询异常）生成 SQL 检查的结果
+    """
+    if isinstance(fetched, Exception):
+        if is_timeout_error(fetched):
+            return CheckItemResult(check.check_name, Status.TIMEOUT.value, f"Query timed out: {str(fetched) or 'time limit exceeded'}", error=True)
+        return CheckItemResult(check.check_name, Status.FAILURE.value, f"Query failed: {fetched}", error=True)
+    return check.evaluate(fetched)
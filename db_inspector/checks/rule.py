@@ -0,0 +1,272 @@
+import ast
+import operator
+from functools import lru_cache
+
+
+class RuleError(ValueError):
+    """
+    规则表达式无法解析或无法执行（语法错误、不支持的语法、引用了不存在的列等）
+    """
+
+
+class Column(list):
+    """
+    结果中一列的值（按行排列），与其他值运算时逐行计算
+    """
+
+
+def _broadcast(func, left, right):
+    """
+    对列逐行计算，标量与列运算时标量参与每一行的计算
+    """
+    if isinstance(left, Column):
+        if isinstance(right, Column):
+            return Column(func(a, b) for a, b in zip(left, right))
+        return Column(func(a, right) for a in left)
+    if isinstance(right, Column):
+        return Column(func(left, b) for b in right)
+    return func(left, right)
+
+
+def _null_safe(func, default=None):
+    """
+    NULL 参与比较时结果为 False，参与算术运算时结果为 NULL
+    """
+    def wrapper(a, b):
+        if a is None or b is None:
+            return default
+        return func(a, b)
+    return wrapper
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_COMPARE_OPERATORS = {
+    ast.Gt: _null_safe(operator.gt, False), ast.GtE: _null_safe(operator.ge, False),
+    ast.Lt: _null_safe(operator.lt, False), ast.LtE: _null_safe(operator.le, False),
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+}
+
+
+def _non_null(value):
+    values = value if isinstance(value, Column) else [value]
+    return [item for item in values if item is not None]
+
+
+def _all(value):
+    return all(value) if isinstance(value, Column) else bool(value)
+
+
+def _any(value):
+    return any(value) if isinstance(value, Column) else bool(value)
+
+
+def _count(value):
+    """
+    count(条件) 为满足条件的行数，count(列) 为非 NULL 值的数量（count(rows) 在编译时处理）
+    """
+    if isinstance(value, Column):
+        if all(item is None or isinstance(item, bool) for item in value):
+            return sum(1 for item in value if item)
+        return len(_non_null(value))
+    return 0 if value is None else 1
+
+
+def _aggregate(func):
+    def wrapper(value):
+        values = _non_null(value)
+        return func(values) if values else None
+    return wrapper
+
+
+def _abs(value):
+    if isinstance(value, Column):
+        return Column(None if item is None else abs(item) for item in value)
+    return None if value is None else abs(value)
+
+
+# 表达式中可以调用的函数
+FUNCTIONS = {
+    "all": _all,
+    "any": _any,
+    "count": _count,
+    "min": _aggregate(min),
+    "max": _aggregate(max),
+    "sum": _aggregate(sum),
+    "avg": _aggregate(lambda values: sum(values) / len(values)),
+    "abs": _abs,
+}
+
+
+def _native(value):
+    """
+    Decimal 等数值类型转换为 float，可以直接与表达式中的数值运算
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return float(value) if hasattr(value, '__float__') else value
+
+
+class RuleContext:
+    """
+    单次执行规则时的数据：按列名取出的列在本次执行中只转换一次
+    """
+
+    def __init__(self, rows, columns=None, row_count=None):
+        """
+        :param rows: 查询结果行
+        :param columns: 结果的列名
+        :param row_count: 查询实际返回的行数（结果被截断时大于 len(rows)）
+        """
+        self.rows = rows or ()
+        self.columns = columns or ()
+        self.row_count = len(self.rows) if row_count is None else row_count
+        self._values = {}
+
+    def column(self, name):
+        values = self._values.get(name)
+        if values is None:
+            if name not in self.columns:
+                # 没有返回行且不知道列名时（如 asyncpg 的空结果），引用的列为空列
+                if not self.rows and not self.columns:
+                    return Column()
+                raise RuleError(f"Unknown column '{name}' (columns: {', '.join(self.columns)})")
+            index = self.columns.index(name)
+            values = Column(_native(row[index]) for row in self.rows)
+            self._values[name] = values
+        return values
+
+
+def _compile(node):
+    """
+    将语法树节点编译为闭包 func(context)，只支持常量、列名、运算、比较和 FUNCTIONS 中的函数
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda context: value
+
+    if isinstance(node, (ast.Tuple, ast.List)):
+        items = [_compile(item) for item in node.elts]
+        return lambda context: tuple(item(context) for item in items)
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name == "rows":
+            raise RuleError("'rows' can only be used as count(rows)")
+        if name == "row_count":
+            return lambda context: context.row_count
+        return lambda context: context.column(name)
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        func = _null_safe(_BINARY_OPERATORS[type(node.op)])
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda context: _broadcast(func, left(context), right(context))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda context: _broadcast(lambda a, _: not a, operand(context), None)
+        if isinstance(node.op, ast.USub):
+            return lambda context: _broadcast(lambda a, _: None if a is None else -a, operand(context), None)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile(value) for value in node.values]
+        is_and = isinstance(node.op, ast.And)
+        combine = (lambda a, b: bool(a) and bool(b)) if is_and else (lambda a, b: bool(a) or bool(b))
+
+        def bool_op(context):
+            value = operands[0](context)
+            for operand in operands[1:]:
+                # 标量按 Python 的规则短路，列逐行计算
+                if not isinstance(value, Column) and (not value if is_and else value):
+                    return value
+                other = operand(context)
+                value = _broadcast(combine, value, other) if isinstance(value, Column) or isinstance(other, Column) else other
+            return value
+        return bool_op
+
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPERATORS for op in node.ops):
+        left = _compile(node.left)
+        steps = [(_COMPARE_OPERATORS[type(op)], _compile(comparator)) for op, comparator in zip(node.ops, node.comparators)]
+
+        def compare(context):
+            # 连续比较（a < b < c）拆分为多个比较的逻辑与
+            current = left(context)
+            result = None
+            for func, comparator in steps:
+                right = comparator(context)
+                step = _broadcast(func, current, right)
+                result = step if result is None else _broadcast(lambda a, b: a and b, result, step)
+                current = right
+            return result
+        return compare
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        func = FUNCTIONS.get(node.func.id)
+        if func is None:
+            raise RuleError(f"Unknown function '{node.func.id}' (available: {', '.join(FUNCTIONS)})")
+        if len(node.args) != 1:
+            raise RuleError(f"Function '{node.func.id}' takes exactly one argument")
+        if func is _count and isinstance(node.args[0], ast.Name) and node.args[0].id == "rows":
+            # count(rows) 为查询实际返回的行数（结果被截断时也是完整的行数）
+            return lambda context: context.row_count
+        argument = _compile(node.args[0])
+        return lambda context: func(argument(context))
+
+    raise RuleError(f"Unsupported syntax: {type(node).__name__}")
+
+
+class Rule:
+    """
+    编译后的检查规则，例如 all(age_remain > 1e8)、count(rows) == 0。
+    表达式在加载检查配置时解析并编译为闭包，之后每次执行只调用闭包，不再解析表达式。
+    表达式中的名称对应结果的列（一列的所有行），count(rows) 和 row_count 为查询实际返回的行数。
+    """
+
+    __slots__ = ("expression", "_evaluate")
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        try:
+            tree = ast.parse(self.expression, mode="eval")
+        except SyntaxError as e:
+            raise RuleError(f"Invalid rule '{self.expression}': {e.msg}")
+        self._evaluate = _compile(tree.body)
+
+    def evaluate(self, rows, columns=None, row_count=None) -> bool:
+        """
+        对查询结果执行规则
+        :return: 规则是否通过；结果为列时所有行都满足才通过
+        """
+        value = self._evaluate(RuleContext(rows, columns, row_count))
+        return _all(value)
+
+    def __reduce__(self):
+        # 配置缓存中只保存表达式，加载时重新编译
+        return compile_rule, (self.expression,)
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and other.expression == self.expression
+
+    def __hash__(self):
+        return hash(self.expression)
+
+    def __str__(self):
+        return self.expression
+
+    def __repr__(self):
+        return f"Rule({self.expression!r})"
+
+
+@lru_cache(maxsize=None)
+def compile_rule(expression: str) -> Rule:
+    """
+    编译规则表达式，相同的表达式只编译一次
+    :raise RuleError: 表达式无法解析或包含不支持的语法
+    """
+    return Rule(expression)
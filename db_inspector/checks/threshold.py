@@ -0,0 +1,137 @@
+import math
+import operator
+
+from db_inspector.checks.base import CheckItemResult, Status, format_rows
+
+try:
+    # 可选依赖：安装 NumPy 后对整列数值一次完成比较
+    import numpy
+except ImportError:
+    numpy = None
+
+# 比较操作符 -> (比较函数, 说明)，结果行的值满足比较时通过
+COMPARISONS = {
+    "greater_than": (operator.gt, ">"),
+    "greater_or_equal": (operator.ge, ">="),
+    "less_than": (operator.lt, "<"),
+    "less_or_equal": (operator.le, "<="),
+    "equal_to": (operator.eq, "=="),
+    "not_equal_to": (operator.ne, "!="),
+}
+
+
+class ThresholdError(ValueError):
+    """
+    阈值检查配置或结果无法比较（列不存在、值不是数值等）
+    """
+
+
+def column_index(columns, threshold_column):
+    """
+    确定参与比较的列
+    :param columns: 结果的列名
+    :param threshold_column: 列名或从 0 开始的列序号，为空时使用最后一列
+    """
+    if threshold_column in ("", None):
+        return -1
+    if isinstance(threshold_column, int) or str(threshold_column).isdigit():
+        return int(threshold_column)
+    if not columns or threshold_column not in columns:
+        raise ThresholdError(f"Column '{threshold_column}' not found in query result (columns: {', '.join(columns or ())})")
+    return list(columns).index(threshold_column)
+
+
+def column_values(rows, index, column):
+    """
+    取出参与比较的列，转换为浮点数（NULL 转换为 NaN，不参与比较）
+    :param column: 列名（用于错误信息）
+    :return: NumPy 数组，未安装 NumPy 时为列表
+    """
+    try:
+        values = [row[index] for row in rows]
+    except IndexError:
+        raise ThresholdError(f"Column {column} not found in query result")
+    try:
+        if numpy is not None:
+            # Decimal 和数值字符串由 NumPy 直接转换为 float64，None 转换为 NaN
+            return numpy.array(values, dtype=float)
+        return [math.nan if value is None else float(value) for value in values]
+    except (TypeError, ValueError) as e:
+        raise ThresholdError(f"Column {column} contains non-numeric values: {e}")
+
+
+def compare(values, comparison, expected):
+    """
+    对整列数值执行比较
+    :return: (每行是否违反阈值, 最差值的行序号)；没有可比较的值时最差值序号为 None
+    """
+    compare_func = COMPARISONS[comparison][0]
+    if numpy is not None:
+        valid = ~numpy.isnan(values)
+        breached = valid & ~compare_func(values, expected)
+        if not valid.any():
+            return breached, None
+        # 最差值：大于类比较取最小值，小于类比较取最大值，等于类比较取偏离预期值最远的值
+        if comparison.startswith("greater"):
+            worst = numpy.where(valid, values, numpy.inf).argmin()
+        elif comparison.startswith("less"):
+            worst = numpy.where(valid, values, -numpy.inf).argmax()
+        elif comparison == "equal_to":
+            worst = numpy.where(valid, numpy.abs(values - expected), -1).argmax()
+        else:
+            worst = breached.argmax() if breached.any() else valid.argmax()
+        return breached.tolist(), int(worst)
+
+    valid = [not math.isnan(value) for value in values]
+    breached = [ok and not compare_func(value, expected) for value, ok in zip(values, valid)]
+    candidates = [index for index, ok in enumerate(valid) if ok]
+    if not candidates:
+        return breached, None
+    if comparison.startswith("greater"):
+        worst = min(candidates, key=lambda index: values[index])
+    elif comparison.startswith("less"):
+        worst = max(candidates, key=lambda index: values[index])
+    elif comparison == "equal_to":
+        worst = max(candidates, key=lambda index: abs(values[index] - expected))
+    else:
+        worst = next((index for index in candidates if breached[index]), candidates[0])
+    return breached, worst
+
+
+def evaluate_threshold(check_name, rows, columns, comparison, expected_value, threshold_column="", row_count=None, truncated=False):
+    """
+    将结果中每一行的指定列与预期值比较，任意一行违反阈值时检查失败
+    :param rows: 查询结果行（保留原始类型）
+    :param columns: 结果的列名
+    :param comparison: 比较操作符（见 COMPARISONS）
+    :param expected_value: 阈值
+    :param threshold_column: 参与比较的列名或列序号，为空时使用最后一列
+    :param row_count: 查询实际返回的行数
+    :param truncated: 结果是否被截断（被截断的行不参与比较）
+    :return: CheckItemResult
+    """
+    def result(status, message, error=False):
+        return CheckItemResult(check_name, status, message, error=error, row_count=row_count, truncated=truncated, rows=rows, columns=columns)
+
+    if comparison not in COMPARISONS:
+        return result(Status.FAILURE.value, f"Unsupported comparison '{comparison}'", error=True)
+    try:
+        expected = float(expected_value)
+        index = column_index(columns, threshold_column)
+        column = columns[index] if columns and -len(columns) <= index < len(columns) else str(index)
+        values = column_values(rows, index, column)
+    except ValueError as e:
+        return result(Status.FAILURE.value, f"Threshold check failed: {e}", error=True)
+
+    breached, worst = compare(values, comparison, expected)
+    if worst is None:
+        return result(Status.FAILURE.value, "No numeric values to compare against the threshold.")
+
+    condition = f"{column} {COMPARISONS[comparison][1]} {expected_value}"
+    worst_value = rows[worst][index]
+    scope = f" (only the first {len(rows)} of {row_count} rows were checked)" if truncated else ""
+
+    breached_rows = [row for row, failed in zip(rows, breached) if failed]
+    if not breached_rows:
+        return result(Status.SUCCESS.value, f"All {len(rows)} rows satisfy {condition}, worst value {worst_value}{scope}")
+    return result(Status.FAILURE.value, f"{len(breached_rows)} of {len(rows)} rows breach {condition}, worst value {worst_value}{scope}:\n{format_rows(breached_rows)}")
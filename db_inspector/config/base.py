@@ -24,11 +24,19 @@ class GeneralConfig:
     default_report_dir: str = field(metadata={"remark": "默认报告保存目录"})
     # 配置的检查项组
     checks: List[Check] = field(default_factory=list,metadata={"remark": "配置的检查项组"})
+    # 连接数据库的超时时间（秒），0 表示不限制
+    connect_timeout: float = field(default=0, metadata={"remark": "连接超时时间（秒）"})
+    # 检查项默认的执行超时时间（秒），0 表示不限制
+    statement_timeout: float = field(default=0, metadata={"remark": "检查项默认执行超时时间（秒）"})
+    # 检查项默认等待锁的超时时间（秒），0 表示不限制
+    lock_timeout: float = field(default=0, metadata={"remark": "检查项默认等待锁超时时间（秒）"})
+    # 单个数据库所有检查的时间预算（秒），0 表示不限制
+    database_timeout: float = field(default=0, metadata={"remark": "单个数据库检查的时间预算（秒）"})
 
 # 数据库配置结构体
 @dataclass
 class Database:
-    # 数据库类型（如 postgres）
+    # 数据库类型（postgres 或 mongodb）
     type: str = field(metadata={"remark": "数据库类型"})
     # 数据库名称
     name: str = field(metadata={"remark": "数据库名称"})
@@ -36,6 +44,11 @@ class Database:
     uri: str = field(metadata={"remark": "数据库连接 URI"})
     # 数据库的检查项组
     checks: List[Check] = field(default_factory=list,metadata={"remark": "数据库的检查项组"})
+    # 超时配置，未配置时使用通用配置中的值
+    connect_timeout: float = field(default=0, metadata={"remark": "连接超时时间（秒）"})
+    statement_timeout: float = field(default=0, metadata={"remark": "检查项默认执行超时时间（秒）"})
+    lock_timeout: float = field(default=0, metadata={"remark": "检查项默认等待锁超时时间（秒）"})
+    database_timeout: float = field(default=0, metadata={"remark": "单个数据库检查的时间预算（秒）"})
 
 # 配置文件的结构体
 @dataclass
@@ -2,6 +2,7 @@ import os
 import json
 
 from db_inspector.checks.base import CheckItem, CheckGroup
+from db_inspector.checks.rule import RuleError, compile_rule
 from db_inspector.checks.constant import CheckConfig
 
 def load_config_from_json(file_path: str) -> CheckConfig:
@@ -36,6 +37,14 @@ def load_config_from_json(file_path: str) -> CheckConfig:
         for group_name, group_data in data.items():
             checks = {}
             for check_code,check_data in group_data['checks'].items() :
+                # 规则表达式在加载时编译，表达式有误时整个配置文件无效
+                rule = None
+                if check_data.get("rule"):
+                    try:
+                        rule = compile_rule(check_data["rule"])
+                    except RuleError as e:
+                        print(f"Error: Invalid rule for check '{check_code}' in '{file_path}'. {str(e)}")
+                        return None
                 check = CheckItem(
                     name=check_data["name"],
                     type=check_data["type"],
@@ -43,9 +52,19 @@ def load_config_from_json(file_path: str) -> CheckConfig:
                     remark=check_data["remark"],
                     query=check_data.get("query", ""),
                     command=check_data.get("command", ""),
+                    function=check_data.get("function", ""),
+                    path=check_data.get("path", ""),
                     expected_value=check_data.get("expected_value", ""),
                     check_type=check_data.get("check_type", ""),
-                    comparison=check_data.get("comparison", "")
+                    comparison=check_data.get("comparison", ""),
+                    timeout=check_data.get("timeout", 0),
+                    lock_timeout=check_data.get("lock_timeout", 0),
+                    ttl=check_data.get("ttl", 0),
+                    interval=check_data.get("interval", 0),
+                    max_rows=check_data.get("max_rows", 0),
+                    max_bytes=check_data.get("max_bytes", 0),
+                    threshold_column=check_data.get("threshold_column", ""),
+                    rule=rule
                 )
                 checks[check_code] = check
             group = CheckGroup(
@@ -0,0 +1,101 @@
+import dataclasses
+import hashlib
+import os
+import pickle
+import sys
+
+from db_inspector.checks.base import CheckConfig, CheckGroup, CheckItem
+from db_inspector.config.base import Check, Config, Database, GeneralConfig
+
+# 默认的配置缓存目录
+DEFAULT_CONFIG_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "db_inspector", "config")
+
+# 缓存中保存的配置结构，结构的字段变化后旧的缓存自动失效
+_CACHED_TYPES = (Config, GeneralConfig, Database, Check, CheckConfig, CheckGroup, CheckItem)
+
+
+def schema_signature() -> str:
+    """
+    配置结构（各个 dataclass 的字段名）的签名
+    """
+    names = ";".join(f"{cls.__name__}:{','.join(f.name for f in dataclasses.fields(cls))}" for cls in _CACHED_TYPES)
+    return hashlib.sha1(names.encode("utf-8")).hexdigest()
+
+
+def loader_signature(loader) -> str:
+    """
+    解析函数所在模块源文件内容的摘要，升级或修改解析逻辑后旧的缓存自动失效
+    """
+    module_file = getattr(sys.modules.get(loader.__module__), "__file__", None)
+    try:
+        with open(module_file, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (OSError, TypeError):
+        # 无法读取源文件时（如打包后的程序）使用函数的字节码
+        return hashlib.sha1(loader.__code__.co_code).hexdigest()
+
+
+class ConfigCache:
+    """
+    解析后配置的磁盘缓存，以 配置文件路径 + 修改时间 + 文件大小 + 配置结构签名 + 解析函数源码摘要 为键，
+    配置文件未变化时直接读取解析后的 Config / CheckConfig，不再重新解析 YAML 和 JSON。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CONFIG_CACHE_DIR):
+        """
+        :param cache_dir: 缓存目录，首次写入时创建
+        """
+        self.cache_dir = cache_dir
+
+    def cache_file(self, kind, file_path):
+        digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{kind}-{digest}.pickle")
+
+    @staticmethod
+    def file_key(file_path, loader):
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, schema_signature(), loader_signature(loader)
+
+    def load(self, kind, file_path, loader):
+        """
+        读取配置，缓存有效时直接返回缓存的结果，否则调用 loader 解析并写入缓存
+        :param kind: 配置类型（如 config、check_config），用于区分缓存文件
+        :param file_path: 配置文件路径
+        :param loader: 解析配置文件的函数 loader(file_path)，解析失败时返回 None
+        :return: 解析后的配置，解析失败时返回 None
+        """
+        try:
+            key = self.file_key(file_path, loader)
+        except OSError:
+            # 文件不存在等情况交给 loader 报告
+            return loader(file_path)
+
+        cache_file = self.cache_file(kind, file_path)
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_key, value = pickle.load(f)
+            if cached_key == key:
+                print(f"Configuration file '{file_path}' loaded from cache.")
+                return value
+        except Exception:
+            pass
+
+        value = loader(file_path)
+        if value is not None:
+            self.store(cache_file, key, value)
+        return value
+
+    def store(self, cache_file, key, value):
+        # 先写入临时文件再替换，并发运行时不会读到写了一半的缓存
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_file, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except Exception as e:
+            print(f"Warning: Failed to write configuration cache '{cache_file}': {e}")
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
@@ -1,9 +1,9 @@
 import os
-import toml
-import yaml
 
 from db_inspector.config.base import Config, GeneralConfig, Database, Check
 
+# toml 和 yaml 只在实际解析配置文件时导入（配置缓存命中时不需要），减少命令行启动时间
+
 
 def load_config_from_file_toml(file_path):
     """
@@ -26,6 +26,8 @@ def load_config_from_file_toml(file_path):
         print(f"Error: The file '{file_path}' is empty.")
         return None
 
+    import toml
+
     # 尝试解析 TOML 格式
     try:
         config = toml.load(file_path)
@@ -59,10 +61,14 @@ def load_config_from_yml(file_path: str) -> Config:
         print(f"Error: The file '{file_path}' is empty.")
         return None
 
+    import yaml
+    # 优先使用 libyaml 的 C 实现解析 YAML，未编译 libyaml 时使用纯 Python 实现
+    yaml_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
     # 尝试解析 JSON 格式
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=yaml_loader)
 
         print(f"Configuration file '{file_path}' loaded successfully.")
 
@@ -76,7 +82,11 @@ def load_config_from_yml(file_path: str) -> Config:
             default_report_dir=general_data.get("default_report_dir", "reports"),  # 默认报告目录
             checks=[
                 Check(**check) for check in general_data.get("checks", [])  # 如果没有 checks，则使用空列表
-            ]
+            ],
+            connect_timeout=general_data.get("connect_timeout", 0),  # 默认不限制
+            statement_timeout=general_data.get("statement_timeout", 0),
+            lock_timeout=general_data.get("lock_timeout", 0),
+            database_timeout=general_data.get("database_timeout", 0),
         )
 
         # 解析 databases 配置部分
@@ -86,7 +96,12 @@ def load_config_from_yml(file_path: str) -> Config:
                 type=db.get("type", "postgres"),  # 默认数据库类型为 postgres
                 name=db.get("name", ""),
                 uri=db.get("uri", ""),
-                checks=[Check(**check) for check in db.get("checks", [])]  # 如果没有 checks，则使用空列表
+                checks=[Check(**check) for check in db.get("checks", [])],  # 如果没有 checks，则使用空列表
+                # 超时配置未单独配置时使用通用配置
+                connect_timeout=db.get("connect_timeout", general_config.connect_timeout),
+                statement_timeout=db.get("statement_timeout", general_config.statement_timeout),
+                lock_timeout=db.get("lock_timeout", general_config.lock_timeout),
+                database_timeout=db.get("database_timeout", general_config.database_timeout),
             )
             for db in databases_data
         ]
@@ -0,0 +1,22 @@
+import math
+
+
+def create_client(uri, connect_timeout=0, socket_timeout=0):
+    """
+    创建 MongoDB 客户端（pymongo 在第一次连接 MongoDB 时才导入）
+    :param uri: MongoDB 连接串（mongodb:// 或 mongodb+srv://）
+    :param connect_timeout: 连接和选择服务器的超时时间（秒），0 表示使用 pymongo 的默认值
+    :param socket_timeout: 等待服务器响应的超时时间（秒），0 表示不限制
+    :return: pymongo.MongoClient
+    """
+    try:
+        from pymongo import MongoClient
+    except ImportError:
+        raise ImportError("MongoDB inspection requires pymongo, install it with: pip install pymongo")
+
+    options = {"appname": "db_inspector"}
+    if connect_timeout:
+        options["connectTimeoutMS"] = options["serverSelectionTimeoutMS"] = max(math.ceil(connect_timeout * 1000), 1)
+    if socket_timeout:
+        options["socketTimeoutMS"] = max(math.ceil(socket_timeout * 1000), 1)
+    return MongoClient(uri, **options)
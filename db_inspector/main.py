@@ -1,82 +1,184 @@
 import os
+import threading
 
 import click
 
 from db_inspector.config.check_config_loader import load_config_from_json
+from db_inspector.config.config_cache import ConfigCache
 from db_inspector.config.config_loader import load_config_from_yml
-from db_inspector.pipelines.base import PipelineManager
 from db_inspector.checks.constant import set_check_config
-from db_inspector.pipelines.pg_pipeline import PostgreSQLPipeline
-from db_inspector.reports.html_report import SummaryReportGenerator
-
-# 使用 click 解析命令行参数
-@click.command()
-@click.option('--config', type=click.Path(exists=True, readable=True), required=True, help="Path to the TOML configuration file")
-@click.option('--check-config', type=click.Path(exists=True, readable=True), required=True, help="Path to the JSON Check Item configuration file")
-@click.option('--report-format', type=click.Choice(['json', 'html'], case_sensitive=False), default='json', help="Format of the generated report")
-@click.option('--output-report-dir',type=click.Path(exists=True, readable=True),default='report', help="Path to the directory where the report will be saved")
-def main(config,check_config, report_format,output_report_dir):
+from db_inspector.pipelines.fleet import compile_fleet, run_fleet
+from db_inspector.pipelines.scheduler import CheckScheduler, DEFAULT_INTERVAL
+from db_inspector.reports.html_report import SummaryReportGenerator, precompile_templates, DEFAULT_SUMMARY_PAGE_SIZE, SUMMARY_SORT_KEYS
+from db_inspector.utils.connection import get_connection_pool
+from db_inspector.utils.result_cache import ResultCache, DEFAULT_CACHE_PATH
+from db_inspector.utils.shell_runner import get_shell_runner, DEFAULT_SHELL_CONCURRENCY
+
+# 巡检和守护进程共用的命令行参数
+COMMON_OPTIONS = [
+    click.option('--config', type=click.Path(exists=True, readable=True), required=True, help="Path to the TOML configuration file"),
+    click.option('--check-config', type=click.Path(exists=True, readable=True), required=True, help="Path to the JSON Check Item configuration file"),
+    click.option('--report-format', type=click.Choice(['json', 'html', 'jsonl'], case_sensitive=False), default='json', help="Format of the generated report; jsonl appends each check result to _results.jsonl as soon as it finishes"),
+    click.option('--compact', is_flag=True, default=False, help="Write JSON reports without indentation"),
+    click.option('--output-report-dir',type=click.Path(exists=True, readable=True),default='report', help="Path to the directory where the report will be saved"),
+    click.option('--workers', type=click.IntRange(min=1), default=1, help="Number of databases inspected concurrently"),
+    click.option('--batch', is_flag=True, default=False, help="Send all SQL checks of a database in one round trip using psycopg 3 pipeline mode (thread engine only)"),
+    click.option('--snapshot', is_flag=True, default=False, help="Run all SQL checks of a database in one READ ONLY REPEATABLE READ transaction (thread engine only)"),
+    click.option('--no-cache', is_flag=True, default=False, help="Ignore the result cache and run every check against the server"),
+    click.option('--no-config-cache', is_flag=True, default=False, help="Always re-parse the configuration files instead of using the parsed configuration cache"),
+    click.option('--cache-path', type=click.Path(dir_okay=False), default=DEFAULT_CACHE_PATH, show_default=True, help="Path to the on-disk result cache used by checks with a ttl"),
+    click.option('--summary-page-size', type=click.IntRange(min=0), default=DEFAULT_SUMMARY_PAGE_SIZE, show_default=True, help="Databases per summary page; larger fleets get an index page plus numbered pages (0 disables paging)"),
+    click.option('--summary-sort', type=click.Choice(['config'] + list(SUMMARY_SORT_KEYS), case_sensitive=False), default='config', show_default=True, help="Order of databases in the summary report; failure_count/warning_count put problem databases first"),
+    click.option('--target-timeout', type=click.FloatRange(min=0, min_open=True), default=None, help="Seconds after which an unfinished database inspection is cancelled and reported as timed out"),
+    click.option('--shell-concurrency', type=click.IntRange(min=1), default=DEFAULT_SHELL_CONCURRENCY, show_default=True, help="Maximum number of shell check commands running at the same time across all databases"),
+]
+
+
+def common_options(func):
+    for option in reversed(COMMON_OPTIONS):
+        func = option(func)
+    return func
+
+
+def load_configs(config_path, check_config_path, use_cache=True):
+    """
+    加载配置文件和检查项配置文件，并设置全局检查配置
+    :param use_cache: 是否使用解析后配置的磁盘缓存，配置文件未变化时不再重新解析
+    :return: Config 对象，加载失败时返回 None
+    """
+    config_cache = ConfigCache() if use_cache else None
     # 1. 加载配置文件
-    config = load_config_from_yml(config)
+    config = config_cache.load('config', config_path, load_config_from_yml) if config_cache else load_config_from_yml(config_path)
     if config is None:
         print("Failed to load configuration. Exiting...")
-        return
+        return None
 
     # 2. 读取检查项配置文件
-    checkConf = load_config_from_json(check_config)
+    checkConf = config_cache.load('check_config', check_config_path, load_config_from_json) if config_cache else load_config_from_json(check_config_path)
     if checkConf is None:
         print("Failed to load check configuration. Exiting...")
-        return
+        return None
     # 设置全局检查配置
     set_check_config(checkConf)
+    # 启动时解析所有数据库的检查项，所有管道共用解析结果
+    compile_fleet(config.databases, config.general.checks)
+    return config
 
-    # 循环所有的数据库,并将需要检查的检查项加载到pipeline中
-
-    # 用于存储所有数据库的检查结果
-    db_results = []
-
-    # 配置有效，继续进行后续操作
-    for databases in config.databases:
-        pipe = PipelineManager()
 
-        checks = config.general.checks
-        if databases.checks and len(databases.checks) > 0:
-            checks = databases.checks
+def open_result_writer(report_format, output_report_dir):
+    """
+    jsonl 格式时创建追加写入检查结果的写入器，其他格式返回 None
+    """
+    if report_format != 'jsonl':
+        return None
+    from db_inspector.reports.jsonl_report import JSONLinesWriter, JSONL_REPORT_FILE
+    return JSONLinesWriter(os.path.join(output_report_dir, JSONL_REPORT_FILE))
 
-        # 判断数据库类型 用switch case
-        if databases.type == 'postgres':
-            # 创建 PostgreSQL 管道实例
-            pipe = PostgreSQLPipeline(db_name=databases.name,db_uri=databases.uri, checks_conf=checks, report_format=report_format,report_dir=output_report_dir)
-        #TODO: Add support for other database types
-        else:
-            print(f"Unsupported database type: {databases.type}")
-            continue
 
-        pipe.parse_db_uri()
-        pipe.connect()
+def write_summary_report(db_results, output_report_dir, page_size=0, sort_by='config'):
+    # 生成汇总报告（数据库较多时分页），可以按错误或告警数量排序
+    summary_report_generator = SummaryReportGenerator(page_size=page_size, sort_by=None if sort_by == 'config' else sort_by)
+    summary_report = summary_report_generator.generate(db_results,output_file=os.path.join(output_report_dir, '_summary_report.html'))
+    print(f"Report for Summary:\n{summary_report}\n")
 
-        # 执行管道并获取结果
-        results = pipe.execute
-        db_results.append(results)
 
-        # 生成报告（JSON 格式）
-        report = pipe.generate_report(results)
-        print(f"Report for {databases.name}:\n{report}\n")
+# 使用 click 解析命令行参数
+@click.command()
+@common_options
+@click.option('--engine', type=click.Choice(['thread', 'async'], case_sensitive=False), default='thread', help="Execution engine: thread pool with psycopg2, or a single asyncio event loop with asyncpg")
+@click.option('--incremental', is_flag=True, default=False, help="Reuse results of the previous run and only re-run checks whose definition or target changed, or whose result is older than --max-age")
+@click.option('--max-age', type=click.FloatRange(min=0, min_open=True), default=3600, show_default=True, help="Seconds a previous result stays valid in incremental mode")
+def main(config,check_config, report_format, compact, output_report_dir, workers, batch, snapshot, no_cache, no_config_cache, cache_path, summary_page_size, summary_sort, target_timeout, shell_concurrency, engine, incremental, max_age):
+    # 批量模式和快照事务只在线程引擎（psycopg）中实现
+    if engine == 'async' and (batch or snapshot):
+        raise click.UsageError(f"{'--batch' if batch else '--snapshot'} is not supported with --engine async, use --engine thread")
+    config = load_configs(config, check_config, use_cache=not no_config_cache)
+    if config is None:
+        return
+    get_shell_runner().configure(shell_concurrency)
 
-        # 关闭数据库连接
-        pipe.close()
+    # 循环所有的数据库,并将需要检查的检查项加载到pipeline中
+    # 用于存储所有数据库的检查结果（与配置顺序一致）
+    # 配置了 ttl 的检查项使用磁盘结果缓存
+    if incremental and no_cache:
+        print("--incremental needs the result cache and cannot be combined with --no-cache. Exiting...")
+        return
+    result_cache = None if no_cache else ResultCache(cache_path)
+    # 增量巡检时复用上次运行的结果
+    max_age = max_age if incremental else None
+    # jsonl 格式在每个检查项完成后立即追加写入结果，汇总时只保留统计数量
+    result_writer = open_result_writer(report_format, output_report_dir)
+    stream_options = dict(result_writer=result_writer, keep_results=result_writer is None, compact_report=compact)
+    if engine == 'async':
+        # 异步引擎（asyncio、asyncpg）只在使用时导入
+        from db_inspector.pipelines.pg_async_pipeline import run_fleet_async
+        db_results = run_fleet_async(config.databases, config.general.checks, report_format=report_format, report_dir=output_report_dir, concurrency=workers, target_timeout=target_timeout, result_cache=result_cache, max_age=max_age, **stream_options)
+    else:
+        db_results = run_fleet(config.databases, config.general.checks, report_format=report_format, report_dir=output_report_dir, workers=workers, target_timeout=target_timeout, batch=batch, snapshot=snapshot, result_cache=result_cache, max_age=max_age, **stream_options)
+    if result_cache is not None:
+        result_cache.close()
+    if result_writer is not None:
+        result_writer.close()
+
+    # 关闭连接池中的空闲连接
+    get_connection_pool().close_all()
+
+    write_summary_report(db_results, output_report_dir, summary_page_size, summary_sort)
 
+    print("All checks completed.")
 
-    # 生成汇总报告
-    summary_report_generator = SummaryReportGenerator()
-    summary_report = summary_report_generator.generate(db_results,output_file=os.path.join(output_report_dir, '_summary_report.html'))
-    print(f"Report for Summary:\n{summary_report}\n")
 
-    print("All checks completed.")
+@click.command()
+@common_options
+@click.option('--interval', type=click.FloatRange(min=0, min_open=True), default=DEFAULT_INTERVAL, show_default=True, help="Seconds between runs of checks that do not set their own interval")
+def daemon(config, check_config, report_format, compact, output_report_dir, workers, batch, snapshot, no_cache, no_config_cache, cache_path, summary_page_size, summary_sort, target_timeout, shell_concurrency, interval):
+    """
+    守护进程模式：配置只加载一次，连接保持在连接池中复用，
+    每个检查项按各自的间隔执行，每轮结束后刷新报告
+    """
+    config = load_configs(config, check_config, use_cache=not no_config_cache)
+    if config is None:
+        return
+    get_shell_runner().configure(shell_concurrency)
+
+    result_cache = None if no_cache else ResultCache(cache_path)
+    result_writer = open_result_writer(report_format, output_report_dir)
+    # 启动时编译报告模板，之后每轮只需要渲染
+    precompile_templates()
+    scheduler = CheckScheduler(config.databases, config.general.checks, report_format=report_format, report_dir=output_report_dir,
+                               default_interval=interval, workers=workers, target_timeout=target_timeout,
+                               on_cycle=lambda db_results: write_summary_report(db_results, output_report_dir, summary_page_size, summary_sort),
+                               batch=batch, snapshot=snapshot, result_cache=result_cache, result_writer=result_writer, compact_report=compact)
+
+    # 收到 SIGTERM 时在当前一轮结束后退出
+    import signal
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        scheduler.run_forever(stop_event)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if result_cache is not None:
+            result_cache.close()
+        if result_writer is not None:
+            result_writer.close()
+        get_connection_pool().close_all()
+    print("Daemon stopped.")
+
+
+# 命令行入口：db_inspector run（单次巡检）和 db_inspector daemon（守护进程）
+@click.group()
+def cli():
+    pass
+
+
+cli.add_command(main, name='run')
+cli.add_command(daemon)
 
 
 if __name__ == "__main__":
-    main()
+    cli()
 
 
 
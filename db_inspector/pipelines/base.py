@@ -1,4 +1,63 @@
-from db_inspector.checks.base import BaseCheck
+from db_inspector.checks.base import BaseCheck, Status
+
+
+def build_db_result(db_name, check_results, keep_results=True):
+    """
+    汇总单个数据库的检查结果，生成报告使用的结果结构
+    :param db_name: 数据库名称
+    :param check_results: 检查结果列表或生成器（CheckItemResult），结果在汇总过程中逐个消费
+    :param keep_results: 是否保留每个检查项的结果，为 False 时只保留统计数量
+    :return: 与 PostgreSQLPipeline.execute 相同结构的结果
+    """
+    builder = DBResultBuilder(db_name, keep_results)
+    for result in check_results:
+        builder.add(result)
+    return builder.build()
+
+
+class DBResultBuilder:
+    """
+    逐个汇总单个数据库的检查结果（用于无法以普通迭代器提供结果的场景，如异步生成器）
+    """
+
+    def __init__(self, db_name, keep_results=True):
+        """
+        :param db_name: 数据库名称
+        :param keep_results: 是否保留每个检查项的结果，为 False 时只保留统计数量
+        """
+        self.db_name = db_name
+        self.keep_results = keep_results
+        self.kept = []
+        # 检查check_result 的正确错误的数量
+        self.successCnt, self.failureCnt, self.warningCnt, self.timeoutCnt = 0, 0, 0, 0
+
+    def add(self, result):
+        if self.keep_results:
+            self.kept.append(result)
+        if result.status == Status.SUCCESS.value:
+            self.successCnt += 1
+        elif result.status == Status.FAILURE.value:
+            self.failureCnt += 1
+        elif result.status == Status.WARNING.value:
+            self.warningCnt += 1
+        elif result.status == Status.TIMEOUT.value:
+            self.timeoutCnt += 1
+
+    def build(self):
+        """
+        :return: 与 PostgreSQLPipeline.execute 相同结构的结果
+        """
+        results = {
+            "db_name": self.db_name,
+            "check_results": self.kept,
+            "success_count": self.successCnt,
+            "failure_count": self.failureCnt,
+            "warning_count": self.warningCnt,
+            "timeout_count": self.timeoutCnt,
+            "report_link": f"{self.db_name}_report.html",
+        },
+
+        return results
 
 
 class PipelineManager:
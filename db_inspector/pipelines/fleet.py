@@ -0,0 +1,198 @@
+import threading
+import time
+from typing import List
+
+from db_inspector.checks.base import CANCEL_GRACE, CheckItemResult, Status
+from db_inspector.checks.plan import get_plan_compiler
+from db_inspector.config.base import Check, Database
+from db_inspector.pipelines.base import build_db_result
+from db_inspector.pipelines.pg_pipeline import PostgreSQLPipeline
+
+
+def select_checks(database: Database, default_checks: List[Check]) -> List[Check]:
+    """
+    获取数据库需要执行的检查项配置，数据库未单独配置检查项时使用通用配置
+    """
+    if database.checks and len(database.checks) > 0:
+        return database.checks
+    return default_checks
+
+
+def compile_fleet(databases: List[Database], default_checks: List[Check]):
+    """
+    启动时为所有数据库解析检查项配置，之后每个数据库的管道直接使用解析结果；
+    找不到的组和检查项在这里报告一次，而不是每个数据库报告一次
+    """
+    compiler = get_plan_compiler()
+    for database in databases:
+        compiler.compile(select_checks(database, default_checks))
+
+
+def create_pipeline(database: Database, default_checks: List[Check], report_format='json', report_dir='report', **pipeline_options):
+    """
+    根据数据库类型创建对应的检查管道
+    :param database: 数据库配置
+    :param default_checks: 通用检查项配置，数据库未单独配置检查项时使用
+    :param pipeline_options: 传递给管道的其他参数（如 batch）
+    :return: 管道实例，不支持的数据库类型返回 None
+    """
+    checks = select_checks(database, default_checks)
+
+    # 判断数据库类型
+    if database.type == 'postgres':
+        # 创建 PostgreSQL 管道实例
+        return PostgreSQLPipeline(db_name=database.name, db_uri=database.uri, checks_conf=checks, report_format=report_format, report_dir=report_dir,
+                                  connect_timeout=database.connect_timeout, statement_timeout=database.statement_timeout,
+                                  lock_timeout=database.lock_timeout, database_timeout=database.database_timeout,
+                                  **pipeline_options)
+    if database.type == 'mongodb':
+        # MongoDB 管道（及 pymongo）只在配置了 MongoDB 数据库时导入
+        from db_inspector.pipelines.mongodb_pipeline import MongoDBPipeline
+        return MongoDBPipeline(db_name=database.name, db_uri=database.uri, checks_conf=checks, report_format=report_format, report_dir=report_dir,
+                               connect_timeout=database.connect_timeout, statement_timeout=database.statement_timeout,
+                               lock_timeout=database.lock_timeout, database_timeout=database.database_timeout,
+                               **pipeline_options)
+    #TODO: Add support for other database types
+    print(f"Unsupported database type: {database.type}")
+    return None
+
+
+def failed_result(check_name, message, status=Status.FAILURE.value):
+    """
+    构造无法正常执行的检查结果（连接失败、超时等），与检查执行出错时一样标记为 error
+    """
+    return CheckItemResult(check_name, status, message, error=True)
+
+
+def failed_db_result(db_name, message, status=Status.FAILURE.value):
+    """
+    构造整个数据库巡检失败时的结果（连接失败、超时等）
+    :param status: 结果状态，巡检超时时为 Status.TIMEOUT.value
+    """
+    return build_db_result(db_name, [failed_result(db_name, message, status)])
+
+
+def inspect_database(database: Database, default_checks: List[Check], report_format='json', report_dir='report', **pipeline_options):
+    """
+    完成单个数据库的巡检：解析连接串、连接、执行检查、生成报告、关闭连接
+    :return: 数据库检查结果，不支持的数据库类型返回 None
+    """
+    pipe = create_pipeline(database, default_checks, report_format, report_dir, **pipeline_options)
+    if pipe is None:
+        return None
+
+    try:
+        pipe.parse_db_uri()
+        pipe.connect()
+
+        # 执行管道并获取结果
+        results = pipe.execute
+    except Exception as e:
+        print(f"Inspection of {database.name} failed: {e}")
+        results = failed_db_result(database.name, f"Inspection failed: {e}")
+    finally:
+        # 关闭数据库连接
+        pipe.close()
+
+    if pipe.is_cancelled():
+        # 巡检已经被记为超时，不再写入与超时结果不一致的报告
+        return None
+
+    # 生成报告
+    report = pipe.generate_report(results)
+    print(f"Report for {database.name}:\n{report}\n")
+    return results
+
+
+def run_fleet(databases: List[Database], default_checks: List[Check], report_format='json', report_dir='report', workers=1, target_timeout=None, **pipeline_options):
+    """
+    巡检所有数据库，返回按配置顺序排列的检查结果
+    :param workers: 并发巡检的数据库数量，1 表示逐个巡检
+    :param target_timeout: 单个数据库巡检的超时时间（秒），超时的数据库记为超时，不阻塞其他数据库
+    :param pipeline_options: 传递给管道的其他参数（如 batch）
+    :return: 数据库检查结果列表（顺序与配置一致）
+    """
+    def inspect(database, cancelled):
+        # 单个数据库的连接和所有检查都受截止时间限制，超时后查询被取消，工作线程随之结束
+        options = dict(pipeline_options, cancelled=cancelled)
+        if target_timeout:
+            options["deadline"] = time.monotonic() + target_timeout
+        return inspect_database(database, default_checks, report_format, report_dir, **options)
+
+    slots = run_targets(databases, inspect, workers, target_timeout)
+    return [results for results in slots if results is not None]
+
+
+def timed_out_result(database: Database, message, status=Status.FAILURE.value):
+    return failed_db_result(database.name, message, status)
+
+
+# 管道在截止时间后最多再等待 CANCEL_GRACE 取消正在执行的查询或命令，之后还要关闭连接、生成报告；
+# 执行器多等待这段时间，正常结束的管道自己报告超时的检查项，而不是被执行器整体记为超时
+TARGET_GRACE = 2 * CANCEL_GRACE + 1.0
+
+
+def run_targets(databases: List[Database], task, workers=1, target_timeout=None, on_timeout=timed_out_result, grace=TARGET_GRACE):
+    """
+    对每个数据库执行 task，可以并发执行并限制单个数据库的执行时间
+    :param task: 处理单个数据库的函数 task(database, cancelled)，返回该数据库的结果；
+                 cancelled 是 threading.Event，数据库被记为超时后设置，task 应随之停止且不再写入任何结果
+    :param workers: 并发处理的数据库数量，1 表示逐个处理
+    :param target_timeout: 单个数据库的超时时间（秒），task 应自行在这个时间内结束（如管道的 deadline）；
+                           超过 target_timeout + grace 仍未结束的数据库不再等待，记为超时
+    :param on_timeout: 超时或执行出错时调用 on_timeout(database, message, status)，返回值作为该数据库的结果
+    :param grace: 超过 target_timeout 后额外等待的时间（秒）
+    :return: 结果列表，顺序与 databases 一致
+    """
+    cancelled = [threading.Event() for _ in databases]
+    if workers <= 1 and target_timeout is None:
+        return [task(database, event) for database, event in zip(databases, cancelled)]
+
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    # 数据库序号 -> 开始执行的时间，排队中的数据库不计入超时
+    started = {}
+
+    def run_target(index):
+        started[index] = time.monotonic()
+        return task(databases[index], cancelled[index])
+
+    slots = [None] * len(databases)
+    # 线程数固定为 workers：超时的数据库在截止时间后结束并让出线程，线程数不会随卡住的数据库增长
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="db_inspector")
+    try:
+        pending = {executor.submit(run_target, index): index for index in range(len(databases))}
+        # 已经记为超时、仍在后台执行的数据库，它们结束时让出的线程会开始执行排队的数据库
+        abandoned = set()
+        while pending:
+            wait_time = None
+            if target_timeout is not None:
+                deadlines = [started[index] + target_timeout + grace for index in pending.values() if index in started]
+                if deadlines:
+                    wait_time = max(min(deadlines) - time.monotonic(), 0)
+            done, _ = wait(set(pending) | abandoned, timeout=wait_time, return_when=FIRST_COMPLETED)
+            abandoned -= done
+
+            for future in done:
+                index = pending.pop(future, None)
+                if index is None:
+                    continue
+                error = future.exception()
+                slots[index] = on_timeout(databases[index], f"Inspection failed: {error}", Status.FAILURE.value) if error is not None else future.result()
+
+            if target_timeout is None:
+                continue
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                if index in started and now - started[index] >= target_timeout + grace:
+                    # 通知管道停止，之后不再写入缓存、流式输出和报告
+                    cancelled[index].set()
+                    print(f"Inspection of {databases[index].name} timed out after {target_timeout}s")
+                    slots[index] = on_timeout(databases[index], f"Inspection timed out after {target_timeout}s", Status.TIMEOUT.value)
+                    del pending[future]
+                    abandoned.add(future)
+    finally:
+        # 不等待仍在后台执行的数据库，它们受截止时间限制，会自行结束
+        executor.shutdown(wait=False)
+
+    return slots
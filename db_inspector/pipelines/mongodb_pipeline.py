@@ -0,0 +1,99 @@
+from urllib.parse import urlparse, unquote
+
+from db_inspector.checks.base import CheckItem
+from db_inspector.checks.mongodb import MongoDBCheck, ServerSnapshot
+from db_inspector.checks.plan import ExecutionPlan
+from db_inspector.connectors.mongodb_connector import create_client
+from db_inspector.pipelines.pg_pipeline import PostgreSQLPipeline
+
+
+class MongoDBPipeline(PostgreSQLPipeline):
+    """
+    MongoDB 检查管道，检查计划、结果缓存、流式输出和报告与 PostgreSQLPipeline 一致。
+    每次巡检在同一个连接上最多执行一次 serverStatus、replSetGetStatus 和 hello（ServerSnapshot），
+    所有 MongoDB 检查都从这份快照中读取；Shell 和 Python 检查同样可用，Python 检查的连接参数为快照对象。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 批量模式和快照事务只适用于 PostgreSQL
+        self.batch = False
+        self.snapshot = False
+        self.server_snapshot = None
+
+    def parse_db_uri(self):
+        """
+        解析 MongoDB 连接串（支持多个主机，如副本集 mongodb://a:27017,b:27017/?replicaSet=rs0）。
+        密码只保留在连接串中，连接参数中不包含密码
+        """
+        parsed_uri = urlparse(self.db_uri)
+        self.db_type = parsed_uri.scheme
+        self.db_params = {
+            'user': unquote(parsed_uri.username) if parsed_uri.username else None,
+            'host': parsed_uri.netloc.rpartition('@')[2].lower(),
+            'dbname': parsed_uri.path[1:] or 'admin',
+        }
+
+        print(f"Database type: {self.db_type}")
+        print(f"Database parameters: {self.db_params}")
+
+    @property
+    def target(self):
+        # 主机列表中已经包含端口
+        return f"{self.db_params['host']}/{self.db_params['user'] or ''}/{self.db_params['dbname']}"
+
+    def connect(self):
+        """
+        连接 MongoDB，连接时执行的 hello 命令同时作为快照中的 hello 结果
+        """
+        if self.skip_connection():
+            return
+        try:
+            self.db_connection = create_client(self.db_uri, self.effective_connect_timeout, self.statement_timeout)
+            self.server_snapshot = ServerSnapshot(self.db_connection, self.statement_timeout)
+            self.server_snapshot.get("hello")
+            print("Database connection successful")
+        except Exception as e:
+            print(f"Failed to connect to database: {e}")
+            self.close()
+
+    def build_check(self, check_item: CheckItem):
+        """
+        根据检查项配置创建检查对象，SQL 检查不适用于 MongoDB
+        :return: 检查对象，类型无法识别时返回 None
+        """
+        if check_item.type == "mongodb":
+            # 创建一个读取服务器状态快照的检查对象
+            return MongoDBCheck(
+                query=check_item.path,
+                expected_value=check_item.expected_value,
+                comparison=check_item.comparison,
+                check_name=check_item.name,
+                timeout=check_item.timeout or self.statement_timeout,
+                max_rows=check_item.max_rows,
+                max_bytes=check_item.max_bytes,
+                check_type=check_item.check_type,
+                threshold_column=check_item.threshold_column,
+                rule=check_item.rule
+            )
+        if check_item.type == "sql":
+            return None
+        return super().build_check(check_item)
+
+    def run_plan(self, plan: ExecutionPlan, deadline=None):
+        """
+        按执行计划执行所有检查项，所有检查共用本次连接的服务器状态快照
+        :param deadline: 数据库时间预算的截止时间（time.monotonic()），为空表示不限制
+        :return: 检查结果的生成器
+        """
+        yield from plan.iter_run(self.server_snapshot, deadline=deadline)
+
+    def close(self):
+        """
+        关闭 MongoDB 客户端
+        """
+        if self.db_connection:
+            self.db_connection.close()
+            self.db_connection = None
+            self.server_snapshot = None
+            print("Database connection closed")
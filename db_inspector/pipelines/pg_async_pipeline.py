@@ -0,0 +1,298 @@
+import asyncio
+import inspect
+import threading
+from typing import List
+
+from db_inspector.checks.base import CANCEL_GRACE, CheckItemResult, Status, cap_timeout, timeout_milliseconds, timeout_settings
+from db_inspector.checks.check_run import SQLCheck, ShellCheck, PythonCheck, RowCollector, FETCH_SIZE, is_cursor_query, DEADLINE_MESSAGE
+from db_inspector.checks.plan import query_hash, evaluate_fetched, remaining_budget
+from db_inspector.config.base import Check, Database
+from db_inspector.pipelines.base import DBResultBuilder
+from db_inspector.pipelines.fleet import select_checks, failed_db_result, inspect_database
+from db_inspector.pipelines.pg_pipeline import PostgreSQLPipeline
+from db_inspector.utils.result_cache import CachedCheck
+
+# 游标一次 MOVE 的最大行数
+MAX_MOVE_COUNT = 2 ** 31 - 1
+
+
+class AsyncPostgreSQLPipeline(PostgreSQLPipeline):
+    """
+    基于 asyncpg 的 PostgreSQL 检查管道，检查项配置和结果结构与 PostgreSQLPipeline 一致，
+    多个数据库的检查可以在同一个事件循环中并发执行
+    """
+
+    async def connect(self):
+        """
+        创建与 PostgreSQL 数据库的异步连接
+        """
+        if self.skip_connection():
+            return
+        try:
+            import asyncpg
+        except ImportError:
+            raise ImportError("The async engine requires asyncpg, install it with: pip install asyncpg")
+
+        statement_timeout = self.session_statement_timeout()
+        server_settings = {}
+        if statement_timeout:
+            # 服务端兜底：客户端的超时未能取消查询（如网络中断）时，查询也会在服务端结束
+            server_settings['statement_timeout'] = str(timeout_milliseconds(statement_timeout + CANCEL_GRACE))
+        try:
+            self.db_connection = await asyncpg.connect(
+                user=self.db_params['user'],
+                password=self.db_params['password'],
+                host=self.db_params['host'],
+                port=self.db_params['port'],
+                database=self.db_params['dbname'],
+                timeout=self.effective_connect_timeout or 60,
+                # 没有指定超时的操作（如设置超时、开始事务、Python 检查中的查询）使用的默认超时
+                command_timeout=statement_timeout or None,
+                server_settings=server_settings,
+            )
+            print("Database connection successful")
+        except Exception as e:
+            print(f"Failed to connect to database: {e}")
+            self.db_connection = None
+
+    def session_statement_timeout(self):
+        """
+        连接级别的执行超时时间（秒）：计划中 SQL 检查的最长超时时间，不超过数据库的剩余时间预算
+        :return: 超时时间，0 表示不限制（有检查未配置超时且没有时间预算）
+        """
+        plan = self.prepare_plan()
+        timeouts = [check.timeout for check in plan.checks if isinstance(check, SQLCheck)] if plan is not None else []
+        longest = max(timeouts) if timeouts and all(timeouts) else 0
+        remaining = remaining_budget(self.check_deadline())
+        return cap_timeout(longest, None if remaining is None else max(remaining, 0.001))
+
+    async def fetch(self, check: SQLCheck, timeout=None):
+        """
+        异步执行 SQL 查询并返回结果行，查询通过游标逐批读取，超过 max_rows / max_bytes 后剩余的行只在服务端计数
+        :param timeout: 本次执行的超时时间（秒），默认使用检查项的超时配置，超时后 asyncpg 会取消查询
+        :return: FetchedRows
+        """
+        if timeout is None:
+            timeout = check.timeout
+        collector = RowCollector(check.max_rows, check.max_bytes)
+        if is_cursor_query(check.query):
+            # asyncpg 的游标需要在事务中使用，等待锁的超时只在事务内生效
+            async with self.db_connection.transaction():
+                if check.lock_timeout:
+                    await self.db_connection.execute("; ".join(timeout_settings(0, check.lock_timeout)))
+                cursor = await self.db_connection.cursor(check.query.strip().rstrip(";"), timeout=timeout or None)
+                while True:
+                    rows = await cursor.fetch(FETCH_SIZE, timeout=timeout or None)
+                    if rows and collector.columns is None:
+                        collector.columns = tuple(rows[0].keys())
+                    if not collector.add(tuple(row) for row in rows):
+                        # 超过上限后只统计剩余的行数（MOVE 的行数参数最大为 int4）
+                        while True:
+                            skipped = await cursor.forward(MAX_MOVE_COUNT, timeout=timeout or None)
+                            collector.skip(skipped)
+                            if skipped < MAX_MOVE_COUNT:
+                                break
+                        break
+                    if len(rows) < FETCH_SIZE:
+                        break
+            return collector.result()
+
+        if not check.lock_timeout:
+            # asyncpg 超时后会向服务端发送取消请求
+            rows = await self.db_connection.fetch(check.query, timeout=timeout or None)
+        else:
+            # asyncpg 的查询不能包含多条语句，等待锁的超时在会话级别设置，执行后恢复
+            await self.db_connection.execute("; ".join(timeout_settings(0, check.lock_timeout, local=False)))
+            try:
+                rows = await self.db_connection.fetch(check.query, timeout=timeout or None)
+            finally:
+                await self.db_connection.execute("RESET lock_timeout")
+        # asyncpg 返回 Record 对象，转换为元组后与 psycopg2 的结果格式保持一致
+        if rows:
+            collector.columns = tuple(rows[0].keys())
+        collector.add(tuple(row) for row in rows)
+        return collector.result()
+
+    async def run_check(self, check, timeout=None):
+        """
+        异步执行单个检查项
+        :param timeout: 本次执行的超时时间（秒），默认使用检查项的超时配置
+        """
+        if isinstance(check, SQLCheck):
+            return evaluate_fetched(check, await self.fetch(check, timeout))
+
+        if isinstance(check, ShellCheck):
+            if timeout is None:
+                timeout = check.timeout
+            return await self.collect_shell_check(check, check.submit(timeout), timeout)
+
+        if isinstance(check, PythonCheck):
+            # 同步函数直接在事件循环中调用（只适合很快完成的检查），异步函数在这里等待
+            try:
+                value = check.call(self.db_connection)
+                if inspect.isawaitable(value):
+                    value = await value
+            except Exception as e:
+                return check.failed(e)
+            return check.evaluate(value)
+
+        raise ValueError(f"Check {check!r} is not supported by the async pipeline")
+
+    @staticmethod
+    async def collect_shell_check(check: ShellCheck, future, timeout, deadline=None):
+        """
+        等待 Shell 执行器中的命令结束（不阻塞事件循环）并生成检查结果
+        :param deadline: 数据库时间预算的截止时间（time.monotonic()），超过后不再等待并取消命令
+        """
+        remaining = remaining_budget(deadline)
+        await asyncio.wait({asyncio.wrap_future(future)}, timeout=None if remaining is None else max(remaining, 0) + CANCEL_GRACE)
+        if not future.done():
+            future.cancel()
+            return check.failed(TimeoutError(DEADLINE_MESSAGE), timeout)
+        return check.collect(future, timeout)
+
+    async def execute_async(self):
+        """
+        异步执行所有检查项并返回结果
+        :return: 与 PostgreSQLPipeline.execute 相同结构的结果
+        """
+        plan = self.prepare_plan()
+        if plan is None or not plan.fully_cached:
+            if not self.db_connection:
+                raise ValueError("Database connection is not established")
+            if plan is None:
+                return
+
+        # 逐个汇总结果，keep_results 为 False 时不在内存中保留所有检查结果
+        builder = DBResultBuilder(self.db_name, keep_results=self.keep_results)
+        async for result in self.iter_execute_async():
+            builder.add(result)
+        return builder.build()
+
+    async def iter_execute_async(self):
+        """
+        依次异步执行所有检查项，每个检查项完成后立即返回其结果
+        :return: 检查结果（CheckItemResult）的异步生成器
+        """
+        plan = self.prepare_plan()
+        if plan is None:
+            return
+        if not plan.fully_cached and not self.db_connection:
+            raise ValueError("Database connection is not established")
+
+        # 数据库时间预算从开始执行检查时计算
+        deadline = self.check_deadline()
+
+        # 同一个连接上的查询只能依次执行，不同数据库之间并发；相同的查询只执行一次。
+        # Shell 检查在开始时全部提交，与查询同时执行
+        fetched = {}
+        shell_futures = plan.start_shell_checks(deadline)
+        try:
+            for check, check_item in zip(plan.checks, plan.items):
+                result = await self.run_planned_check(check, fetched, shell_futures, deadline)
+                self.record_result(check, check_item, result)
+                yield result
+        finally:
+            for future, _ in shell_futures.values():
+                future.cancel()
+
+    async def run_planned_check(self, check, fetched, shell_futures, deadline):
+        """
+        执行计划中的单个检查项
+        :param fetched: 本次执行中已经获取的查询结果（查询哈希 -> 结果行或异常），相同的查询只执行一次
+        :param shell_futures: 已经提交的 Shell 检查（见 ExecutionPlan.start_shell_checks）
+        """
+        # 使用缓存结果的检查不访问数据库
+        if isinstance(check, CachedCheck):
+            return check.run()
+
+        if isinstance(check, SQLCheck) and query_hash(check.query) in fetched:
+            return evaluate_fetched(check, fetched[query_hash(check.query)])
+
+        if id(check) in shell_futures:
+            future, timeout = shell_futures[id(check)]
+            return await self.collect_shell_check(check, future, timeout, deadline)
+
+        remaining = remaining_budget(deadline)
+        if remaining is not None and remaining <= 0:
+            return CheckItemResult(check.check_name, Status.TIMEOUT.value, "Database time budget exhausted before the check ran.", error=True)
+
+        if not isinstance(check, SQLCheck):
+            return await self.run_check(check, cap_timeout(getattr(check, 'timeout', 0), remaining))
+
+        key = query_hash(check.query)
+        try:
+            # 相同查询按组内最大的结果上限读取，每个检查在 evaluate 中按自己的上限截断
+            fetched[key] = await self.fetch(self.plan.fetch_checks.get(key, check), cap_timeout(check.timeout, remaining))
+        except Exception as e:
+            fetched[key] = e
+        return evaluate_fetched(check, fetched[key])
+
+    async def close(self):
+        """
+        关闭数据库连接
+        """
+        if self.db_connection:
+            await self.db_connection.close()
+            self.db_connection = None
+            print("Database connection closed")
+
+
+async def inspect_database_async(database: Database, default_checks: List[Check], report_format='json', report_dir='report', **pipeline_options):
+    """
+    异步完成单个数据库的巡检，流程与 fleet.inspect_database 一致
+    :return: 数据库检查结果，不支持的数据库类型返回 None
+    """
+    if database.type != 'postgres':
+        # 其他类型的数据库没有异步驱动，使用线程引擎的管道在工作线程中巡检，不阻塞事件循环
+        return await asyncio.to_thread(inspect_database, database, default_checks, report_format, report_dir, **pipeline_options)
+
+    pipe = AsyncPostgreSQLPipeline(db_name=database.name, db_uri=database.uri, checks_conf=select_checks(database, default_checks), report_format=report_format, report_dir=report_dir,
+                                   connect_timeout=database.connect_timeout, statement_timeout=database.statement_timeout,
+                                   lock_timeout=database.lock_timeout, database_timeout=database.database_timeout,
+                                   **pipeline_options)
+    try:
+        pipe.parse_db_uri()
+        await pipe.connect()
+        results = await pipe.execute_async()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Inspection of {database.name} failed: {e}")
+        results = failed_db_result(database.name, f"Inspection failed: {e}")
+    finally:
+        await pipe.close()
+
+    # 生成报告
+    report = pipe.generate_report(results)
+    print(f"Report for {database.name}:\n{report}\n")
+    return results
+
+
+async def _run_fleet_async(databases: List[Database], default_checks: List[Check], report_format, report_dir, concurrency, target_timeout, pipeline_options):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_target(database):
+        async with semaphore:
+            # 在工作线程中巡检的数据库无法被取消，超时后通过 cancelled 通知其管道不再写入结果
+            cancelled = threading.Event()
+            try:
+                return await asyncio.wait_for(inspect_database_async(database, default_checks, report_format, report_dir, cancelled=cancelled, **pipeline_options), timeout=target_timeout)
+            except asyncio.TimeoutError:
+                cancelled.set()
+                print(f"Inspection of {database.name} timed out after {target_timeout}s")
+                return failed_db_result(database.name, f"Inspection timed out after {target_timeout}s", Status.TIMEOUT.value)
+
+    return await asyncio.gather(*(run_target(database) for database in databases))
+
+
+def run_fleet_async(databases: List[Database], default_checks: List[Check], report_format='json', report_dir='report', concurrency=1, target_timeout=None, **pipeline_options):
+    """
+    在单个事件循环中巡检所有数据库，返回按配置顺序排列的检查结果
+    :param concurrency: 同时巡检的数据库数量上限
+    :param target_timeout: 单个数据库巡检的超时时间（秒），超时后取消该数据库的巡检
+    :param pipeline_options: 传递给管道的其他参数（如 result_cache）
+    :return: 数据库检查结果列表（顺序与配置一致）
+    """
+    slots = asyncio.run(_run_fleet_async(databases, default_checks, report_format, report_dir, max(concurrency, 1), target_timeout, pipeline_options))
+    return [results for results in slots if results is not None]
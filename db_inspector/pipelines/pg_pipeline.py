@@ -28,30 +28,44 @@
 #         self.cursor.execute("SELECT * FROM pg_stat_replication;")
 #         replication_info = self.cursor.fetchall()
 #         return {"replication_status": replication_info if replication_info else "No replication"}
-import json
+import math
 import os
+import time
 from typing import List
 from urllib.parse import urlparse
 
-from dataclasses import asdict
-
-import psycopg2
-
-from db_inspector.checks.base import BaseCheck, Status
-from db_inspector.checks.check_run import SQLCheck, ShellCheck
-from db_inspector.checks.constant import get_check_config
+from db_inspector.checks.base import BaseCheck, CheckItem, cap_timeout, snapshot_transaction
+from db_inspector.checks.check_run import SQLCheck, ShellCheck, PythonCheck, CheckContext
+from db_inspector.checks.plan import ExecutionPlan, compile_checks, definition_hash, remaining_budget
 from db_inspector.config.base import Check
 
-from db_inspector.pipelines.base import PipelineManager
-from db_inspector.reports.html_report import HTMLReportGenerator
+from db_inspector.pipelines.base import PipelineManager, build_db_result
+from db_inspector.utils.connection import get_connection_pool, target_key, DRIVER_PSYCOPG, DRIVER_PSYCOPG2
+from db_inspector.utils.result_cache import CachedCheck
 
 class PostgreSQLPipeline(PipelineManager):
-    def __init__(self,db_name=None,checks_conf:List[Check]=None,db_params=None, db_uri=None,checks=None,check_names=None, report_format='json',report_dir='report'):
+    def __init__(self,db_name=None,checks_conf:List[Check]=None,db_params=None, db_uri=None,checks=None,check_names=None, report_format='json',report_dir='report', batch=False, snapshot=False,
+                 connect_timeout=0, statement_timeout=0, lock_timeout=0, database_timeout=0, result_cache=None, max_age=None,
+                 result_writer=None, keep_results=True, compact_report=False, deadline=None, cancelled=None):
         """
         初始化 PostgreSQL 检查管道
         :param db_params: 数据库连接参数（如 host、dbname、user、password）
         :param checks: 可选，检查项列表，默认为空，允许传入需要执行的检查项
         :param report_format: 报告格式，默认为 'json'
+        :param batch: 是否使用 psycopg 3 的 pipeline 模式批量发送所有 SQL 检查
+        :param snapshot: 是否在同一个只读 REPEATABLE READ 事务中执行所有 SQL 检查
+        :param connect_timeout: 连接超时时间（秒），0 表示不限制
+        :param statement_timeout: 检查项未配置超时时间时使用的执行超时时间（秒）
+        :param lock_timeout: 检查项未配置时使用的等待锁超时时间（秒）
+        :param database_timeout: 所有检查的时间预算（秒），用完后剩余检查记为超时
+        :param result_cache: 可选，ResultCache 实例，配置了 ttl 的检查项在缓存有效期内不再查询数据库
+        :param max_age: 增量巡检时上次结果的最长有效时间（秒），为空表示不使用增量巡检；
+                        增量巡检只重新执行定义变化、目标变化或结果过期的检查项
+        :param result_writer: 可选，流式输出（如 JSONLinesWriter），每个检查项完成后立即写入其结果
+        :param keep_results: 是否在返回结果中保留每个检查项的结果，流式输出时可以只保留统计数量以节省内存
+        :param compact_report: JSON 报告是否使用紧凑格式（不缩进）
+        :param deadline: 可选，整个数据库巡检的截止时间（time.monotonic()），连接和所有检查都受其限制（单个数据库的巡检超时）
+        :param cancelled: 可选，threading.Event，巡检被放弃（超时）后设置，之后不再执行剩余的检查，也不再写入结果缓存和流式输出
         """
         self.db_name = db_name
         self.db_params = db_params
@@ -62,6 +76,23 @@ class PostgreSQLPipeline(PipelineManager):
         self.check_names = check_names if check_names else []  # 如果没有传入检查项，则使用空列表
         self.report_format = report_format
         self.report_dir = report_dir
+        self.batch = batch
+        self.snapshot = snapshot
+        self.connect_timeout = connect_timeout
+        self.statement_timeout = statement_timeout
+        self.lock_timeout = lock_timeout
+        self.database_timeout = database_timeout
+        self.result_cache = result_cache
+        self.max_age = max_age
+        self.result_writer = result_writer
+        self.keep_results = keep_results
+        # 已经流式输出的检查结果（只在保留结果时记录，用于生成报告时补写未输出的结果）
+        self.streamed_ids = set()
+        self.compact_report = compact_report
+        self.deadline = deadline
+        self.cancelled = cancelled
+        self.plan = None
+        self.driver = DRIVER_PSYCOPG if batch else DRIVER_PSYCOPG2
 
     def parse_db_uri(self):
         """
@@ -81,6 +112,10 @@ class PostgreSQLPipeline(PipelineManager):
             'port': parsed_uri.port,
             'dbname': parsed_uri.path[1:],  # 去掉开头的 '/'
         }
+        connect_timeout = self.effective_connect_timeout
+        if connect_timeout:
+            # libpq 的 connect_timeout 只支持整数秒
+            self.db_params['connect_timeout'] = max(math.ceil(connect_timeout), 1)
 
         print(f"Database type: {self.db_type}")
         print(f"Database parameters: {self.db_params}")
@@ -95,10 +130,12 @@ class PostgreSQLPipeline(PipelineManager):
 
     def connect(self):
         """
-        创建与 PostgreSQL 数据库的连接
+        从进程级连接池借用与 PostgreSQL 数据库的连接
         """
+        if self.skip_connection():
+            return
         try:
-            self.db_connection = psycopg2.connect(**self.db_params)
+            self.db_connection = get_connection_pool().acquire(self.db_params, self.driver)
             if  not self.db_connection:
                 raise ValueError("Database connection is not established")
 
@@ -107,107 +144,222 @@ class PostgreSQLPipeline(PipelineManager):
             print(f"Failed to connect to database: {e}")
             self.db_connection = None
 
+    def resolve_check_items(self):
+        """
+        根据检查项配置解析出需要执行的检查项（解析结果由使用相同配置的数据库共用）
+        :return: CheckItem 元组，检查配置未加载时返回 None
+        """
+        return compile_checks(self.checks_conf)
+
+    def build_check(self, check_item: CheckItem):
+        """
+        根据检查项配置创建检查对象
+        :param check_item: 检查项配置
+        :return: 检查对象，类型无法识别时返回 None
+        """
+        if check_item.type == "sql":
+            # 创建一个 SQL 检查对象
+            return SQLCheck(
+                query=check_item.query,
+                expected_value=check_item.expected_value,
+                comparison=check_item.comparison,
+                check_name=check_item.name,
+                timeout=check_item.timeout or self.statement_timeout,
+                lock_timeout=check_item.lock_timeout or self.lock_timeout,
+                max_rows=check_item.max_rows,
+                max_bytes=check_item.max_bytes,
+                check_type=check_item.check_type,
+                threshold_column=check_item.threshold_column,
+                rule=check_item.rule
+            )
+        elif check_item.type == "shell":
+            # 创建一个 Shell 检查对象
+            return ShellCheck(
+                command=check_item.command,
+                expected_value=check_item.expected_value,
+                check_name=check_item.name,
+                timeout=check_item.timeout or self.statement_timeout,
+                max_bytes=check_item.max_bytes
+            )
+        elif check_item.type == "python":
+            # 创建一个在进程内调用函数的检查对象，不需要创建子进程
+            return PythonCheck(
+                function=check_item.function,
+                expected_value=check_item.expected_value,
+                check_name=check_item.name,
+                context=CheckContext(self.db_name, self.db_params, check_item)
+            )
+        return None
+
+    def build_plan(self):
+        """
+        为当前数据库构建检查执行计划，相同的查询只执行一次
+        :return: ExecutionPlan，检查配置未加载时返回 None
+        """
+        check_items = self.resolve_check_items()
+        if check_items is None:
+            return None
+
+        checks = list(self.checks)
+        items = [None] * len(checks)
+        for check_item in check_items:
+            # 缓存中有未过期结果的检查项直接使用缓存结果
+            cached = self.load_cached_result(check_item)
+            check = CachedCheck(cached) if cached is not None else self.build_check(check_item)
+            if check is None:
+                print(f"Warning: Check '{check_item.code}' not recognized")
+                continue
+            checks.append(check)
+            items.append(check_item)
+        return ExecutionPlan(checks, items)
+
+    def prepare_plan(self):
+        """
+        构建并保存执行计划，同一个管道只构建一次（连接前判断是否需要连接时也会用到）
+        :return: ExecutionPlan，检查配置未加载时返回 None
+        """
+        if self.plan is None:
+            self.plan = self.build_plan()
+            if self.plan is not None and self.incremental:
+                reused = sum(1 for check in self.plan.checks if isinstance(check, CachedCheck))
+                print(f"Reusing {reused} of {len(self.plan.checks)} results of {self.db_name} from the last run")
+        return self.plan
+
     @property
-    def execute(self):
+    def effective_connect_timeout(self):
         """
-        执行所有检查项并返回结果
-        :return: 所有检查项的结果列表
+        连接超时时间（秒），受巡检截止时间限制，0 表示不限制
         """
-        if not self.db_connection:
-            raise ValueError("Database connection is not established")
+        return cap_timeout(self.connect_timeout, remaining_budget(self.deadline))
 
-        check_results = []
-        for check in self.checks:
-            result = check.run(self.db_connection)
-            check_results.append(result)
+    def check_deadline(self):
+        """
+        开始执行检查时计算数据库时间预算的截止时间，不晚于整个巡检的截止时间
+        :return: time.monotonic() 截止时间，为空表示不限制
+        """
+        deadline = time.monotonic() + self.database_timeout if self.database_timeout else None
+        if self.deadline is not None:
+            deadline = self.deadline if deadline is None else min(deadline, self.deadline)
+        return deadline
 
-        # 循环所有的检查项，将检查结果添加到列表中
-        for check_conf in self.checks_conf:
+    @property
+    def target(self):
+        """
+        数据库目标的规范化标识，用作结果缓存的键
+        """
+        return target_key(self.db_params)
 
-            # 检查检查项配置是否为空
-            if check_conf is None or check_conf.checks is None or len(check_conf.checks) == 0:
-                continue
+    @property
+    def incremental(self):
+        return self.result_cache is not None and self.max_age is not None
+
+    def skip_connection(self):
+        """
+        增量巡检中所有检查项都可以使用上次的结果时，不需要连接数据库
+        """
+        if not self.incremental:
+            return False
+        plan = self.prepare_plan()
+        if plan is None or not plan.fully_cached:
+            return False
+        print(f"All checks of {self.db_name} are up to date, skipping connection")
+        return True
+
+    def result_max_age(self, check_item: CheckItem):
+        """
+        检查项缓存结果的最长有效时间（秒），0 表示不使用缓存结果
+        """
+        if self.incremental:
+            # 增量巡检时所有检查项都可以复用上次的结果，配置了更长 ttl 的检查项按 ttl 计算
+            return max(check_item.ttl, self.max_age)
+        return check_item.ttl
 
-            # 读取检查项配置文件
-            current_check_config = get_check_config()
+    def load_cached_result(self, check_item: CheckItem):
+        """
+        读取检查项在结果缓存中未过期的结果
+        :return: CheckItemResult，未启用缓存、检查项未配置 ttl 或缓存已过期时返回 None
+        """
+        max_age = self.result_max_age(check_item) if self.result_cache is not None else 0
+        if not max_age:
+            return None
+        return self.result_cache.get(self.target, check_item.code, definition_hash(check_item), max_age)
 
-            print(f"current_check_config:{current_check_config}")
+    def record_result(self, check: BaseCheck, check_item: CheckItem, result):
+        """
+        处理刚完成的检查结果：写入结果缓存（增量巡检时保存所有检查项，否则只保存配置了 ttl 的检查项），
+        并追加到流式输出
+        """
+        if self.is_cancelled():
+            # 巡检已经被记为超时，迟到的结果不再写入
+            return
+        if self.result_cache is not None and check_item is not None and not isinstance(check, CachedCheck) and self.result_max_age(check_item):
+            self.result_cache.put(self.target, check_item.code, definition_hash(check_item), result)
+        if self.result_writer is not None:
+            self.result_writer.write(self.db_name, result)
+            if self.keep_results:
+                self.streamed_ids.add(id(result))
 
-            if current_check_config is None or current_check_config.check_groups is None or len(current_check_config.check_groups) == 0:
-                print("Failed to load check configuration. Exiting...")
+    @property
+    def execute(self):
+        """
+        执行所有检查项并返回结果
+        :return: 所有检查项的结果列表
+        """
+        plan = self.prepare_plan()
+        if plan is None or not plan.fully_cached:
+            if not self.db_connection:
+                raise ValueError("Database connection is not established")
+            if plan is None:
                 return
 
-            print(f"current_check_config.check_groups:{current_check_config.check_groups}")
+        return build_db_result(self.db_name, self.iter_execute(), keep_results=self.keep_results)
 
-            if current_check_config.check_groups.get(check_conf.group) is None:
-                print(f"Check group '{check_conf.group}' not found in configuration")
-                continue
+    def iter_execute(self):
+        """
+        依次执行所有检查项，每个检查项完成后立即返回其结果
+        :return: 检查结果（CheckItemResult）的生成器
+        """
+        plan = self.prepare_plan()
+        if plan is None:
+            return
+
+        if plan.fully_cached:
+            # 所有检查项都使用缓存结果，不访问数据库
+            check_results = plan.iter_run(None)
+        elif not self.db_connection:
+            raise ValueError("Database connection is not established")
+        else:
+            # 数据库时间预算从开始执行检查时计算
+            check_results = self.run_plan(plan, self.check_deadline())
 
+        for check, check_item, result in zip(plan.checks, plan.items, check_results):
+            if self.is_cancelled():
+                return
+            self.record_result(check, check_item, result)
+            yield result
 
-            for check in check_conf.checks:
-                if current_check_config.check_groups[check_conf.group].checks[check] is None:
-                    print(f"Check '{check}' not found in group '{check_conf.group}'")
-                    continue
-
-                # TODO 执行配置
-                check_item = current_check_config.check_groups[check_conf.group].checks[check]
-
-                if check_item.type == "sql":
-                    # 创建一个 SQL 检查对象
-                    sql_check = SQLCheck(
-                        query=check_item.query,
-                        expected_value=check_item.expected_value,
-                        comparison=check_item.comparison,
-                        check_name=check_item.name
-                    )
-                    # 执行 SQL 检查
-                    result = sql_check.run(self.db_connection)
-                    check_results.append(result)
-                elif check_item.type == "shell":
-                    # 创建一个 Shell 检查对象
-                    shell_check = ShellCheck(
-                        command=check_item.command,
-                        expected_value=check_item.expected_value,
-                        check_name=check_item.name
-                    )
-                    # 执行 Shell 检查
-                    result = shell_check.run()
-                    check_results.append(result)
-                else:
-                    print(f"Warning: Check '{check}' not recognized")
-            #
-            # check_name = check_conf.name
-            # check_params = check_conf.params
-            # if check_name in CHECKS_MAP:
-            #     check_class = CHECKS_MAP[check_name]
-            #     check_instance = check_class(**check_params)
-            #     result = check_instance.run(self.db_connection)
-            #     check_results.append(result)
-            # else:
-            #     print(f"Warning: Check '{check_name}' not recognized")
-
-
-
-        # 检查check_result 的正确错误的数量
-        successCnt, failureCnt,warningCnt= 0,0,0
-        for result in check_results:
-            if result.status == Status.SUCCESS.value:
-                successCnt += 1
-            elif result.status == Status.FAILURE.value:
-                failureCnt += 1
-            elif result.status == Status.WARNING.value:
-                warningCnt += 1
-
-        results = {
-            "db_name": self.db_name,
-            "check_results": check_results,
-            "success_count": successCnt,
-            "failure_count": failureCnt,
-            "warning_count": warningCnt,
-            "report_link":f"{self.db_name}_report.html",
-        },
-
-        return results
+    def is_cancelled(self):
+        return self.cancelled is not None and self.cancelled.is_set()
+
+    def run_plan(self, plan: ExecutionPlan, deadline=None):
+        """
+        按执行计划执行所有检查项
+        :param deadline: 数据库时间预算的截止时间（time.monotonic()），为空表示不限制
+        :return: 检查结果的生成器
+        """
+        if self.snapshot:
+            # 所有 SQL 检查共享同一个只读快照，每个检查通过保存点隔离
+            with snapshot_transaction(self.db_connection):
+                yield from self._run_plan(plan, deadline)
+        else:
+            yield from self._run_plan(plan, deadline)
+
+    def _run_plan(self, plan: ExecutionPlan, deadline=None):
+        # 批量模式下先一次性发送所有不同的查询
+        prefetched = plan.prefetch_pipelined(self.db_connection, self.snapshot, deadline) if self.batch else None
+
+        # 按执行计划执行所有检查项，逐个返回检查结果
+        yield from plan.iter_run(self.db_connection, prefetched, self.snapshot, deadline)
 
     def generate_report(self, results):
         """
@@ -216,8 +368,24 @@ class PostgreSQLPipeline(PipelineManager):
         :return: 报告字符串
         """
         if self.report_format == 'json':
-            return json.dumps(results, indent=4)
+            # 报告生成器在需要时才导入（JSON 报告可能使用 orjson，HTML 报告使用 Jinja2）
+            from db_inspector.reports.json_report import JSONReportGenerator
+            report_generator = JSONReportGenerator(compact=self.compact_report)
+            # 生成 JSON 报告并直接写入到文件
+            return report_generator.generate(results, output_file=os.path.join(self.report_dir, f"{self.db_name}_report.json"))
+        elif self.report_format == 'jsonl':
+            path = self.result_writer.output_file if self.result_writer is not None else None
+            if not results:
+                return f"No checks to run; nothing appended to {path}"
+            # 检查结果已经在执行过程中逐条写入，这里只补写没有经过流式输出的结果（如连接失败、执行中途失败）；
+            # 不保留结果时返回的结果中只有巡检失败的结果，它们都没有经过流式输出
+            if self.result_writer is not None:
+                for result in results[0]["check_results"]:
+                    if id(result) not in self.streamed_ids:
+                        self.result_writer.write(self.db_name, result)
+            return f"{results[0]['success_count']} succeeded, {results[0]['failure_count']} failed, {results[0]['warning_count']} warnings, {results[0]['timeout_count']} timed out; results appended to {path}"
         elif self.report_format == 'html':
+            from db_inspector.reports.html_report import HTMLReportGenerator
             report_generator = HTMLReportGenerator()
             # 生成 HTML 报告并写入到文件 report.html
             html_report = report_generator.generate(results, output_file=os.path.join(self.report_dir, f"{self.db_name}_report.html"))
@@ -227,8 +395,9 @@ class PostgreSQLPipeline(PipelineManager):
 
     def close(self):
         """
-        关闭数据库连接
+        将数据库连接归还到连接池
         """
         if self.db_connection:
-            self.db_connection.close()
-            print("Database connection closed")
+            get_connection_pool().release(self.db_params, self.db_connection, self.driver)
+            self.db_connection = None
+            print("Database connection released")
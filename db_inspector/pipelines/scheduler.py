@@ -0,0 +1,247 @@
+import math
+import threading
+import time
+import zlib
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+from db_inspector.checks.base import CheckItem, CheckItemResult, Status
+from db_inspector.checks.plan import get_plan_compiler
+from db_inspector.config.base import Check, Database
+from db_inspector.pipelines.base import build_db_result
+from db_inspector.pipelines.fleet import create_pipeline, failed_result, run_targets, select_checks
+
+# 检查项未配置 interval 时的默认执行间隔（秒）
+DEFAULT_INTERVAL = 300
+
+
+def check_phase(db_name, group, code):
+    """
+    根据数据库和检查项计算稳定的相位（0~1），相同间隔的检查在间隔内错开执行，避免同时访问数据库
+    """
+    return (zlib.crc32(f"{db_name}/{group}/{code}".encode("utf-8")) % 10000) / 10000
+
+
+def next_slot(anchor, interval, phase, now):
+    """
+    计算检查项在 now 之后的下一个执行时间。
+    执行时间固定为 anchor + phase * interval + k * interval，单次执行耗时不会让后续的执行时间漂移
+    """
+    offset = anchor + phase * interval
+    if now < offset:
+        return offset
+    return offset + (math.floor((now - offset) / interval) + 1) * interval
+
+
+class ScheduledCheck:
+    """
+    守护进程中一个数据库的一个检查项及其下一次执行时间
+    """
+
+    def __init__(self, group: str, check_item: CheckItem, interval: float, phase: float, next_due: float):
+        self.group = group
+        self.check_item = check_item
+        self.interval = interval
+        self.phase = phase
+        self.next_due = next_due
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.group, self.check_item.code
+
+
+class CheckScheduler:
+    """
+    守护进程的检查调度器。
+    配置只解析一次，每个检查项按各自的间隔（检查配置中的 interval）执行，
+    每轮只连接有到期检查的数据库（连接来自进程级连接池，保持复用），
+    到期检查的结果与其他检查的最近结果合并后刷新报告。
+    """
+
+    def __init__(self, databases: List[Database], default_checks: List[Check], report_format='json', report_dir='report',
+                 default_interval=DEFAULT_INTERVAL, workers=1, target_timeout=None, on_cycle=None, **pipeline_options):
+        """
+        :param default_interval: 检查项未配置 interval 时的执行间隔（秒）
+        :param workers: 每轮并发巡检的数据库数量
+        :param target_timeout: 单个数据库一轮巡检的超时时间（秒）
+        :param on_cycle: 可选，每轮结束后调用 on_cycle(db_results)，用于刷新汇总报告
+        :param pipeline_options: 传递给管道的其他参数（如 batch）
+        """
+        self.databases = databases
+        self.default_checks = default_checks
+        self.report_format = report_format
+        self.report_dir = report_dir
+        self.default_interval = default_interval
+        self.workers = workers
+        self.target_timeout = target_timeout
+        self.on_cycle = on_cycle
+        self.pipeline_options = pipeline_options
+        # 数据库序号 -> 按配置顺序排列的检查项
+        self.schedule: Dict[int, List[ScheduledCheck]] = {}
+        # 数据库序号 -> (组名, 检查项 code) -> 最近一次的检查结果
+        self.latest: Dict[int, Dict[Tuple[str, str], CheckItemResult]] = {}
+        self._lock = threading.Lock()
+        # 上一轮超时后仍在后台执行的数据库序号，这些数据库在其执行结束前不开始新一轮巡检
+        self.in_flight = set()
+        # 调度的起始时间，所有检查项的执行时间以它为基准
+        self.anchor = time.monotonic()
+        self.build_schedule()
+
+    def build_schedule(self):
+        """
+        解析所有数据库的检查项，启动后第一轮执行所有检查，之后按各自的间隔和相位执行
+        """
+        compiler = get_plan_compiler()
+        for index, database in enumerate(self.databases):
+            entries = []
+            for group, check_item in compiler.compile_with_groups(select_checks(database, self.default_checks)) or ():
+                interval = check_item.interval or self.default_interval
+                entries.append(ScheduledCheck(group, check_item, interval, check_phase(database.name, group, check_item.code), self.anchor))
+            self.schedule[index] = entries
+            self.latest[index] = {}
+
+    def next_due(self):
+        """
+        所有检查项中最早的下一次执行时间（time.monotonic()），没有检查项时返回 None
+        """
+        return min((entry.next_due for entries in self.schedule.values() for entry in entries), default=None)
+
+    def due_checks(self, now) -> Dict[int, List[ScheduledCheck]]:
+        """
+        取出到期的检查项并安排它们的下一次执行时间
+        :return: 数据库序号 -> 到期的检查项
+        """
+        due = {}
+        for index, entries in self.schedule.items():
+            for entry in entries:
+                if entry.next_due <= now:
+                    due.setdefault(index, []).append(entry)
+                    # 两次执行至少间隔半个周期（启动后的第一轮之后按相位错开）
+                    entry.next_due = next_slot(self.anchor, entry.interval, entry.phase, now + entry.interval / 2)
+        return due
+
+    def run_cycle(self, now=None):
+        """
+        执行一轮到期的检查，并刷新有新结果的数据库报告
+        :return: 所有数据库的最近检查结果（顺序与配置一致），本轮没有到期检查时返回 None
+        """
+        due = self.due_checks(time.monotonic() if now is None else now)
+        with self._lock:
+            skipped = [index for index in due if index in self.in_flight]
+            for index in skipped:
+                # 避免同一个数据库同时执行两轮巡检，本轮到期的检查在下一次执行时间再执行
+                print(f"Skipping {self.databases[index].name}: the previous inspection is still running")
+                del due[index]
+            self.in_flight.update(due)
+        if not due:
+            return None
+
+        indexes = sorted(due)
+        databases = [self.databases[index] for index in indexes]
+        positions = {id(database): index for database, index in zip(databases, indexes)}
+
+        def inspect(database, cancelled):
+            index = positions[id(database)]
+            try:
+                self.run_due_checks(index, database, due[index], cancelled)
+            finally:
+                with self._lock:
+                    self.in_flight.discard(index)
+            return index
+
+        def on_timeout(database, message, status):
+            index = positions[id(database)]
+            print(f"Inspection of {database.name} failed: {message}")
+            self.merge_failure(index, due[index], message, status)
+            return index
+
+        run_targets(databases, inspect, self.workers, self.target_timeout, on_timeout)
+
+        # jsonl 格式的结果在执行时已经逐条追加写入，不需要重新生成数据库报告
+        for index in indexes if self.report_format != 'jsonl' else []:
+            database = self.databases[index]
+            pipe = create_pipeline(database, self.default_checks, self.report_format, self.report_dir, **self.pipeline_options)
+            if pipe is not None:
+                pipe.generate_report(self.db_result(index))
+
+        db_results = self.db_results()
+        if self.on_cycle is not None:
+            self.on_cycle(db_results)
+        return db_results
+
+    def run_due_checks(self, index, database: Database, entries: List[ScheduledCheck], cancelled: threading.Event = None):
+        """
+        只对数据库执行到期的检查项，并将结果合并到最近结果中
+        :param cancelled: 可选，本轮巡检被记为超时后设置，之后不再合并结果
+        """
+        # 按组汇总到期的检查项，保持配置中的顺序
+        checks_conf = []
+        for entry in entries:
+            if not checks_conf or checks_conf[-1].group != entry.group:
+                checks_conf.append(Check(group=entry.group, checks=[]))
+            checks_conf[-1].checks.append(entry.check_item.code)
+
+        options = dict(self.pipeline_options, cancelled=cancelled)
+        if self.target_timeout:
+            # 连接和所有检查都受单个数据库超时时间的限制，超时后查询被取消
+            options["deadline"] = time.monotonic() + self.target_timeout
+        pipe = create_pipeline(replace(database, checks=checks_conf), self.default_checks, self.report_format, self.report_dir, **options)
+        if pipe is None:
+            return
+        try:
+            pipe.parse_db_uri()
+            pipe.connect()
+            results = pipe.execute
+            if results is not None and not pipe.is_cancelled():
+                self.merge_results(index, entries, pipe.plan.items, results[0]["check_results"])
+        except Exception as e:
+            print(f"Inspection of {database.name} failed: {e}")
+            if not pipe.is_cancelled():
+                self.merge_failure(index, entries, f"Inspection failed: {e}")
+        finally:
+            pipe.close()
+
+    def merge_results(self, index, entries: List[ScheduledCheck], plan_items, check_results):
+        keys = {id(entry.check_item): entry.key for entry in entries}
+        with self._lock:
+            for check_item, result in zip(plan_items, check_results):
+                if check_item is not None and id(check_item) in keys:
+                    self.latest[index][keys[id(check_item)]] = result
+
+    def merge_failure(self, index, entries: List[ScheduledCheck], message, status=Status.FAILURE.value):
+        """
+        数据库巡检失败（连接失败、超时等）时，将本轮到期的检查项记为失败
+        :param status: 结果状态，巡检超时时为 Status.TIMEOUT.value
+        """
+        result_writer = self.pipeline_options.get("result_writer")
+        with self._lock:
+            for entry in entries:
+                result = failed_result(entry.check_item.name, message, status)
+                self.latest[index][entry.key] = result
+                if result_writer is not None:
+                    result_writer.write(self.databases[index].name, result)
+
+    def db_result(self, index):
+        """
+        按配置顺序汇总数据库所有检查项的最近结果
+        """
+        with self._lock:
+            latest = self.latest[index]
+            check_results = [latest[entry.key] for entry in self.schedule[index] if entry.key in latest]
+        return build_db_result(self.databases[index].name, check_results)
+
+    def db_results(self):
+        return [self.db_result(index) for index in sorted(self.schedule) if self.latest[index]]
+
+    def run_forever(self, stop_event: threading.Event = None):
+        """
+        持续执行检查，直到 stop_event 被设置
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.run_cycle()
+            next_due = self.next_due()
+            if next_due is None:
+                print("No checks scheduled. Exiting...")
+                return
+            stop_event.wait(max(next_due - time.monotonic(), 0))
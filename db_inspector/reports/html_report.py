@@ -1,21 +1,18 @@
-from jinja2 import Environment, FileSystemLoader, Template
 import os
+import threading
 
-class HTMLReportGenerator:
-    def __init__(self, template_path=None):
-        """
-        初始化 HTMLReportGenerator
-        :param template_path: 可选，HTML 模板文件路径。如果不传入，则使用内嵌模板。
-        """
-        if template_path and os.path.exists(template_path):
-            # 使用指定模板文件
-            template_dir = os.path.dirname(template_path)
-            template_file = os.path.basename(template_path)
-            env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
-            self.template = env.get_template(template_file)
-        else:
-            # 使用内嵌模板
-            self.template = Template("""
+# 编译后模板字节码的缓存目录，进程重启后不需要重新编译模板
+TEMPLATE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "db_inspector", "jinja2")
+
+# 单个数据库的检查报告模板
+DATABASE_REPORT_TEMPLATE = "database_report.html"
+# 汇总报告模板
+SUMMARY_REPORT_TEMPLATE = "summary_report.html"
+# 分页汇总报告的索引页模板
+SUMMARY_INDEX_TEMPLATE = "summary_index.html"
+
+_TEMPLATE_SOURCES = {
+    DATABASE_REPORT_TEMPLATE: """
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -55,37 +52,8 @@ class HTMLReportGenerator:
     {% endfor %}
 </body>
 </html>
-            """, autoescape=True)
-
-    def generate(self, databases, output_file=None):
-        """
-        根据传入的检查结果生成 HTML 格式报告。
-        :param databases: 数据库信息和检查结果的列表，每个元素包括数据库信息和对应的检查结果。
-        :param output_file: 可选，若指定则将 HTML 内容写入该文件。
-        :return: 生成的 HTML 字符串
-        """
-        html_content = self.template.render(databases=databases)
-
-        if output_file:
-            try:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                print(f"HTML 报告已写入 {output_file}")
-            except Exception as e:
-                print(f"写入文件 {output_file} 时发生错误: {e}")
-
-        return html_content
-
-class SummaryReportGenerator:
-    def __init__(self, template_path=None):
-        if template_path and os.path.exists(template_path):
-            template_dir = os.path.dirname(template_path)
-            template_file = os.path.basename(template_path)
-            env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
-            self.template = env.get_template(template_file)
-        else:
-            # 内嵌汇总报告模板
-            self.template = Template("""
+            """,
+    SUMMARY_REPORT_TEMPLATE: """
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -103,6 +71,14 @@ class SummaryReportGenerator:
     <h1>数据库巡检汇总报告</h1>
 
     <h2>巡检结果概览</h2>
+    {% if pagination %}
+    <p>
+        第 {{ pagination.page }} / {{ pagination.page_count }} 页
+        | <a href="{{ pagination.index_link }}">返回索引</a>
+        {% if pagination.prev_link %}| <a href="{{ pagination.prev_link }}">上一页</a>{% endif %}
+        {% if pagination.next_link %}| <a href="{{ pagination.next_link }}">下一页</a>{% endif %}
+    </p>
+    {% endif %}
     <table>
         <thead>
             <tr>
@@ -111,6 +87,7 @@ class SummaryReportGenerator:
                 <th>正常状态</th>
                 <th>错误状态</th>
                 <th>告警状态</th>
+                <th>超时状态</th>
                 <th>详细报告</th>
             </tr>
         </thead>
@@ -122,6 +99,7 @@ class SummaryReportGenerator:
                 <td>{{ db[0].success_count }}</td>
                 <td>{{ db[0].failure_count }}</td>
                 <td>{{ db[0].warning_count }}</td>
+                <td>{{ db[0].timeout_count }}</td>
                 <td><a href="{{ db[0].report_link }}">查看详细报告</a></td>
             </tr>
         {% endfor %}
@@ -129,17 +107,245 @@ class SummaryReportGenerator:
     </table>
 </body>
 </html>
-            """)
+            """,
+    SUMMARY_INDEX_TEMPLATE: """
+<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <title>数据库巡检汇总报告</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 8px; }
+        th { background-color: #f2f2f2; }
+        tr:nth-child(even) { background-color: #f9f9f9; }
+    </style>
+</head>
+<body>
+    <h1>数据库巡检汇总报告</h1>
+
+    <h2>巡检结果统计</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>数据库数量</th>
+                <th>正常状态</th>
+                <th>错误状态</th>
+                <th>告警状态</th>
+                <th>超时状态</th>
+            </tr>
+        </thead>
+        <tbody>
+            <tr>
+                <td>{{ totals.databases }}</td>
+                <td>{{ totals.success_count }}</td>
+                <td>{{ totals.failure_count }}</td>
+                <td>{{ totals.warning_count }}</td>
+                <td>{{ totals.timeout_count }}</td>
+            </tr>
+        </tbody>
+    </table>
+
+    <h2>分页</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>页码</th>
+                <th>数据库</th>
+                <th>错误状态</th>
+                <th>告警状态</th>
+                <th>超时状态</th>
+                <th>详细页面</th>
+            </tr>
+        </thead>
+        <tbody>
+        {% for page in pages %}
+            <tr>
+                <td>{{ page.page }}</td>
+                <td>{{ page.first_db }} ~ {{ page.last_db }}</td>
+                <td>{{ page.failure_count }}</td>
+                <td>{{ page.warning_count }}</td>
+                <td>{{ page.timeout_count }}</td>
+                <td><a href="{{ page.link }}">查看</a></td>
+            </tr>
+        {% endfor %}
+        </tbody>
+    </table>
+</body>
+</html>
+            """,
+}
+
+# 汇总报告支持的排序方式：排序字段 -> 依次比较的统计数量（均按降序）
+SUMMARY_SORT_KEYS = {
+    "failure_count": ("failure_count", "warning_count", "timeout_count"),
+    "warning_count": ("warning_count", "failure_count", "timeout_count"),
+}
+# 汇总报告每页默认的数据库数量
+DEFAULT_SUMMARY_PAGE_SIZE = 500
+
+
+def _bytecode_cache():
+    """
+    创建模板字节码缓存，缓存目录不可写时不使用缓存
+    """
+    from jinja2 import FileSystemBytecodeCache
+    try:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    except OSError:
+        return None
+
+
+# 进程内共享的模板环境，每个模板只编译一次；第一次生成 HTML 报告时才导入 Jinja2 并创建
+_REPORT_ENVIRONMENT = None
+_ENVIRONMENT_LOCK = threading.Lock()
+# 模板目录 -> 使用该目录模板文件的环境
+_FILE_ENVIRONMENTS = {}
+
+
+def get_report_environment():
+    global _REPORT_ENVIRONMENT
+    with _ENVIRONMENT_LOCK:
+        if _REPORT_ENVIRONMENT is None:
+            from jinja2 import DictLoader, Environment
+            _REPORT_ENVIRONMENT = Environment(loader=DictLoader(_TEMPLATE_SOURCES), autoescape=True, bytecode_cache=_bytecode_cache())
+        return _REPORT_ENVIRONMENT
+
+
+def get_report_template(name, template_path=None):
+    """
+    获取已编译的报告模板
+    :param name: 内嵌模板名称
+    :param template_path: 可选，模板文件路径，文件存在时使用该文件
+    """
+    if template_path and os.path.exists(template_path):
+        # 使用指定模板文件，同一目录共用一个环境
+        from jinja2 import Environment, FileSystemLoader
+        template_dir = os.path.dirname(template_path)
+        env = _FILE_ENVIRONMENTS.get(template_dir)
+        if env is None:
+            env = Environment(loader=FileSystemLoader(template_dir), autoescape=True, bytecode_cache=get_report_environment().bytecode_cache)
+            _FILE_ENVIRONMENTS[template_dir] = env
+        return env.get_template(os.path.basename(template_path))
+    return get_report_environment().get_template(name)
+
+
+def precompile_templates():
+    """
+    预先编译所有内嵌模板（写入字节码缓存），例如在打包或启动守护进程时调用
+    """
+    for name in _TEMPLATE_SOURCES:
+        get_report_environment().get_template(name)
+
+
+class HTMLReportGenerator:
+    def __init__(self, template_path=None):
+        """
+        初始化 HTMLReportGenerator
+        :param template_path: 可选，HTML 模板文件路径。如果不传入，则使用内嵌模板。
+        """
+        # 模板在进程内只编译一次，多个生成器共用
+        self.template = get_report_template(DATABASE_REPORT_TEMPLATE, template_path)
 
     def generate(self, databases, output_file=None):
+        """
+        根据传入的检查结果生成 HTML 格式报告。
+        :param databases: 数据库信息和检查结果的列表，每个元素包括数据库信息和对应的检查结果。
+        :param output_file: 可选，若指定则将 HTML 内容写入该文件。
+        :return: 生成的 HTML 字符串
+        """
         html_content = self.template.render(databases=databases)
 
         if output_file:
             try:
                 with open(output_file, 'w', encoding='utf-8') as f:
                     f.write(html_content)
-                print(f"汇总报告已写入 {output_file}")
+                print(f"HTML 报告已写入 {output_file}")
             except Exception as e:
                 print(f"写入文件 {output_file} 时发生错误: {e}")
 
         return html_content
+
+class SummaryReportGenerator:
+    def __init__(self, template_path=None, page_size=0, sort_by=None):
+        """
+        :param template_path: 可选，汇总报告模板文件路径
+        :param page_size: 每页的数据库数量，数据库数量超过该值时生成索引页和分页页面，0 表示不分页
+        :param sort_by: 可选，排序字段（failure_count 或 warning_count），按降序排列，问题最多的数据库排在最前面；
+                        为空时保持配置顺序
+        """
+        if sort_by is not None and sort_by not in SUMMARY_SORT_KEYS:
+            raise ValueError(f"Unsupported summary sort key: {sort_by}")
+        self.template = get_report_template(SUMMARY_REPORT_TEMPLATE, template_path)
+        self.index_template = get_report_environment().get_template(SUMMARY_INDEX_TEMPLATE)
+        self.page_size = page_size
+        self.sort_by = sort_by
+
+    def sort(self, databases):
+        if self.sort_by is None:
+            return list(databases)
+        fields = SUMMARY_SORT_KEYS[self.sort_by]
+        # 稳定排序，统计数量相同的数据库保持配置顺序
+        return sorted(databases, key=lambda db: tuple(-db[0][field] for field in fields))
+
+    def generate(self, databases, output_file=None):
+        """
+        生成汇总报告
+        :param databases: 所有数据库的检查结果
+        :param output_file: 可选，若指定则将汇总报告写入该文件；分页时该文件为索引页，分页页面写入同一目录
+        :return: 汇总报告（分页时为索引页）的 HTML 字符串
+        """
+        databases = self.sort(databases)
+        if not self.page_size or len(databases) <= self.page_size:
+            html_content = self.template.render(databases=databases)
+            self.write(html_content, output_file)
+            return html_content
+
+        base, ext = os.path.splitext(output_file or "_summary_report.html")
+        page_count = (len(databases) + self.page_size - 1) // self.page_size
+        page_link = lambda number: f"{os.path.basename(base)}_{number}{ext}"
+
+        pages = []
+        for number in range(1, page_count + 1):
+            page_databases = databases[(number - 1) * self.page_size:number * self.page_size]
+            pagination = {
+                "page": number,
+                "page_count": page_count,
+                "index_link": os.path.basename(output_file or f"{base}{ext}"),
+                "prev_link": page_link(number - 1) if number > 1 else None,
+                "next_link": page_link(number + 1) if number < page_count else None,
+            }
+            if output_file:
+                self.write(self.template.render(databases=page_databases, pagination=pagination), f"{base}_{number}{ext}", quiet=True)
+            pages.append({
+                "page": number,
+                "first_db": page_databases[0][0]["db_name"],
+                "last_db": page_databases[-1][0]["db_name"],
+                "failure_count": sum(db[0]["failure_count"] for db in page_databases),
+                "warning_count": sum(db[0]["warning_count"] for db in page_databases),
+                "timeout_count": sum(db[0]["timeout_count"] for db in page_databases),
+                "link": page_link(number),
+            })
+
+        totals = {"databases": len(databases)}
+        for field in ("success_count", "failure_count", "warning_count", "timeout_count"):
+            totals[field] = sum(db[0][field] for db in databases)
+        html_content = self.index_template.render(totals=totals, pages=pages)
+        self.write(html_content, output_file)
+        if output_file:
+            print(f"汇总报告分页已写入 {base}_1{ext} ~ {base}_{page_count}{ext}")
+        return html_content
+
+    @staticmethod
+    def write(html_content, output_file, quiet=False):
+        if not output_file:
+            return
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(html_content)
+            if not quiet:
+                print(f"汇总报告已写入 {output_file}")
+        except Exception as e:
+            print(f"写入文件 {output_file} 时发生错误: {e}")
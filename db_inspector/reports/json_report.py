@@ -0,0 +1,234 @@
+import datetime
+import ipaddress
+import json
+import operator
+import uuid
+from decimal import Decimal
+from functools import lru_cache, partial
+
+from db_inspector.checks.base import CheckItemResult
+
+try:
+    # 可选依赖：安装 orjson 后使用更快的编码器
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_default(value):
+    """
+    序列化 JSON 不直接支持的类型：数据库驱动返回的时间、Decimal、BSON 等类型转换为字符串
+    （检查结果由 encode 直接按字段写出）
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        # 使用字符串保留精度
+        return str(value)
+    if isinstance(value, (uuid.UUID, ipaddress.IPv4Address, ipaddress.IPv6Address, ipaddress.IPv4Network, ipaddress.IPv6Network,
+                          ipaddress.IPv4Interface, ipaddress.IPv6Interface)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if type(value).__module__.partition(".")[0] == "bson":
+        # MongoDB 服务器状态中的 ObjectId、Timestamp、Decimal128 等类型（不导入 bson）
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# 标准库编码器：紧凑模式（不缩进）时使用 C 实现的编码器，缩进与 orjson 一致（2 个空格）
+_COMPACT_ENCODER = json.JSONEncoder(default=encode_default, ensure_ascii=False, separators=(",", ":"))
+_INDENT_ENCODER = json.JSONEncoder(default=encode_default, ensure_ascii=False, indent=2)
+
+
+def dumps_function(compact=True):
+    """
+    返回序列化函数 func(value) -> bytes（UTF-8 编码的 JSON），需要逐个序列化大量对象时使用
+    :param compact: 是否使用紧凑格式（不缩进）
+    """
+    if orjson is not None:
+        return partial(orjson.dumps, default=encode_default, option=0 if compact else orjson.OPT_INDENT_2)
+    encoder = _COMPACT_ENCODER if compact else _INDENT_ENCODER
+    return lambda value: encoder.encode(value).encode("utf-8")
+
+
+def dumps(value, compact=True) -> bytes:
+    """
+    将对象序列化为 UTF-8 编码的 JSON
+    :param compact: 是否使用紧凑格式（不缩进）
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=encode_default, option=0 if compact else orjson.OPT_INDENT_2)
+    encoder = _COMPACT_ENCODER if compact else _INDENT_ENCODER
+    return encoder.encode(value).encode("utf-8")
+
+
+# 检查结果的字段值，按 CheckItemResult.FIELDS 的顺序一次取出
+result_values = operator.attrgetter(*CheckItemResult.FIELDS)
+_encode_string = json.encoder.encode_basestring
+# 字符串、布尔值、None 和整数直接编码，其他类型使用 dumps
+_SCALAR_ENCODERS = {
+    str: lambda value: _encode_string(value).encode("utf-8"),
+    bool: lambda value: b"true" if value else b"false",
+    type(None): lambda value: b"null",
+    int: lambda value: str(value).encode("ascii"),
+}
+
+
+def encode_value(value, compact=True, level=0) -> bytes:
+    """
+    编码单个字段值，缩进格式时按所在层级补齐嵌套内容的缩进（JSON 字符串中的换行已转义，可以直接替换）
+    """
+    encoder = _SCALAR_ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    encoded = dumps(value, compact)
+    return encoded if compact else encoded.replace(b"\n", b"\n" + b"  " * level)
+
+
+@lru_cache(maxsize=None)
+def object_template(keys, compact=True, level=0) -> bytes:
+    """
+    JSON 对象的模板，字段值的位置为 %s（与序列化字典的输出格式一致）
+    :param keys: 字段名
+    :param level: 缩进层级（缩进格式时使用）
+    """
+    if not keys:
+        return b"{}"
+    # 字段名中的 % 需要转义
+    encoded = [dumps(key).replace(b"%", b"%%") for key in keys]
+    if compact:
+        return b"{" + b",".join(key + b":%s" for key in encoded) + b"}"
+    pad = b"\n" + b"  " * (level + 1)
+    return b"{" + b",".join(pad + key + b": %s" for key in encoded) + b"\n" + b"  " * level + b"}"
+
+
+def encode_fields(keys, values, compact=True, level=0) -> bytes:
+    """
+    按字段写出 JSON 对象，不需要先构造字典
+    :param keys: 字段名元组
+    :param values: 字段值，与 keys 一一对应
+    :param level: 缩进层级（缩进格式时使用）
+    """
+    return object_template(keys, compact, level) % tuple(encode(value, compact, level + 1) for value in values)
+
+
+def encode_results(results, compact=True, level=0) -> bytes:
+    """
+    写出检查结果列表，直接读取 CheckItemResult.FIELDS 中的属性，不为每个结果创建字典
+    :param results: CheckItemResult 列表
+    :param level: 列表的缩进层级（缩进格式时使用）
+    """
+    if not results:
+        return b"[]"
+    template = object_template(CheckItemResult.FIELDS, compact, level + 1)
+    nested_pad = b"\n" + b"  " * (level + 2)
+    # 检查项名称、状态和列名在所有数据库之间大量重复，同一个值只编码一次
+    repeated = {None: b"null"}
+
+    def encode_repeated(value):
+        try:
+            encoded = repeated.get(value)
+        except TypeError:
+            # 列名不是元组（不可哈希）时不缓存
+            return encode_value(value, compact, level + 2)
+        if encoded is None:
+            encoded = repeated[value] = encode_value(value, compact, level + 2)
+        return encoded
+
+    dump_rows = dumps_function(compact)
+    encoded_results = []
+    for result in results:
+        # 顺序与 CheckItemResult.FIELDS 一致；常见类型在循环中直接编码，减少每个结果的函数调用
+        check_name, status, message, error, row_count, truncated, columns, rows = result_values(result)
+        if rows is None:
+            encoded_rows = b"null"
+        else:
+            encoded_rows = dump_rows(rows)
+            if not compact:
+                encoded_rows = encoded_rows.replace(b"\n", nested_pad)
+        encoded_results.append(template % (
+            repeated.get(check_name) or encode_repeated(check_name),
+            repeated.get(status) or encode_repeated(status),
+            b"null" if message is None else _encode_string(message).encode("utf-8"),
+            b"true" if error else b"false",
+            b"null" if row_count is None else b"%d" % row_count,
+            b"true" if truncated else b"false",
+            encode_repeated(columns), encoded_rows,
+        ))
+    if compact:
+        return b"[" + b",".join(encoded_results) + b"]"
+    pad = b"\n" + b"  " * (level + 1)
+    return b"[" + pad + (b"," + pad).join(encoded_results) + b"\n" + b"  " * level + b"]"
+
+
+def encode(value, compact=True, level=0) -> bytes:
+    """
+    序列化包含检查结果的对象（数据库检查结果字典及其中的检查结果列表），其他值使用 dumps
+    :param compact: 是否使用紧凑格式（不缩进）
+    :param level: 缩进层级（缩进格式时使用）
+    """
+    if isinstance(value, dict):
+        return encode_fields(tuple(str(key) for key in value), value.values(), compact, level)
+    if isinstance(value, list) and value and all(isinstance(item, CheckItemResult) for item in value):
+        return encode_results(value, compact, level)
+    if isinstance(value, list) and any(isinstance(item, dict) for item in value):
+        if compact:
+            return b"[" + b",".join(encode(item, True, level + 1) for item in value) + b"]"
+        pad = b"\n" + b"  " * (level + 1)
+        return b"[" + b",".join(pad + encode(item, False, level + 1) for item in value) + b"\n" + b"  " * level + b"]"
+    return encode_value(value, compact, level)
+
+
+def dump(value, fp, compact=True):
+    """
+    将对象序列化为 JSON 直接写入二进制文件句柄（检查结果按字段写出）
+    :param fp: 以二进制模式打开的文件句柄
+    :param compact: 是否使用紧凑格式（不缩进）
+    """
+    fp.write(encode(value, compact))
+
+
+class JSONReportGenerator:
+    def __init__(self, compact=False):
+        """
+        初始化 JSONReportGenerator
+        :param compact: 是否生成紧凑格式（不缩进）的 JSON
+        """
+        self.compact = compact
+
+    def write(self, databases, fp):
+        """
+        将检查结果写入文件句柄，逐个数据库序列化，内存占用只与单个数据库的结果大小有关
+        :param databases: 数据库检查结果的列表或生成器
+        :param fp: 以二进制模式打开的文件句柄
+        """
+        separator = b"," if self.compact else b",\n"
+        fp.write(b"[" if self.compact else b"[\n")
+        for index, database in enumerate(databases):
+            if index:
+                fp.write(separator)
+            dump(database, fp, self.compact)
+        fp.write(b"]" if self.compact else b"\n]\n")
+
+    def generate(self, databases, output_file=None):
+        """
+        根据传入的检查结果生成 JSON 格式报告。
+        :param databases: 数据库检查结果的列表或生成器
+        :param output_file: 可选，若指定则将 JSON 直接写入该文件
+        :return: 指定了 output_file 时返回文件路径，否则返回 JSON 字符串
+        """
+        if output_file is None:
+            return encode(list(databases), self.compact).decode("utf-8")
+
+        try:
+            with open(output_file, 'wb') as f:
+                self.write(databases, f)
+            print(f"JSON 报告已写入 {output_file}")
+        except Exception as e:
+            print(f"写入文件 {output_file} 时发生错误: {e}")
+        return output_file
@@ -0,0 +1,50 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+from db_inspector.checks.base import CheckItemResult
+from db_inspector.reports.json_report import encode_fields, result_values
+
+# JSON Lines 结果文件名（位于报告目录下，所有数据库共用）
+JSONL_REPORT_FILE = "_results.jsonl"
+# 每行的字段：数据库名称、检查结果的字段和完成时间
+_RECORD_FIELDS = ("db_name",) + CheckItemResult.FIELDS + ("finished_at",)
+
+
+class JSONLinesWriter:
+    """
+    以 JSON Lines 格式追加写入检查结果，每个检查项完成后立即写入一行并刷新到磁盘，
+    下游工具可以在巡检进行中通过 tail -f 读取结果。
+    多个数据库（多个线程）共用同一个写入器。
+    """
+
+    def __init__(self, output_file):
+        """
+        :param output_file: 结果文件路径，文件已存在时在末尾追加
+        """
+        self.output_file = output_file
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, db_name, result):
+        """
+        追加一条检查结果
+        :param db_name: 数据库名称
+        :param result: CheckItemResult
+        """
+        values = (db_name, *result_values(result), datetime.now(timezone.utc).isoformat())
+        line = encode_fields(_RECORD_FIELDS, values) + b"\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.output_file)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.output_file, 'ab')
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,156 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+# PostgreSQL 默认端口
+DEFAULT_PG_PORT = 5432
+# 支持的数据库驱动
+DRIVER_PSYCOPG2 = 'psycopg2'
+DRIVER_PSYCOPG = 'psycopg'
+# psycopg2 与 psycopg 3 中连接空闲（不在事务中）的状态值
+TRANSACTION_STATUS_IDLE = 0
+# 标识数据库目标的连接参数，其余参数（如 sslmode、connect_timeout）作为连接选项
+TARGET_PARAMS = frozenset(('host', 'port', 'user', 'dbname', 'password'))
+
+
+class ConnectionPool:
+    """
+    进程级数据库连接池，按服务器（host/port/user/dbname）和连接参数复用连接。
+    同一个目标的多个管道（包括并发执行的管道）从池中借用已建立的连接，
+    避免每个目标都重新进行 TCP、TLS 和认证握手。
+    """
+
+    def __init__(self, max_idle_per_key=4, validate_after=30.0):
+        """
+        :param max_idle_per_key: 每个服务器最多保留的空闲连接数
+        :param validate_after: 连接空闲超过该时间（秒）后，借出前先检测连接是否可用
+        """
+        self.max_idle_per_key = max_idle_per_key
+        self.validate_after = validate_after
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(db_params, driver=DRIVER_PSYCOPG2):
+        """
+        根据连接参数生成连接池的键：驱动、规范化后的 host/port/user/dbname、密码的摘要，
+        以及其他连接选项（如 sslmode、connect_timeout），只有所有参数都相同的连接才会复用
+        """
+        host, port, user, dbname = target_fields(db_params)
+        password = db_params.get('password')
+        password_digest = hashlib.sha256(password.encode('utf-8')).hexdigest() if password else ''
+        options = tuple(sorted((name, str(value)) for name, value in db_params.items()
+                               if name not in TARGET_PARAMS and value is not None))
+        return driver, host, port, user, dbname, password_digest, options
+
+    def acquire(self, db_params, driver=DRIVER_PSYCOPG2):
+        """
+        从连接池借用一个连接，没有可用的空闲连接时新建连接
+        :param db_params: 数据库连接参数
+        :param driver: 数据库驱动，psycopg2 或 psycopg（psycopg 3，用于 pipeline 模式）
+        :return: 数据库连接
+        """
+        key = self.make_key(db_params, driver)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                conn, released_at = idle.pop()
+
+            if conn.closed:
+                continue
+            if time.monotonic() - released_at > self.validate_after and not self._ping(conn):
+                self._discard(conn)
+                continue
+            return conn
+
+        if driver == DRIVER_PSYCOPG:
+            try:
+                import psycopg
+            except ImportError:
+                raise ImportError("Batch mode requires psycopg 3, install it with: pip install psycopg")
+            # pipeline 模式下每个查询独立提交，一个查询失败不影响其他查询
+            return psycopg.connect(autocommit=True, **db_params)
+
+        import psycopg2
+        return psycopg2.connect(**db_params)
+
+    def release(self, db_params, conn, driver=DRIVER_PSYCOPG2):
+        """
+        归还连接，连接状态异常或空闲连接已满时直接关闭
+        :param db_params: 借用连接时使用的连接参数
+        :param conn: 要归还的连接
+        :param driver: 借用连接时使用的数据库驱动
+        """
+        if conn is None or conn.closed:
+            return
+
+        # 归还前结束未完成的事务，保证下一个借用者拿到干净的连接
+        if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                return
+
+        key = self.make_key(db_params, driver)
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.max_idle_per_key:
+                idle.append((conn, time.monotonic()))
+                return
+        self._discard(conn)
+
+    def close_all(self):
+        """
+        关闭连接池中的所有空闲连接
+        """
+        with self._lock:
+            idle, self._idle = self._idle, defaultdict(list)
+        for connections in idle.values():
+            for conn, _ in connections:
+                self._discard(conn)
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def target_fields(db_params):
+    """
+    规范化后的 host/port/user/dbname
+    """
+    host = (db_params.get('host') or 'localhost').lower()
+    port = int(db_params.get('port') or DEFAULT_PG_PORT)
+    return host, port, db_params.get('user') or '', db_params.get('dbname') or ''
+
+
+def target_key(db_params):
+    """
+    数据库目标的规范化标识（host:port/user/dbname），用于结果缓存等
+    """
+    host, port, user, dbname = target_fields(db_params)
+    return f"{host}:{port}/{user}/{dbname}"
+
+
+# 进程级共享的连接池
+CONNECTION_POOL = ConnectionPool()
+
+
+def get_connection_pool() -> ConnectionPool:
+    return CONNECTION_POOL
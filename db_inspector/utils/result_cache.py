@@ -0,0 +1,95 @@
+import os
+import pickle
+import threading
+import time
+
+from db_inspector.checks.base import BaseCheck, Status
+
+# 默认的结果缓存文件
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "db_inspector", "result_cache.sqlite3")
+
+# 可以缓存的检查结果状态（超时等临时状态不缓存）
+CACHEABLE_STATUSES = (Status.SUCCESS.value, Status.FAILURE.value, Status.WARNING.value)
+
+
+class ResultCache:
+    """
+    检查结果的磁盘缓存，以 目标数据库 + 检查项 code + 检查定义哈希 为键。
+    检查定义（查询语句或命令）变化后哈希随之变化，旧的缓存不会再被使用。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        """
+        :param path: SQLite 缓存文件路径，首次使用时创建
+        """
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            import sqlite3
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS check_results ("
+                " target TEXT NOT NULL, code TEXT NOT NULL, definition_hash TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, result BLOB NOT NULL,"
+                " PRIMARY KEY (target, code, definition_hash))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, target, code, definition_hash, max_age):
+        """
+        读取未过期的检查结果
+        :param max_age: 结果的最长有效时间（秒）
+        :return: CheckItemResult，没有缓存或已过期时返回 None
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT stored_at, result FROM check_results WHERE target = ? AND code = ? AND definition_hash = ?",
+                (target, code, definition_hash),
+            ).fetchone()
+        if row is None or time.time() - row[0] > max_age:
+            return None
+        try:
+            return pickle.loads(row[1])
+        except Exception:
+            return None
+
+    def put(self, target, code, definition_hash, result):
+        """
+        保存检查结果，只缓存确定的检查结论（不缓存超时和执行出错的结果）
+        """
+        if result.status not in CACHEABLE_STATUSES or result.error:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO check_results (target, code, definition_hash, stored_at, result) VALUES (?, ?, ?, ?, ?)",
+                (target, code, definition_hash, time.time(), pickle.dumps(result)),
+            )
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedCheck(BaseCheck):
+    """
+    使用缓存结果的检查项，执行时不访问数据库
+    """
+
+    def __init__(self, result):
+        self.result = result
+        self.check_name = result.check_name
+
+    def run(self, db_connection=None):
+        return self.result
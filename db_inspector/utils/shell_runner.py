@@ -0,0 +1,161 @@
+import os
+import signal
+import threading
+
+# 进程内同时执行的 Shell 命令数量上限
+DEFAULT_SHELL_CONCURRENCY = 8
+# 每个命令最多保留的标准输出字节数
+DEFAULT_MAX_OUTPUT_BYTES = 4 * 1024 * 1024
+# 每次从管道读取的字节数
+READ_SIZE = 64 * 1024
+
+
+class ShellOutput:
+    """
+    Shell 命令的执行结果
+    """
+    __slots__ = ('stdout', 'truncated', 'returncode')
+
+    def __init__(self, stdout: bytes, truncated: bool, returncode: int):
+        self.stdout = stdout
+        # 输出超过上限，只保留了前面的部分
+        self.truncated = truncated
+        self.returncode = returncode
+
+    @property
+    def text(self):
+        return self.stdout.decode(errors='replace')
+
+
+class ShellRunner:
+    """
+    进程级 Shell 命令执行器。
+    命令在后台线程的事件循环中以异步子进程执行，所有数据库的 Shell 检查共用并发上限；
+    每个命令在独立的进程组中运行，超时后连同其子进程一起结束；标准输出边读取边按上限截断。
+    """
+
+    def __init__(self, concurrency=DEFAULT_SHELL_CONCURRENCY):
+        """
+        :param concurrency: 同时执行的命令数量上限
+        """
+        self.concurrency = concurrency
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def configure(self, concurrency):
+        """
+        修改并发上限，在提交命令之前调用
+        """
+        with self._lock:
+            self.concurrency = concurrency
+            self._semaphore = None
+
+    def _ensure_loop(self):
+        # asyncio 只在第一次执行 Shell 命令时导入，事件循环在守护线程中一直运行
+        import asyncio
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="shell-runner", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, command, timeout=0, max_bytes=0):
+        """
+        提交命令，立即返回
+        :param command: Shell 命令
+        :param timeout: 超时时间（秒），从提交时开始计算（包括等待并发名额的时间），0 表示不限制，
+                        超时后结束命令的整个进程组
+        :param max_bytes: 最多保留的标准输出字节数，0 表示使用默认上限
+        :return: concurrent.futures.Future，结果为 ShellOutput；超时时抛出 TimeoutError，
+                 其消息说明命令是否因为等待并发名额而超时
+        """
+        import asyncio
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(command, timeout, max_bytes or DEFAULT_MAX_OUTPUT_BYTES), loop)
+
+    def run(self, command, timeout=0, max_bytes=0):
+        """
+        执行命令并等待结果（参数见 submit）
+        """
+        return self.submit(command, timeout, max_bytes).result()
+
+    async def _run(self, command, timeout, max_bytes):
+        import asyncio
+        import time
+        submitted = time.monotonic()
+        # 命令获得并发名额（开始执行）的时间
+        spawned = []
+        try:
+            # 超时时间从提交时开始计算，包括等待并发名额的时间
+            return await asyncio.wait_for(self._run_limited(command, max_bytes, spawned), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            if not spawned:
+                raise TimeoutError(f"Command timed out after {timeout:g}s waiting for a free shell slot (shell concurrency {self.concurrency})")
+            queued = spawned[0] - submitted
+            if queued >= 0.1:
+                raise TimeoutError(f"Command timed out after {timeout:g}s, including {queued:.1f}s waiting for a free shell slot")
+            raise TimeoutError(f"Command timed out after {timeout:g}s")
+
+    async def _run_limited(self, command, max_bytes, spawned):
+        import asyncio
+        import time
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            spawned.append(time.monotonic())
+            process = await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+                                                            start_new_session=True)
+            try:
+                stdout, truncated = await self._communicate(process, max_bytes)
+            finally:
+                # 超时或被取消时结束整个进程组（包括 shell 启动的子进程）
+                if process.returncode is None:
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+            return ShellOutput(stdout, truncated, process.returncode)
+
+    @staticmethod
+    async def _communicate(process, max_bytes):
+        """
+        读取标准输出直到命令结束，超过上限的部分读取后丢弃（命令不会因为管道写满而阻塞）
+        :return: (保留的输出, 是否被截断)
+        """
+        chunks = []
+        size = 0
+        truncated = False
+        while True:
+            chunk = await process.stdout.read(READ_SIZE)
+            if not chunk:
+                break
+            if size < max_bytes:
+                kept = chunk[:max_bytes - size]
+                chunks.append(kept)
+                size += len(kept)
+                truncated = truncated or len(kept) < len(chunk)
+            else:
+                truncated = True
+        await process.wait()
+        return b"".join(chunks), truncated
+
+    def close(self):
+        """
+        停止后台事件循环
+        """
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+                self._semaphore = None
+
+
+# 进程级共享的 Shell 命令执行器
+SHELL_RUNNER = ShellRunner()
+
+
+def get_shell_runner() -> ShellRunner:
+    return SHELL_RUNNER
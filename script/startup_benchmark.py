@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+''' readme
+    命令行启动时间基准
+
+    1. 使用方法（在项目根目录执行）
+        python3 ./script/startup_benchmark.py            # 与基准比较，变慢或导入了重量级模块时返回非 0
+        python3 ./script/startup_benchmark.py --update   # 记录新的基准
+    2. 原理
+        在新的解释器进程中执行 python -X importtime -c "import db_inspector.main"，
+        读取 db_inspector.main 的累计导入时间，
+        并检查启动时是否导入了只在巡检、生成报告时才需要的模块（与机器无关，结果稳定）。
+    3. 同机参照
+        每次运行紧接着测量一组固定标准库模块的导入时间作为参照，比较的是每对测量中 db_inspector.main 与参照之比的中位数，
+        机器快慢和负载对同一对测量的影响相同；毫秒预算按基准中的比值换算，不受当前机器负载影响。
+'''
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+MODULE = "db_inspector.main"
+
+# 启动时不允许导入的模块：数据库驱动、异步引擎、模板、配置解析和可选依赖只在使用时导入
+FORBIDDEN_MODULES = (
+    "psycopg2", "psycopg", "asyncpg", "asyncio", "jinja2", "yaml", "toml",
+    "orjson", "numpy", "sqlite3", "subprocess", "concurrent.futures", "pymongo",
+)
+
+# 同机参照：导入时间与 db_inspector.main 同一量级、不依赖项目代码的标准库模块
+REFERENCE_MODULES = (
+    "argparse", "json", "logging", "http.client", "email.message", "decimal", "inspect", "pathlib",
+)
+
+# python -X importtime 的输出格式：import time: self [us] | cumulative | imported package
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_once(modules):
+    """
+    在新的解释器进程中导入模块
+    :param modules: 模块名列表
+    :return: (这些模块的累计导入时间之和（微秒）, 导入的所有模块名)
+    """
+    # 允许写入 .pyc，否则设置了 PYTHONDONTWRITEBYTECODE 时每次运行都要重新编译修改过的模块
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr}")
+
+    cumulative = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        imported.add(match.group(4))
+        # 只统计顶层导入（缩进一个空格），子模块已包含在累计时间中
+        if match.group(4) in modules and len(match.group(3)) == 1:
+            cumulative[match.group(4)] = int(match.group(2))
+    if MODULE in modules and MODULE not in cumulative:
+        raise RuntimeError(f"No import time reported for {MODULE}")
+    return sum(cumulative.values()), imported
+
+
+def forbidden_imports(modules):
+    return sorted(name for name in modules if any(name == forbidden or name.startswith(forbidden + ".") for forbidden in FORBIDDEN_MODULES))
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Measure the cold import time of {MODULE} and fail on regressions.")
+    parser.add_argument("--runs", type=int, default=7, help="Number of fresh interpreter runs; the median ratio to the reference imports is compared")
+    parser.add_argument("--tolerance", type=float, default=None, help="Allowed slowdown over the baseline as a fraction (default: from the baseline file)")
+    parser.add_argument("--update", action="store_true", help="Write the measured time as the new baseline")
+    args = parser.parse_args()
+
+    # 第一次运行用于预热（生成 .pyc、加载操作系统文件缓存），不计入结果
+    measure_once([MODULE])
+    measure_once(REFERENCE_MODULES)
+    timings = []
+    ratios = []
+    modules = set()
+    for _ in range(max(args.runs, 1)):
+        # 成对测量，机器负载的变化同时作用于两者
+        cumulative, imported = measure_once([MODULE])
+        reference, _ = measure_once(REFERENCE_MODULES)
+        timings.append(cumulative)
+        ratios.append(cumulative / reference)
+        modules |= imported
+    best_ms = min(timings) / 1000
+    ratio = statistics.median(ratios)
+    print(f"{MODULE} import time: best {best_ms:.1f} ms, median {statistics.median(timings) / 1000:.1f} ms, max {max(timings) / 1000:.1f} ms ({len(timings)} runs)")
+    print(f"Relative to the reference imports: median {ratio:.2f}, min {min(ratios):.2f}, max {max(ratios):.2f}")
+
+    failed = False
+    forbidden = forbidden_imports(modules)
+    if forbidden:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(forbidden)}")
+        failed = True
+
+    baseline = load_baseline()
+    if args.update:
+        tolerance = args.tolerance if args.tolerance is not None else (baseline or {}).get("tolerance", 0.3)
+        limit_ms = (baseline or {}).get("limit_ms", 100)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"best_ms": round(best_ms, 1), "ratio": round(ratio, 3), "tolerance": tolerance, "limit_ms": limit_ms}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_FILE}")
+        return 1 if failed else 0
+
+    if baseline is None or "ratio" not in baseline:
+        print(f"No baseline at {BASELINE_FILE}, run with --update to create one.")
+        return 1 if failed else 0
+
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", 0.3)
+    allowed_ratio = baseline["ratio"] * (1 + tolerance)
+    print(f"Baseline ratio: {baseline['ratio']:.2f}, allowed: {allowed_ratio:.2f}")
+    if ratio > allowed_ratio:
+        print(f"FAIL: startup regressed by {(ratio / baseline['ratio'] - 1) * 100:.0f}% over the baseline")
+        failed = True
+    # 预算针对记录基准时的测量：基准耗时与比值之比即参照的耗时，按当前比值换算
+    limit_ms = baseline.get("limit_ms")
+    if limit_ms:
+        estimated_ms = baseline["best_ms"] * ratio / baseline["ratio"]
+        print(f"Estimated startup on the baseline machine: {estimated_ms:.1f} ms, budget: {limit_ms} ms")
+        if estimated_ms > limit_ms:
+            print(f"FAIL: startup exceeds the {limit_ms} ms budget")
+            failed = True
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,9 +13,16 @@ setup(
         'mysql-connector-python',
         'toml',
     ],
+    extras_require={  # 可选依赖
+        'async': ['asyncpg'],
+        'batch': ['psycopg'],
+        'json': ['orjson'],
+        'numpy': ['numpy'],
+        'mongodb': ['pymongo'],
+    },
     entry_points={  # 定义命令行脚本
         'console_scripts': [
-            'db_inspector=db_inspector.script:main',  # 指定命令行工具名和主函数
+            'db_inspector=db_inspector.main:cli',  # 指定命令行工具名和主函数（子命令 run、daemon）
         ],
     },
     include_package_data=True,
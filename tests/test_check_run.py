@@ -0,0 +1,180 @@
+import pytest
+
+from db_inspector.checks.base import SAVEPOINT_NAME, TRANSACTION_STATUS_INERROR, manage_savepoint, snapshot_transaction
+from db_inspector.checks.check_run import FetchedRows, PythonCheck, RowCollector, SQLCheck, cap_rows, row_size
+
+
+def test_collector_keeps_rows_within_the_row_cap():
+    collector = RowCollector(max_rows=2)
+    assert collector.add([(1,), (2,)])
+    assert not collector.add([(3,), (4,)])
+    collector.skip(10)
+    result = collector.result()
+    assert list(result) == [(1,), (2,)]
+    assert (result.total_rows, result.truncated) == (14, True)
+
+
+def test_collector_keeps_rows_within_the_byte_cap():
+    row = ("x" * 10,)
+    collector = RowCollector(max_bytes=row_size(row) * 2 + 1)
+    collector.add([row] * 5)
+    result = collector.result()
+    assert len(result) == 2
+    assert result.size == row_size(row) * 2
+    assert (result.total_rows, result.truncated) == (5, True)
+
+
+def test_collector_stops_at_the_first_row_over_the_cap():
+    # 超过上限后不再保存后面较小的行，保留的是结果的前缀
+    collector = RowCollector(max_bytes=10)
+    collector.add([("a",), ("x" * 100,), ("b",)])
+    assert list(collector.result()) == [("a",)]
+
+
+def test_cap_rows_returns_results_within_the_caps_unchanged():
+    rows = FetchedRows([(1,), (2,)], columns=("g",))
+    assert cap_rows(rows, max_rows=5) is rows
+
+
+def test_cap_rows_keeps_total_rows_and_columns():
+    rows = FetchedRows([(i,) for i in range(10)], total_rows=1000, truncated=True, columns=("g",))
+    capped = cap_rows(rows, max_rows=3)
+    assert list(capped) == [(0,), (1,), (2,)]
+    assert (capped.total_rows, capped.truncated, capped.columns) == (1000, True, ("g",))
+
+
+def test_cap_rows_keeps_an_empty_result():
+    rows = FetchedRows([], columns=("g",))
+    capped = cap_rows(rows)
+    assert (len(capped), capped.total_rows, capped.columns) == (0, 0, ("g",))
+
+
+def test_cap_rows_accepts_plain_rows():
+    capped = cap_rows([(1,), (2,), (3,)], max_rows=1)
+    assert (list(capped), capped.total_rows, capped.truncated) == ([(1,)], 3, True)
+
+
+class FakeInfo:
+    transaction_status = 0
+
+
+class FakeConnection:
+    """
+    记录执行的语句；执行 bad 语句后事务处于中止状态
+    """
+
+    def __init__(self, autocommit=False):
+        self.statements = []
+        self.info = FakeInfo()
+        self.autocommit = autocommit
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.statements.append("COMMIT")
+
+    def rollback(self):
+        self.statements.append("ROLLBACK")
+        self.info.transaction_status = 0
+
+
+class FakeCursor:
+    description = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, statement):
+        self.connection.statements.append(statement)
+        # 与查询一起发送的语句（保存点、超时设置等）之后的最后一条语句为 bad 时失败
+        if statement.rpartition("; ")[2] == "bad":
+            self.connection.info.transaction_status = TRANSACTION_STATUS_INERROR
+            raise RuntimeError("statement failed")
+        if statement.startswith("ROLLBACK TO SAVEPOINT"):
+            self.connection.info.transaction_status = 0
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+def run_bad_statement(connection, context):
+    try:
+        connection.cursor().execute("bad")
+    except RuntimeError:
+        return True, "handled"
+
+
+def raise_bad_statement(connection, context):
+    connection.cursor().execute("bad")
+
+
+@pytest.fixture
+def check_functions(monkeypatch):
+    functions = {"handled": run_bad_statement, "raised": raise_bad_statement}
+    monkeypatch.setattr("db_inspector.checks.check_run.load_function", lambda name: functions[name])
+
+
+@pytest.mark.parametrize("function, status", [("handled", "success"), ("raised", "failure")])
+def test_python_check_in_snapshot_rolls_back_to_savepoint(check_functions, function, status):
+    connection = FakeConnection()
+    result = PythonCheck(function).run(connection, snapshot=True)
+    assert result.status == status
+    assert connection.statements[0].startswith(f"SAVEPOINT {SAVEPOINT_NAME}; SET LOCAL statement_timeout = DEFAULT")
+    assert connection.statements[-1] == f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}"
+    assert connection.info.transaction_status == 0
+
+
+def test_python_check_outside_snapshot_rolls_back_failed_transaction(check_functions):
+    connection = FakeConnection()
+    assert PythonCheck("handled").run(connection).status == "success"
+    assert connection.statements == ["bad", "ROLLBACK"]
+
+
+@pytest.mark.parametrize("autocommit, begin", [
+    (False, "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"),
+    (True, "BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY"),
+])
+def test_snapshot_transaction_commits_once_or_rolls_back(autocommit, begin):
+    connection = FakeConnection(autocommit)
+    with snapshot_transaction(connection):
+        pass
+    assert connection.statements == [f"{begin}; SAVEPOINT {SAVEPOINT_NAME}", "COMMIT"]
+
+    connection = FakeConnection(autocommit)
+    with pytest.raises(RuntimeError, match="connection lost"):
+        with snapshot_transaction(connection):
+            raise RuntimeError("connection lost")
+    assert connection.statements == [f"{begin}; SAVEPOINT {SAVEPOINT_NAME}", "ROLLBACK"]
+
+
+def test_manage_savepoint_rolls_back_only_the_failed_check():
+    connection = FakeConnection()
+    with pytest.raises(RuntimeError, match="statement failed"):
+        with manage_savepoint(connection) as cursor:
+            cursor.execute("bad")
+    assert connection.statements == ["bad", f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}"]
+    assert connection.info.transaction_status == 0
+
+    with manage_savepoint(connection) as cursor:
+        cursor.execute("SELECT 1")
+    # 成功的检查不回滚也不提交，事务由 snapshot_transaction 统一提交
+    assert connection.statements[-1] == "SELECT 1"
+
+
+def test_failed_sql_check_does_not_abort_the_snapshot():
+    connection = FakeConnection()
+    with snapshot_transaction(connection):
+        with pytest.raises(RuntimeError, match="statement failed"):
+            SQLCheck("bad", "", "", "bad").fetch(connection, snapshot=True)
+        rows = SQLCheck("SHOW work_mem", "", "", "good").fetch(connection, snapshot=True)
+    assert list(rows) == [(1,)]
+    prefix = f"CLOSE ALL; SAVEPOINT {SAVEPOINT_NAME}; SET LOCAL statement_timeout = DEFAULT; SET LOCAL lock_timeout = DEFAULT; "
+    assert connection.statements[1:] == [
+        f"{prefix}bad", f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}",
+        f"{prefix}SHOW work_mem",
+        "COMMIT",
+    ]
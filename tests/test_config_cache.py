@@ -0,0 +1,94 @@
+import importlib
+import os
+import sys
+
+from db_inspector.config import config_cache
+from db_inspector.config.config_cache import ConfigCache, loader_signature
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, file_path):
+        self.calls += 1
+        with open(file_path, encoding="utf-8") as f:
+            return {"content": f.read()}
+
+
+def write_config(path, content, mtime_ns=None):
+    path.write_text(content, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def make_cache(tmp_path, monkeypatch):
+    # 测试中的解析函数是可调用对象，使用固定的源码摘要
+    monkeypatch.setattr(config_cache, "loader_signature", lambda loader: getattr(loader, "signature", "loader"))
+    return ConfigCache(str(tmp_path / "cache"))
+
+
+def test_unchanged_file_is_served_from_cache(tmp_path, monkeypatch):
+    cache, loader = make_cache(tmp_path, monkeypatch), CountingLoader()
+    config = tmp_path / "config.yml"
+    write_config(config, "a")
+    assert cache.load("config", str(config), loader) == {"content": "a"}
+    assert cache.load("config", str(config), loader) == {"content": "a"}
+    assert loader.calls == 1
+
+
+def test_changed_file_is_parsed_again(tmp_path, monkeypatch):
+    cache, loader = make_cache(tmp_path, monkeypatch), CountingLoader()
+    config = tmp_path / "config.yml"
+    write_config(config, "a", mtime_ns=1_000_000_000)
+    cache.load("config", str(config), loader)
+    # 大小相同、修改时间不同
+    write_config(config, "b", mtime_ns=2_000_000_000)
+    assert cache.load("config", str(config), loader) == {"content": "b"}
+    assert loader.calls == 2
+
+
+def test_schema_or_loader_change_invalidates_cache(tmp_path, monkeypatch):
+    cache, loader = make_cache(tmp_path, monkeypatch), CountingLoader()
+    config = tmp_path / "config.yml"
+    write_config(config, "a")
+    cache.load("config", str(config), loader)
+
+    loader.signature = "upgraded"
+    cache.load("config", str(config), loader)
+    assert loader.calls == 2
+
+    monkeypatch.setattr(config_cache, "schema_signature", lambda: "changed")
+    cache.load("config", str(config), loader)
+    assert loader.calls == 3
+
+
+def test_kinds_are_cached_separately_and_failures_are_not_cached(tmp_path, monkeypatch):
+    cache, loader = make_cache(tmp_path, monkeypatch), CountingLoader()
+    config = tmp_path / "config.yml"
+    write_config(config, "a")
+    cache.load("config", str(config), loader)
+    cache.load("check_config", str(config), loader)
+    assert loader.calls == 2
+
+    assert cache.load("failed", str(config), lambda path: None) is None
+    assert not os.path.exists(cache.cache_file("failed", str(config)))
+
+
+def test_missing_file_is_reported_by_loader(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    assert cache.load("config", str(tmp_path / "missing.yml"), lambda path: None) is None
+
+
+def test_loader_signature_follows_loader_source(tmp_path, monkeypatch):
+    module = tmp_path / "cache_test_loader.py"
+    module.write_text("def load(path):\n    return 1\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    loader = importlib.import_module("cache_test_loader").load
+    try:
+        signature = loader_signature(loader)
+        assert loader_signature(loader) == signature
+        module.write_text("def load(path):\n    return 2\n", encoding="utf-8")
+        assert loader_signature(loader) != signature
+    finally:
+        sys.modules.pop("cache_test_loader", None)
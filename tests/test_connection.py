@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+from db_inspector.utils.connection import ConnectionPool, DRIVER_PSYCOPG, target_key
+
+PARAMS = {"host": "DB1", "port": None, "user": "app", "password": "secret", "dbname": "app"}
+
+
+class FakeConnection:
+    def __init__(self, transaction_status=0, rollback_error=None):
+        self.closed = False
+        self.info = SimpleNamespace(transaction_status=transaction_status)
+        self.rollback_error = rollback_error
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.rollback_error is not None:
+            raise self.rollback_error
+        self.info.transaction_status = 0
+
+    def close(self):
+        self.closed = True
+
+
+def test_key_normalizes_target_but_separates_credentials_and_options():
+    key = ConnectionPool.make_key(PARAMS)
+    assert key == ConnectionPool.make_key(dict(PARAMS, host="db1", port=5432))
+    assert key != ConnectionPool.make_key(dict(PARAMS, password="other"))
+    assert key != ConnectionPool.make_key(dict(PARAMS, sslmode="require"))
+    assert key != ConnectionPool.make_key(dict(PARAMS, connect_timeout=5))
+    assert key != ConnectionPool.make_key(PARAMS, DRIVER_PSYCOPG)
+    # 键中不保存明文密码
+    assert "secret" not in repr(key)
+    assert target_key(PARAMS) == "db1:5432/app/app"
+
+
+def test_released_connection_is_reused():
+    pool = ConnectionPool()
+    conn = FakeConnection()
+    pool.release(PARAMS, conn)
+    assert pool.acquire(dict(PARAMS, host="db1")) is conn
+
+
+def test_connection_is_not_shared_across_passwords():
+    pool = ConnectionPool()
+    conn = FakeConnection()
+    pool.release(PARAMS, conn)
+    assert pool._idle.get(pool.make_key(dict(PARAMS, password="other"))) is None
+    assert pool.acquire(PARAMS) is conn
+
+
+def test_release_rolls_back_open_transaction():
+    pool = ConnectionPool()
+    conn = FakeConnection(transaction_status=2)
+    pool.release(PARAMS, conn)
+    assert conn.rollbacks == 1
+    assert pool.acquire(PARAMS) is conn
+
+
+def test_release_discards_connection_when_rollback_fails():
+    pool = ConnectionPool()
+    conn = FakeConnection(transaction_status=3, rollback_error=RuntimeError("connection lost"))
+    pool.release(PARAMS, conn)
+    assert conn.closed
+    assert not pool._idle.get(pool.make_key(PARAMS))
+
+
+def test_release_closes_connections_beyond_idle_limit():
+    pool = ConnectionPool(max_idle_per_key=1)
+    kept, extra = FakeConnection(), FakeConnection()
+    pool.release(PARAMS, kept)
+    pool.release(PARAMS, extra)
+    assert not kept.closed
+    assert extra.closed
+
+
+def test_close_all_closes_idle_connections():
+    pool = ConnectionPool()
+    connections = [FakeConnection(), FakeConnection()]
+    pool.release(PARAMS, connections[0])
+    pool.release(dict(PARAMS, dbname="other"), connections[1])
+    pool.close_all()
+    assert all(conn.closed for conn in connections)
+    assert not pool._idle
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from db_inspector.checks.base import Status
+from db_inspector.config.base import Database
+from db_inspector.pipelines.fleet import failed_db_result, failed_result, run_targets
+from db_inspector.pipelines.pg_pipeline import PostgreSQLPipeline
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, db_name, result):
+        self.rows.append((db_name, result))
+
+
+def make_databases(*names):
+    return [Database(type="postgres", name=name, uri=f"postgresql://user@{name}/db") for name in names]
+
+
+def on_timeout(database, message, status):
+    return f"{database.name}: {status}: {message}"
+
+
+def test_serial_run_keeps_order():
+    databases = make_databases("a", "b", "c")
+    assert run_targets(databases, lambda database, cancelled: database.name) == ["a", "b", "c"]
+
+
+def test_stuck_target_is_cancelled_and_frees_its_worker():
+    def task(database, cancelled):
+        if database.name == "stuck":
+            # 卡住的数据库在被取消后结束，让出线程
+            assert cancelled.wait(30)
+        return database.name
+
+    databases = make_databases("stuck", "next", "last")
+    started = time.monotonic()
+    slots = run_targets(databases, task, workers=1, target_timeout=0.3, on_timeout=on_timeout, grace=0.2)
+    assert time.monotonic() - started < 5
+    assert slots == ["stuck: timeout: Inspection timed out after 0.3s", "next", "last"]
+
+
+def test_runner_waits_grace_beyond_target_timeout():
+    def task(database, cancelled):
+        # 管道在截止时间之后才结束（如等待取消查询），执行器仍使用它自己的结果
+        time.sleep(0.4)
+        return database.name
+
+    slots = run_targets(make_databases("a"), task, workers=1, target_timeout=0.3, on_timeout=on_timeout, grace=0.5)
+    assert slots == ["a"]
+
+
+def test_worker_threads_are_bounded():
+    names = set()
+    lock = threading.Lock()
+
+    def task(database, cancelled):
+        with lock:
+            names.add(threading.current_thread().name)
+        if database.name.startswith("stuck"):
+            cancelled.wait(30)
+        return database.name
+
+    databases = make_databases("stuck1", "stuck2", "a", "b", "c")
+    slots = run_targets(databases, task, workers=2, target_timeout=0.2, on_timeout=on_timeout, grace=0.1)
+    assert slots[2:] == ["a", "b", "c"]
+    assert len(names) <= 2
+
+
+def test_queued_targets_are_not_charged_for_queue_time():
+    def task(database, cancelled):
+        time.sleep(0.3)
+        return database.name
+
+    databases = make_databases("a", "b", "c")
+    slots = run_targets(databases, task, workers=1, target_timeout=0.5, on_timeout=on_timeout, grace=0)
+    assert slots == ["a", "b", "c"]
+
+
+def test_failed_target_reported_through_on_timeout():
+    def task(database, cancelled):
+        if database.name == "bad":
+            raise RuntimeError("boom")
+        return database.name
+
+    slots = run_targets(make_databases("bad", "good"), task, workers=2, target_timeout=5, on_timeout=on_timeout)
+    assert slots == ["bad: failure: Inspection failed: boom", "good"]
+
+
+def test_failed_db_result_is_an_error():
+    result = failed_db_result("a", "Inspection timed out after 1s", Status.TIMEOUT.value)
+    assert result[0]["timeout_count"] == 1
+    check_result = result[0]["check_results"][0]
+    assert check_result.status == Status.TIMEOUT.value
+    assert check_result.error
+
+
+def test_cancelled_pipeline_does_not_write_results():
+    cancelled = threading.Event()
+    writer = RecordingWriter()
+    pipe = PostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db", result_writer=writer, cancelled=cancelled)
+    pipe.record_result(None, None, failed_result("check", "late"))
+    cancelled.set()
+    pipe.record_result(None, None, failed_result("check", "later"))
+    assert [result.message for _, result in writer.rows] == ["late"]
+
+
+def test_pipeline_deadline_caps_connect_timeout_and_check_budget():
+    deadline = time.monotonic() + 2
+    pipe = PostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db", connect_timeout=10, database_timeout=60, deadline=deadline)
+    assert 0 < pipe.effective_connect_timeout <= 2
+    assert pipe.check_deadline() == deadline
+
+    pipe = PostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db", connect_timeout=10, database_timeout=1, deadline=deadline)
+    assert pipe.effective_connect_timeout <= 2
+    assert pipe.check_deadline() < deadline
@@ -0,0 +1,78 @@
+import re
+
+import pytest
+
+from db_inspector.checks.base import CheckItemResult, Status
+from db_inspector.pipelines.base import build_db_result
+from db_inspector.reports.html_report import SummaryReportGenerator
+
+
+def db_result(name, failures=0, warnings=0, successes=1):
+    results = [CheckItemResult(f"f{i}", Status.FAILURE.value, "failed") for i in range(failures)]
+    results += [CheckItemResult(f"w{i}", Status.WARNING.value, "check") for i in range(warnings)]
+    results += [CheckItemResult(f"s{i}", Status.SUCCESS.value, "ok") for i in range(successes)]
+    return build_db_result(name, results)
+
+
+def db_names(html):
+    return re.findall(r"<td>(db\d+)</td>", html)
+
+
+def test_small_fleet_is_a_single_page(tmp_path):
+    output = tmp_path / "_summary_report.html"
+    html = SummaryReportGenerator(page_size=5).generate([db_result(f"db{i}") for i in range(3)], str(output))
+    assert db_names(html) == ["db0", "db1", "db2"]
+    assert output.read_text(encoding="utf-8") == html
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["_summary_report.html"]
+
+
+def test_large_fleet_is_split_into_numbered_pages(tmp_path):
+    output = tmp_path / "_summary_report.html"
+    databases = [db_result(f"db{i}", failures=i % 2) for i in range(5)]
+    index = SummaryReportGenerator(page_size=2).generate(databases, str(output))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "_summary_report.html", "_summary_report_1.html", "_summary_report_2.html", "_summary_report_3.html"]
+    assert output.read_text(encoding="utf-8") == index
+    # 索引页链接到每个分页页面
+    for number in (1, 2, 3):
+        assert f'href="_summary_report_{number}.html"' in index
+
+    pages = [(tmp_path / f"_summary_report_{number}.html").read_text(encoding="utf-8") for number in (1, 2, 3)]
+    assert [db_names(page) for page in pages] == [["db0", "db1"], ["db2", "db3"], ["db4"]]
+    assert 'href="_summary_report_2.html"' in pages[0]
+    assert 'href="_summary_report_1.html"' in pages[1] and 'href="_summary_report_3.html"' in pages[1]
+
+
+def test_page_size_zero_disables_paging(tmp_path):
+    output = tmp_path / "_summary_report.html"
+    html = SummaryReportGenerator(page_size=0).generate([db_result(f"db{i}") for i in range(4)], str(output))
+    assert db_names(html) == ["db0", "db1", "db2", "db3"]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.parametrize("sort_by, expected", [
+    (None, ["db0", "db1", "db2", "db3", "db4"]),
+    # 降序排列，统计数量相同时按次要字段，仍相同时保持配置顺序
+    ("failure_count", ["db3", "db2", "db4", "db1", "db0"]),
+    ("warning_count", ["db1", "db3", "db2", "db4", "db0"]),
+])
+def test_sort_puts_problem_databases_first(sort_by, expected):
+    databases = [db_result("db0"), db_result("db1", warnings=2), db_result("db2", failures=1), db_result("db3", failures=1, warnings=1),
+                 db_result("db4", failures=1)]
+    generator = SummaryReportGenerator(sort_by=sort_by)
+    assert [db[0]["db_name"] for db in generator.sort(databases)] == expected
+    assert db_names(generator.generate(databases)) == expected
+
+
+def test_sorting_applies_across_pages(tmp_path):
+    output = tmp_path / "_summary_report.html"
+    databases = [db_result(f"db{i}", failures=i) for i in range(4)]
+    SummaryReportGenerator(page_size=2, sort_by="failure_count").generate(databases, str(output))
+    assert db_names((tmp_path / "_summary_report_1.html").read_text(encoding="utf-8")) == ["db3", "db2"]
+    assert db_names((tmp_path / "_summary_report_2.html").read_text(encoding="utf-8")) == ["db1", "db0"]
+
+
+def test_unknown_sort_key_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported summary sort key: name"):
+        SummaryReportGenerator(sort_by="name")
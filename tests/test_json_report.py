@@ -0,0 +1,60 @@
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+
+from db_inspector.checks.base import CheckItemResult
+from db_inspector.reports import json_report
+from db_inspector.reports.jsonl_report import JSONLinesWriter
+
+
+def as_dict(result):
+    return {name: getattr(result, name) for name in CheckItemResult.FIELDS}
+
+
+def make_database():
+    results = [
+        CheckItemResult("Lag \"é\"", "failure", None, row_count=3, truncated=True, columns=("name", "lag", "since", "info"),
+                        rows=[("a\nb", Decimal("1.50"), datetime.date(2024, 1, 2), {"tags": [1, {"x": None}]})]),
+        CheckItemResult("Version", "success", "PostgreSQL 16", columns=("version",), rows=[("PostgreSQL 16",)]),
+        CheckItemResult("Shell", "timeout", "Command timed out after 1s", error=True),
+        CheckItemResult("Empty", "success", "", row_count=0, columns=(), rows=[]),
+    ]
+    return {"db_name": "db1", "check_results": results, "success_count": 2, "links": [], "percent %": 1.5}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_report, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_results_are_written_like_their_field_dicts(backend, compact):
+    database = make_database()
+    expected = json_report.dumps([dict(database, check_results=[as_dict(result) for result in database["check_results"]])], compact)
+    assert json_report.encode([database], compact) == expected
+
+
+def test_report_file_is_valid_json(backend, tmp_path):
+    for compact in (True, False):
+        path = tmp_path / f"report_{compact}.json"
+        json_report.JSONReportGenerator(compact=compact).generate([make_database(), make_database()], str(path))
+        databases = json.loads(path.read_text(encoding="utf-8"))
+        assert [result["check_name"] for result in databases[1]["check_results"]] == ["Lag \"é\"", "Version", "Shell", "Empty"]
+        assert databases[0]["check_results"][0]["rows"][0][1] == "1.50"
+
+
+def test_jsonl_record_fields(backend, tmp_path):
+    writer = JSONLinesWriter(str(tmp_path / "results.jsonl"))
+    result = make_database()["check_results"][0]
+    writer.write("db1", result)
+    writer.close()
+    record = json.loads((tmp_path / "results.jsonl").read_text(encoding="utf-8"))
+    assert list(record) == ["db_name", *CheckItemResult.FIELDS, "finished_at"]
+    assert record["db_name"] == "db1"
+    assert record["message"] == result.message
@@ -0,0 +1,15 @@
+import pytest
+from click.testing import CliRunner
+
+from db_inspector.main import main
+
+
+@pytest.mark.parametrize("option", ["--batch", "--snapshot"])
+def test_async_engine_rejects_thread_only_options(tmp_path, option):
+    config, check_config = tmp_path / "config.yml", tmp_path / "checks.json"
+    config.write_text("databases: []\n")
+    check_config.write_text("{}")
+    result = CliRunner().invoke(main, ["--config", str(config), "--check-config", str(check_config),
+                                       "--output-report-dir", str(tmp_path), "--engine", "async", option])
+    assert result.exit_code == 2
+    assert f"{option} is not supported with --engine async" in result.output
@@ -0,0 +1,127 @@
+from collections import Counter
+
+import pytest
+
+from db_inspector.checks import constant
+from db_inspector.checks.base import CheckConfig, CheckGroup, CheckItem, Status
+from db_inspector.checks.mongodb import MongoDBCheck, ServerSnapshot, document_rows, resolve_path
+from db_inspector.checks.rule import compile_rule
+from db_inspector.config.base import Check
+from db_inspector.pipelines import mongodb_pipeline
+from db_inspector.pipelines.mongodb_pipeline import MongoDBPipeline
+
+SERVER_STATUS = {"connections": {"current": 12, "available": 800}, "uptime": 3600}
+REPL_STATUS = {"set": "rs0", "members": [{"name": "a:27017", "stateStr": "PRIMARY"}, {"name": "b:27017", "stateStr": "SECONDARY", "lag": 2}]}
+
+
+class TimeoutFailure(Exception):
+    timeout = True
+
+
+class FakeAdmin:
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = Counter()
+        self.options = []
+
+    def command(self, command, **options):
+        self.calls[command] += 1
+        self.options.append(options)
+        document = self.documents[command]
+        if isinstance(document, Exception):
+            raise document
+        return document
+
+
+class FakeClient:
+    def __init__(self, documents=None):
+        self.admin = FakeAdmin(documents or {"serverStatus": SERVER_STATUS, "replSetGetStatus": REPL_STATUS, "hello": {"isWritablePrimary": True}})
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_resolve_path_reads_nested_fields_and_list_indexes():
+    assert resolve_path(SERVER_STATUS, "connections.current") == 12
+    assert resolve_path(REPL_STATUS, "members.1.stateStr") == "SECONDARY"
+    assert resolve_path(REPL_STATUS, "members.-1.name") == "b:27017"
+    for path in ("connections.missing", "members.2", "uptime.value"):
+        with pytest.raises(ValueError, match=f"Field '{path}' not found"):
+            resolve_path({**SERVER_STATUS, **REPL_STATUS}, path)
+
+
+def test_document_rows_matches_sql_result_shape():
+    # 文档列表：每个文档一行，列为所有字段的并集
+    assert document_rows(REPL_STATUS["members"]) == (
+        [("a:27017", "PRIMARY", None), ("b:27017", "SECONDARY", 2)], ("name", "stateStr", "lag"))
+    assert document_rows({"current": 12, "available": 800}) == ([(12, 800)], ("current", "available"))
+    assert document_rows([1, 2], "ports") == ([(1,), (2,)], ("ports",))
+    assert document_rows(3600, "uptime") == ([(3600,)], ("uptime",))
+
+
+def test_server_snapshot_runs_each_command_once():
+    client = FakeClient()
+    snapshot = ServerSnapshot(client, timeout=2)
+    for _ in range(3):
+        snapshot.get("serverStatus")
+        snapshot.get("replSetGetStatus")
+    assert client.admin.calls == Counter({"serverStatus": 1, "replSetGetStatus": 1})
+    assert client.admin.options[0] == {"maxTimeMS": 2000}
+
+    with pytest.raises(ValueError, match="Unknown server status source 'currentOp'"):
+        snapshot.get("currentOp")
+
+
+def test_server_snapshot_keeps_failures():
+    client = FakeClient({"replSetGetStatus": TimeoutFailure("operation exceeded time limit")})
+    snapshot = ServerSnapshot(client)
+    for _ in range(2):
+        # 失败的命令只执行一次，超时统一转换为 TimeoutError
+        with pytest.raises(TimeoutError, match="operation exceeded time limit"):
+            snapshot.get("replSetGetStatus")
+    assert client.admin.calls["replSetGetStatus"] == 1
+
+
+def mongodb_item(code, path, **kwargs):
+    return CheckItem(name=code.lower(), type="mongodb", code=code, remark="", path=path, **kwargs)
+
+
+@pytest.fixture
+def check_config(monkeypatch):
+    checks = {
+        "CONN": mongodb_item("CONN", "serverStatus.connections", rule=compile_rule("all(current < available)")),
+        "MEMBERS": mongodb_item("MEMBERS", "replSetGetStatus.members", rule=compile_rule("count(rows) == 3")),
+        "UPTIME": mongodb_item("UPTIME", "serverStatus.uptime"),
+        "SQL": CheckItem(name="sql", type="sql", code="SQL", remark="", query="SELECT 1"),
+    }
+    group = CheckGroup(code="m", name="M", remark="", checks=checks)
+    monkeypatch.setattr(constant, "CHECK_CONFIG", CheckConfig(check_groups={"m": group}))
+
+
+def test_parse_multi_host_uri_without_password():
+    pipe = MongoDBPipeline(db_name="rs", db_uri="mongodb://ops%40corp:secret@A:27017,b:27017/?replicaSet=rs0")
+    pipe.parse_db_uri()
+    assert pipe.db_params == {"user": "ops@corp", "host": "a:27017,b:27017", "dbname": "admin"}
+    assert pipe.target == "a:27017,b:27017/ops@corp/admin"
+
+
+def test_pipeline_reads_every_check_from_one_snapshot(check_config, monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(mongodb_pipeline, "create_client", lambda uri, connect_timeout, socket_timeout: client)
+    pipe = MongoDBPipeline(db_name="rs", db_uri="mongodb://a:27017/", checks_conf=[Check(group="m", checks=["CONN", "MEMBERS", "UPTIME", "SQL"])])
+    pipe.parse_db_uri()
+    pipe.connect()
+    try:
+        assert all(isinstance(check, MongoDBCheck) for check in pipe.prepare_plan().checks)
+        results = pipe.execute[0]
+    finally:
+        pipe.close()
+
+    # SQL 检查不适用于 MongoDB，不在计划中
+    assert [(result.check_name, result.status) for result in results["check_results"]] == [
+        ("conn", Status.SUCCESS.value), ("members", Status.FAILURE.value), ("uptime", Status.SUCCESS.value)]
+    assert results["check_results"][0].columns == ("current", "available")
+    assert client.admin.calls == Counter({"hello": 1, "serverStatus": 1, "replSetGetStatus": 1})
+    assert client.closed
+    assert pipe.db_connection is None and pipe.server_snapshot is None
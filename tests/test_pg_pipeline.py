@@ -0,0 +1,129 @@
+import asyncio
+import weakref
+from types import SimpleNamespace
+
+from db_inspector.checks.base import CANCEL_GRACE, CheckItemResult, Status
+from db_inspector.checks.check_run import SQLCheck
+from db_inspector.pipelines.fleet import failed_db_result
+from db_inspector.pipelines.pg_async_pipeline import AsyncPostgreSQLPipeline
+from db_inspector.pipelines.pg_pipeline import PostgreSQLPipeline
+
+
+class RecordingWriter:
+    output_file = "results.jsonl"
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, db_name, result):
+        self.rows.append((db_name, result.check_name))
+
+
+def jsonl_pipeline(**options):
+    writer = RecordingWriter()
+    pipe = PostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db", report_format="jsonl", result_writer=writer, **options)
+    return pipe, writer
+
+
+def test_jsonl_report_writes_failure_after_partially_streamed_run():
+    pipe, writer = jsonl_pipeline()
+    streamed = CheckItemResult("first", Status.SUCCESS.value, "ok")
+    pipe.record_result(None, None, streamed)
+    # 执行中途失败时，巡检结果只有失败记录，它没有经过流式输出
+    pipe.generate_report(failed_db_result("a", "Inspection failed: connection lost"))
+    assert writer.rows == [("a", "first"), ("a", "a")]
+
+
+def test_jsonl_report_does_not_repeat_streamed_results():
+    pipe, writer = jsonl_pipeline()
+    results = [CheckItemResult("first", Status.SUCCESS.value, "ok"), CheckItemResult("second", Status.WARNING.value, "check")]
+    for result in results:
+        pipe.record_result(None, None, result)
+    report = pipe.generate_report(({"check_results": results, "success_count": 1, "failure_count": 0, "warning_count": 1, "timeout_count": 0},))
+    assert writer.rows == [("a", "first"), ("a", "second")]
+    assert report.startswith("1 succeeded, 0 failed, 1 warnings")
+
+
+def test_jsonl_report_without_kept_results_writes_failure():
+    pipe, writer = jsonl_pipeline(keep_results=False)
+    pipe.record_result(None, None, CheckItemResult("first", Status.SUCCESS.value, "ok"))
+    pipe.generate_report(failed_db_result("a", "Inspection failed: connection lost"))
+    assert writer.rows == [("a", "first"), ("a", "a")]
+
+
+def test_jsonl_report_without_checks():
+    pipe, writer = jsonl_pipeline()
+    assert pipe.generate_report(None) == "No checks to run; nothing appended to results.jsonl"
+    assert writer.rows == []
+
+
+class Result:
+    def __init__(self, status):
+        self.status = status
+
+
+def test_async_execute_consumes_results_incrementally(monkeypatch):
+    pipe = AsyncPostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db", keep_results=False)
+    monkeypatch.setattr(pipe, "prepare_plan", lambda: SimpleNamespace(fully_cached=True))
+    released = []
+
+    async def iter_execute_async():
+        refs = []
+        for status in (Status.SUCCESS.value, Status.FAILURE.value, Status.SUCCESS.value):
+            if len(refs) >= 2:
+                # 更早的结果已经汇总，不保留结果时不再被引用
+                released.append(refs[-2]() is None)
+            result = Result(status)
+            refs.append(weakref.ref(result))
+            yield result
+            del result
+
+    monkeypatch.setattr(pipe, "iter_execute_async", iter_execute_async)
+    results = asyncio.run(pipe.execute_async())
+    assert released == [True]
+    assert results[0]["check_results"] == []
+    assert (results[0]["success_count"], results[0]["failure_count"]) == (2, 1)
+
+
+class FakeAsyncConnection:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_async_connect_sets_server_side_timeouts(monkeypatch):
+    import asyncpg
+    calls = []
+
+    async def connect(**kwargs):
+        calls.append(kwargs)
+        return FakeAsyncConnection()
+
+    monkeypatch.setattr(asyncpg, "connect", connect)
+    pipe = AsyncPostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db", database_timeout=60)
+    pipe.parse_db_uri()
+    checks = [SQLCheck("SELECT 1", "", "", "fast", timeout=2), SQLCheck("SELECT 2", "", "", "slow", timeout=10)]
+    monkeypatch.setattr(pipe, "prepare_plan", lambda: SimpleNamespace(checks=checks, fully_cached=False))
+
+    asyncio.run(pipe.connect())
+    # 服务端超时为最长的检查超时加上取消的宽限时间，客户端的超时先触发
+    assert calls[0]["server_settings"] == {"statement_timeout": str(int((10 + CANCEL_GRACE) * 1000))}
+    assert calls[0]["command_timeout"] == 10
+
+    connection = pipe.db_connection
+    asyncio.run(pipe.close())
+    assert connection.closed
+    assert pipe.db_connection is None
+
+
+def test_async_session_timeout_is_unlimited_when_a_check_has_no_timeout(monkeypatch):
+    pipe = AsyncPostgreSQLPipeline(db_name="a", db_uri="postgresql://user@a/db")
+    checks = [SQLCheck("SELECT 1", "", "", "fast", timeout=2), SQLCheck("SELECT 2", "", "", "open", timeout=0)]
+    monkeypatch.setattr(pipe, "prepare_plan", lambda: SimpleNamespace(checks=checks, fully_cached=False))
+    assert pipe.session_statement_timeout() == 0
+
+    # 数据库的时间预算限制连接级别的超时
+    pipe.database_timeout = 5
+    assert 4 < pipe.session_statement_timeout() <= 5
@@ -0,0 +1,155 @@
+from contextlib import contextmanager
+from dataclasses import replace
+from types import SimpleNamespace
+
+from db_inspector.checks.base import CheckConfig, CheckGroup, CheckItem, SAVEPOINT_NAME
+from db_inspector.checks.check_run import SQLCheck, FetchedRows, DEFAULT_MAX_ROWS
+from db_inspector.checks.plan import ExecutionPlan, PlanCompiler, definition_hash, query_hash
+from db_inspector.checks.rule import compile_rule
+from db_inspector.config.base import Check
+
+
+def sql_check(name, query="SELECT g FROM generate_series(1, 10) g", **kwargs):
+    return SQLCheck(query, "", "", name, **kwargs)
+
+
+def test_shared_query_is_fetched_with_the_largest_cap():
+    small, big = sql_check("small", max_rows=2), sql_check("big", max_rows=100)
+    plan = ExecutionPlan([small, big])
+    fetcher = plan.fetch_checks[query_hash(small.query)]
+    assert fetcher.max_rows == 100
+    # 执行查询的是副本，检查自己的上限不变
+    assert small.max_rows == 2
+
+    rows = FetchedRows([(i,) for i in range(10)], columns=("g",))
+    small_result, big_result = small.evaluate(rows), big.evaluate(rows)
+    assert (small_result.row_count, small_result.truncated, len(small_result.rows)) == (10, True, 2)
+    assert (big_result.row_count, big_result.truncated, len(big_result.rows)) == (10, False, 10)
+
+
+def test_default_cap_counts_as_largest():
+    first, default = sql_check("first", max_rows=5), sql_check("default")
+    plan = ExecutionPlan([first, default])
+    assert plan.fetch_checks[query_hash(first.query)].max_rows == DEFAULT_MAX_ROWS
+
+
+def test_single_check_is_fetched_directly():
+    check = sql_check("only", max_rows=3)
+    assert ExecutionPlan([check]).fetch_checks[query_hash(check.query)] is check
+
+
+def check_item(**kwargs):
+    options = dict(name="Check", type="sql", code="CHECK", remark="", query="SELECT 1")
+    options.update(kwargs)
+    return CheckItem(**options)
+
+
+def test_definition_hash_ignores_formatting_and_description():
+    item = check_item()
+    assert definition_hash(replace(item, query="  SELECT\n    1 ")) == definition_hash(item)
+    assert definition_hash(replace(item, remark="changed", ttl=60)) == definition_hash(item)
+
+
+def test_definition_hash_changes_with_the_definition():
+    item = check_item()
+    changes = [
+        dict(name="Renamed"), dict(query="SELECT 2"), dict(type="shell"), dict(max_rows=5), dict(max_bytes=100),
+        dict(threshold_column="used"), dict(rule=compile_rule("count(rows) == 0")),
+        dict(expected_value="on"), dict(check_type="threshold"), dict(comparison="less_than"),
+    ]
+    hashes = {definition_hash(replace(item, **change)) for change in changes}
+    assert definition_hash(item) not in hashes
+    assert len(hashes) == len(changes)
+
+
+class FakePipelineCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.query = None
+        self.pgresult = None
+        self.description = None
+        self.closed = False
+
+    def execute(self, query, prepare=None):
+        self.query = query
+        self.connection.sent.append(query)
+        self.connection.batch.append(self)
+
+    def fetchall(self):
+        return list(self.connection.rows[self.query])
+
+    def close(self):
+        self.closed = True
+
+
+class FakePipelineConnection:
+    """
+    模拟 psycopg 3 的 pipeline 模式：失败的查询及其后的查询都没有结果，退出 pipeline 时抛出错误
+    """
+
+    def __init__(self, rows, failing=()):
+        self.rows = rows
+        self.failing = set(failing)
+        self.sent = []
+        self.batch = []
+
+    def cursor(self):
+        return FakePipelineCursor(self)
+
+    def execute(self, statement, prepare=None):
+        self.sent.append(statement)
+
+    @contextmanager
+    def pipeline(self):
+        self.batch = []
+        self.sent.append("-- sync")
+        yield
+        for cursor in self.batch:
+            if cursor.query in self.failing:
+                raise RuntimeError(f"query failed: {cursor.query}")
+            cursor.pgresult = object()
+            cursor.description = [SimpleNamespace(name="g")]
+
+
+def test_batch_resends_queries_skipped_after_a_failure():
+    checks = [sql_check("first", query="SELECT 1"), sql_check("bad", query="SELECT bad"), sql_check("last", query="SELECT 3")]
+    connection = FakePipelineConnection({"SELECT 1": [(1,)], "SELECT 3": [(3,)]}, failing={"SELECT bad"})
+    fetched = ExecutionPlan(checks).prefetch_pipelined(connection)
+
+    assert fetched[query_hash("SELECT 1")] == [(1,)]
+    assert str(fetched[query_hash("SELECT bad")]) == "query failed: SELECT bad"
+    assert fetched[query_hash("SELECT 3")] == [(3,)]
+    # 失败查询之后被跳过的查询在新的批次中重新发送，成功的查询不重复发送
+    assert connection.sent == ["-- sync", "SELECT 1", "SELECT bad", "SELECT 3", "-- sync", "SELECT 3"]
+
+
+def test_batch_in_snapshot_rolls_back_to_savepoint_before_resending():
+    checks = [sql_check("bad", query="SELECT bad"), sql_check("last", query="SELECT 3"), sql_check("bad_last", query="SELECT worse")]
+    connection = FakePipelineConnection({"SELECT 3": [(3,)]}, failing={"SELECT bad", "SELECT worse"})
+    fetched = ExecutionPlan(checks).prefetch_pipelined(connection, snapshot=True)
+
+    assert fetched[query_hash("SELECT 3")] == [(3,)]
+    assert isinstance(fetched[query_hash("SELECT worse")], RuntimeError)
+    savepoint, rollback = f"SAVEPOINT {SAVEPOINT_NAME}", f"ROLLBACK TO SAVEPOINT {SAVEPOINT_NAME}"
+    assert connection.sent == [
+        "-- sync", savepoint, "SELECT bad", savepoint, "SELECT 3", savepoint, "SELECT worse",
+        # 重发前回滚失败的查询，最后一个查询失败后同样回滚，快照事务保持可用
+        "-- sync", rollback, savepoint, "SELECT 3", savepoint, "SELECT worse",
+        rollback,
+    ]
+
+
+def test_compiler_reports_unknown_codes_once(capsys):
+    group = CheckGroup(code="g", name="G", remark="", checks={"CHECK": check_item()})
+    compiler = PlanCompiler(CheckConfig(check_groups={"g": group}))
+    checks_conf = [Check(group="g", checks=["CHECK", "MISSING"]), Check(group="nope", checks=["CHECK"])]
+
+    first = compiler.compile(checks_conf)
+    # 另一个数据库使用不同的配置，引用同样找不到的检查项
+    second = compiler.compile([Check(group="g", checks=["MISSING"]), Check(group="nope", checks=["OTHER"])])
+    assert compiler.compile(checks_conf) == first
+    assert [item.code for item in first] == ["CHECK"]
+    assert second == ()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ["Check 'MISSING' not found in group 'g'", "Check group 'nope' not found in configuration"]
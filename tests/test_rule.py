@@ -0,0 +1,81 @@
+import pickle
+import re
+
+import pytest
+
+from db_inspector.checks.check_run import FetchedRows
+from db_inspector.checks.rule import Rule, RuleError, compile_rule
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("all(age >", "Invalid rule"),
+    ("count(rows", "Invalid rule"),
+    ("__import__('os')", "Unknown function '__import__'"),
+    ("age.bit_length() > 1", "Unsupported syntax: Call"),
+    ("age.real > 1", "Unsupported syntax: Attribute"),
+    ("[x for x in age]", "Unsupported syntax: ListComp"),
+    ("lambda: 1", "Unsupported syntax: Lambda"),
+    ("max(age, 1) > 0", "takes exactly one argument"),
+    ("all(rows)", "'rows' can only be used as count(rows)"),
+])
+def test_invalid_rules_are_rejected_at_compile_time(expression, message):
+    with pytest.raises(RuleError, match=re.escape(message)):
+        Rule(expression)
+
+
+def test_unknown_column_is_reported_when_evaluated():
+    rule = Rule("all(missing > 0)")
+    with pytest.raises(RuleError, match="Unknown column 'missing'"):
+        rule.evaluate([(1,)], ("age",))
+
+
+def test_unknown_column_on_empty_result_without_columns_passes():
+    assert Rule("all(age > 0)").evaluate([], None)
+
+
+def test_column_comparison_applies_to_every_row():
+    rule = Rule("all(age_remain > 1e8)")
+    assert rule.evaluate([(2e8,), (3e8,)], ("age_remain",))
+    assert not rule.evaluate([(2e8,), (5,)], ("age_remain",))
+
+
+def test_null_never_satisfies_a_comparison():
+    columns = ("value",)
+    assert not Rule("all(value > 0)").evaluate([(1,), (None,)], columns)
+    assert not Rule("all(value < 0)").evaluate([(None,)], columns)
+    assert Rule("all(value == None)").evaluate([(None,)], columns)
+
+
+def test_null_propagates_through_arithmetic():
+    columns = ("used", "total")
+    # NULL 参与运算的结果为 NULL，比较时不满足条件
+    assert not Rule("all(used / total < 0.8)").evaluate([(1, 10), (None, 10)], columns)
+    assert Rule("count(used / total) == 1").evaluate([(1, 10), (None, 10)], columns)
+
+
+def test_aggregates_ignore_null():
+    columns = ("value",)
+    rows = [(1,), (None,), (3,)]
+    assert Rule("sum(value) == 4").evaluate(rows, columns)
+    assert Rule("avg(value) == 2").evaluate(rows, columns)
+    assert Rule("max(value) == 3 and min(value) == 1").evaluate(rows, columns)
+    assert Rule("count(value) == 2").evaluate(rows, columns)
+    assert Rule("max(value) == None").evaluate([(None,)], columns)
+
+
+def test_count_rows_uses_the_full_row_count_of_truncated_results():
+    rows = FetchedRows([(1,), (2,)], total_rows=50, truncated=True, columns=("g",))
+    rule = Rule("count(rows) == 50")
+    assert rule.evaluate(rows, rows.columns, rows.total_rows)
+    assert Rule("row_count == 50").evaluate(rows, rows.columns, rows.total_rows)
+    # 条件计数只统计保留的行
+    assert Rule("count(g > 1) == 1").evaluate(rows, rows.columns, rows.total_rows)
+    assert Rule("count(rows) == 0").evaluate([], ("g",))
+
+
+def test_compiled_rules_are_shared_and_picklable():
+    rule = compile_rule("count(rows) == 0")
+    assert compile_rule("count(rows) == 0") is rule
+    restored = pickle.loads(pickle.dumps(rule))
+    assert restored == rule
+    assert restored.evaluate([], ())
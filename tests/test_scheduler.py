@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from db_inspector.checks import constant
+from db_inspector.checks.base import CheckConfig, CheckGroup, CheckItem, CheckItemResult, Status
+from db_inspector.config.base import Check, Database
+from db_inspector.pipelines import scheduler as scheduler_module
+from db_inspector.pipelines.scheduler import CheckScheduler, next_slot
+
+
+def check_item(code, interval=None):
+    return CheckItem(name=code.lower(), type="sql", code=code, remark="", query="SELECT 1", interval=interval)
+
+
+@pytest.fixture
+def check_config(monkeypatch):
+    group = CheckGroup(code="g", name="G", remark="", checks={"FAST": check_item("FAST", 60), "SLOW": check_item("SLOW", 600)})
+    monkeypatch.setattr(constant, "CHECK_CONFIG", CheckConfig(check_groups={"g": group}))
+
+
+def make_scheduler(*names, **options):
+    databases = [Database(type="postgres", name=name, uri=f"postgresql://user@{name}/db") for name in names]
+    return CheckScheduler(databases, [Check(group="g", checks=["FAST", "SLOW"])], **options)
+
+
+def test_next_slot_keeps_fixed_phase():
+    # 执行时间固定为 anchor + phase * interval + k * interval
+    assert next_slot(100, 60, 0.5, 0) == 130
+    assert next_slot(100, 60, 0.5, 130) == 190
+    assert next_slot(100, 60, 0.5, 189.9) == 190
+    assert next_slot(100, 60, 0.5, 1000) == 1030
+
+
+def test_due_checks_runs_everything_first_then_by_interval(check_config):
+    scheduler = make_scheduler("a", "b")
+    anchor = scheduler.anchor
+    due = scheduler.due_checks(anchor)
+    assert {index: [entry.check_item.code for entry in entries] for index, entries in due.items()} == {0: ["FAST", "SLOW"], 1: ["FAST", "SLOW"]}
+    # 第一轮之后，每个检查项至少间隔半个周期，按自己的间隔再次到期
+    assert scheduler.due_checks(anchor + 1) == {}
+    for entries in scheduler.schedule.values():
+        fast, slow = entries
+        assert anchor + 30 <= fast.next_due <= anchor + 90
+        assert anchor + 300 <= slow.next_due <= anchor + 900
+
+    due = scheduler.due_checks(anchor + 90)
+    assert {index: [entry.check_item.code for entry in entries] for index, entries in due.items()} == {0: ["FAST"], 1: ["FAST"]}
+
+
+def test_merge_results_and_failure_keep_latest_per_check(check_config):
+    scheduler = make_scheduler("a")
+    fast, slow = scheduler.schedule[0]
+    items = [fast.check_item, slow.check_item]
+    scheduler.merge_results(0, [fast, slow], items, [CheckItemResult("fast", Status.SUCCESS.value, "ok"), CheckItemResult("slow", Status.SUCCESS.value, "ok")])
+    # 只合并本轮到期的检查项，其他检查项保留最近的结果
+    scheduler.merge_results(0, [fast], items, [CheckItemResult("fast", Status.WARNING.value, "check")])
+    scheduler.merge_failure(0, [slow], "Inspection timed out after 1s", Status.TIMEOUT.value)
+
+    db_result = scheduler.db_result(0)[0]
+    assert [(result.check_name, result.status) for result in db_result["check_results"]] == [("fast", "warning"), ("slow", "timeout")]
+    assert db_result["check_results"][1].error
+    assert (db_result["warning_count"], db_result["timeout_count"]) == (1, 1)
+
+
+def test_target_with_inspection_in_flight_is_skipped(check_config, monkeypatch):
+    scheduler = make_scheduler("a", "b", target_timeout=0.2, report_format="jsonl")
+    release = threading.Event()
+    started = []
+
+    def run_due_checks(index, database, entries, cancelled=None):
+        started.append(database.name)
+        if database.name == "a":
+            # 超时后仍在后台执行，直到被释放
+            release.wait(30)
+
+    def run_targets(databases, task, *args):
+        # 模拟超时：执行器不再等待数据库 a，其巡检在后台继续执行
+        background = [threading.Thread(target=task, args=(database, threading.Event())) for database in databases if database.name == "a"]
+        for thread in background:
+            thread.start()
+        return [task(database, threading.Event()) for database in databases if database.name != "a"]
+
+    monkeypatch.setattr(scheduler, "run_due_checks", run_due_checks)
+    monkeypatch.setattr(scheduler_module, "run_targets", run_targets)
+    try:
+        anchor = scheduler.anchor
+        scheduler.run_cycle(anchor)
+        assert scheduler.in_flight == {0}
+        # 下一轮只巡检没有在执行的数据库
+        scheduler.run_cycle(anchor + 1000)
+        assert sorted(started) == ["a", "b", "b"]
+    finally:
+        release.set()
+
+    # 后台的巡检结束后，数据库重新参与调度
+    for _ in range(100):
+        if not scheduler.in_flight:
+            break
+        time.sleep(0.05)
+    assert scheduler.in_flight == set()
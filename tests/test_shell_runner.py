@@ -0,0 +1,53 @@
+import re
+import time
+
+import pytest
+
+from db_inspector.checks.base import Status
+from db_inspector.checks.check_run import ShellCheck
+from db_inspector.utils.shell_runner import ShellRunner
+
+
+def test_queue_time_counts_towards_command_timeout():
+    runner = ShellRunner(concurrency=1)
+    try:
+        started = time.monotonic()
+        futures = [runner.submit("sleep 1", timeout=1.5) for _ in range(3)]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result(timeout=5).returncode)
+            except TimeoutError as e:
+                outcomes.append(str(e))
+        # 第一个命令执行完毕，排队的命令在提交 1.5 秒后超时，不会再等待 1 秒的执行时间；
+        # 超时消息说明排队等待的时间，与命令本身执行超时区分
+        assert outcomes[0] == 0
+        assert re.match(r"Command timed out after 1\.5s, including 1\.\ds waiting for a free shell slot", outcomes[1])
+        assert outcomes[2].startswith("Command timed out after 1.5s waiting for a free shell slot")
+        assert time.monotonic() - started < 2.5
+    finally:
+        runner.close()
+
+
+def test_running_command_timeout_message():
+    runner = ShellRunner()
+    try:
+        with pytest.raises(TimeoutError, match=r"^Command timed out after 0\.2s$"):
+            runner.run("sleep 5", timeout=0.2)
+    finally:
+        runner.close()
+
+
+def test_collect_stops_waiting_at_deadline(monkeypatch):
+    runner = ShellRunner()
+    monkeypatch.setattr("db_inspector.checks.check_run.get_shell_runner", lambda: runner)
+    try:
+        check = ShellCheck("sleep 30", "", check_name="HANG")
+        started = time.monotonic()
+        future = check.submit(0)
+        result = check.collect(future, 0, deadline=time.monotonic() + 0.2)
+        assert result.status == Status.TIMEOUT.value
+        assert future.cancelled()
+        assert time.monotonic() - started < 5
+    finally:
+        runner.close()
@@ -0,0 +1,22 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "script", "startup_benchmark.py")
+
+
+def load_benchmark():
+    spec = importlib.util.spec_from_file_location("startup_benchmark", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_heavy_modules_not_imported_at_startup():
+    benchmark = load_benchmark()
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {benchmark.MODULE}; print('\\n'.join(sys.modules))"],
+        cwd=benchmark.PROJECT_DIR, capture_output=True, text=True, check=True,
+    )
+    assert benchmark.forbidden_imports(result.stdout.split()) == []
@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import pytest
+
+from db_inspector.checks import threshold
+from db_inspector.checks.base import Status
+from db_inspector.checks.threshold import evaluate_threshold
+
+
+@pytest.fixture(params=["numpy", "fallback"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        assert threshold.numpy is not None
+    else:
+        monkeypatch.setattr(threshold, "numpy", None)
+    return request.param
+
+
+def evaluate(rows, comparison, expected_value, columns=("datname", "value"), **kwargs):
+    return evaluate_threshold("T", rows, columns, comparison, expected_value, **kwargs)
+
+
+def test_all_rows_pass(backend):
+    result = evaluate([("a", Decimal("10")), ("b", 20)], "greater_than", "5")
+    assert result.status == Status.SUCCESS.value
+    assert result.message == "All 2 rows satisfy value > 5, worst value 10"
+
+
+def test_breached_rows_are_reported_with_the_worst_value(backend):
+    result = evaluate([("a", 10), ("b", 90), ("c", 95)], "less_than", "80")
+    assert result.status == Status.FAILURE.value
+    assert result.message.startswith("2 of 3 rows breach value < 80, worst value 95")
+    assert "a" not in result.message.split(":", 1)[1]
+
+
+def test_equal_to_reports_the_farthest_value(backend):
+    result = evaluate([("a", 1), ("b", 7), ("c", 2)], "equal_to", "1")
+    assert "worst value 7" in result.message
+
+
+def test_null_values_are_skipped(backend):
+    result = evaluate([("a", None), ("b", 3)], "greater_than", "1")
+    assert result.status == Status.SUCCESS.value
+    assert "worst value 3" in result.message
+
+    result = evaluate([("a", None)], "greater_than", "1")
+    assert (result.status, result.message) == (Status.FAILURE.value, "No numeric values to compare against the threshold.")
+
+
+def test_threshold_column_by_name_and_index(backend):
+    rows = [(5, 100), (50, 100)]
+    columns = ("used", "total")
+    assert evaluate(rows, "less_than", "10", columns, threshold_column="used").status == Status.FAILURE.value
+    assert evaluate(rows, "less_than", "10", columns, threshold_column="1").status == Status.FAILURE.value
+    assert evaluate(rows, "less_than", "200", columns, threshold_column="1").status == Status.SUCCESS.value
+
+
+def test_configuration_and_value_errors(backend):
+    assert "Unsupported comparison" in evaluate([("a", 1)], "between", "1").message
+    assert "Column 'missing' not found" in evaluate([("a", 1)], "less_than", "1", threshold_column="missing").message
+    assert "non-numeric values" in evaluate([("a", "x")], "less_than", "1").message
+    assert evaluate([("a", 1)], "less_than", "abc").error
+
+
+def test_truncated_results_name_the_checked_rows(backend):
+    result = evaluate([("a", 1)], "less_than", "10", row_count=1000, truncated=True)
+    assert result.message.endswith("(only the first 1 of 1000 rows were checked)")
+
+
+def test_backends_agree():
+    rows = [(str(i), value) for i, value in enumerate([3, None, Decimal("8.5"), -2, 8.5])]
+    results = {}
+    for comparison in threshold.COMPARISONS:
+        results[comparison] = evaluate(rows, comparison, "3").message
+    original = threshold.numpy
+    threshold.numpy = None
+    try:
+        for comparison in threshold.COMPARISONS:
+            assert evaluate(rows, comparison, "3").message == results[comparison]
+    finally:
+        threshold.numpy = original
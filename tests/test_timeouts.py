@@ -0,0 +1,23 @@
+from db_inspector.checks.base import cap_timeout, timeout_settings
+
+
+def test_unset_timeouts_are_not_sent():
+    # 只配置了 lock_timeout 时不能把 statement_timeout 设为 0（会关闭服务器或角色上配置的默认超时）
+    assert timeout_settings(0, 2) == ["SET LOCAL lock_timeout = 2000"]
+    assert timeout_settings(0, 0) == []
+
+
+def test_reset_restores_defaults():
+    assert timeout_settings(0, 0, reset=True) == ["SET LOCAL statement_timeout = DEFAULT", "SET LOCAL lock_timeout = DEFAULT"]
+    assert timeout_settings(1.5, 0, local=False, reset=True) == ["SET statement_timeout = 1500", "SET lock_timeout = DEFAULT"]
+
+
+def test_sub_millisecond_budget_is_not_unlimited():
+    assert timeout_settings(0.0004, 2) == ["SET LOCAL statement_timeout = 1", "SET LOCAL lock_timeout = 2000"]
+    assert timeout_settings(0.3, 0) == ["SET LOCAL statement_timeout = 300"]
+
+
+def test_cap_timeout():
+    assert cap_timeout(5, None) == 5
+    assert cap_timeout(0, 2) == 2
+    assert cap_timeout(5, 2) == 2